@@ -0,0 +1,263 @@
+"""
+Per-user activity bookkeeping that is maintained on write.
+
+Every function takes an open connection. The write hooks (record_activity,
+record_deletion) do NOT commit: callers run them inside the same transaction
+as the workout rows they just changed.
+"""
+import base64
+import datetime
+import json
+
+DATE_FMT = "%Y-%m-%d"
+
+def _parse(date_str):
+    return datetime.datetime.strptime(date_str, DATE_FMT).date()
+
+# --- DAILY ROLLUP ---
+
+def refresh_daily_rollup(conn, user_id, date_str):
+    """Re-aggregates one user-day from `workouts` (one indexed range read) into daily_activity."""
+    # Volume uses the per-set log when there is one, else planned sets x reps x weight
+    row = conn.execute('''
+        SELECT COUNT(*), COALESCE(SUM(w.sets), 0),
+               COALESCE(SUM(COALESCE(s.volume, COALESCE(w.sets, 0) * CAST(w.reps AS INTEGER) * COALESCE(w.weight, 0))), 0)
+        FROM workouts w
+        LEFT JOIN (
+            SELECT workout_id, SUM(reps * weight) AS volume FROM workout_sets
+            WHERE user_id = ? AND date = ? GROUP BY workout_id
+        ) s ON s.workout_id = w.id
+        WHERE w.user_id = ? AND w.date = ?
+    ''', (user_id, date_str, user_id, date_str)).fetchone()
+
+    if row[0] == 0:
+        conn.execute("DELETE FROM daily_activity WHERE user_id = ? AND date = ?", (user_id, date_str))
+        return
+    conn.execute('''
+        INSERT INTO daily_activity (user_id, date, exercise_count, sets, volume) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, date) DO UPDATE SET
+            exercise_count = excluded.exercise_count, sets = excluded.sets, volume = excluded.volume
+    ''', (user_id, date_str, row[0], row[1], row[2]))
+
+BUCKETS = ("day", "week", "month")
+MAX_RANGE_DAYS = 5 * 366
+
+def bucket_start(day, bucket):
+    if bucket == "week":
+        return day - datetime.timedelta(days=day.weekday()) # Monday
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def activity_series(conn, user_id, start, end, bucket="day"):
+    """
+    Zero-filled activity totals per bucket between `start` and `end` (dates, inclusive),
+    from a single primary-key range scan of daily_activity.
+    """
+    rows = conn.execute('''
+        SELECT date, exercise_count, sets, volume FROM daily_activity
+        WHERE user_id = ? AND date BETWEEN ? AND ?
+        ORDER BY date
+    ''', (user_id, start.strftime(DATE_FMT), end.strftime(DATE_FMT))).fetchall()
+
+    # 1. Empty buckets for the whole range
+    buckets = {}
+    day = bucket_start(start, bucket)
+    while day <= end:
+        buckets[day] = {"start": day.strftime(DATE_FMT), "exercises": 0, "sets": 0, "volume": 0.0}
+        if bucket == "month":
+            day = (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        else:
+            day += datetime.timedelta(days=7 if bucket == "week" else 1)
+
+    # 2. Fold the daily rows in
+    for r in rows:
+        b = buckets[bucket_start(_parse(r["date"]), bucket)]
+        b["exercises"] += r["exercise_count"]
+        b["sets"] += r["sets"]
+        b["volume"] += r["volume"]
+
+    return list(buckets.values())
+
+# --- SESSION HISTORY (keyset pagination) ---
+# Pages are keyed on the session date, read from daily_activity's (user_id, date)
+# primary key, so page 50 costs the same as page 1. Cursors are opaque to clients.
+
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(date_str, direction):
+    raw = json.dumps({"d": date_str, "dir": direction}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """Returns (date_str, direction). Raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        _parse(data["d"])
+        if data["dir"] not in ("next", "prev"):
+            raise ValueError(data["dir"])
+        return data["d"], data["dir"]
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def sessions_page(conn, user_id, limit, cursor=None, with_exercises=True):
+    """
+    One page of workout sessions, newest first:
+        {"sessions": [{"date", "exercise_count", "sets", "volume", "exercises": [...]}],
+         "next_cursor": older page or None, "prev_cursor": newer page or None}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    direction = "next"
+    if cursor:
+        anchor, direction = decode_cursor(cursor)
+
+    # 1. The page's dates (+1 row to know whether there is more beyond it)
+    if not cursor:
+        rows = conn.execute('''
+            SELECT date, exercise_count, sets, volume FROM daily_activity
+            WHERE user_id = ? ORDER BY date DESC LIMIT ?
+        ''', (user_id, limit + 1)).fetchall()
+    elif direction == "next":
+        rows = conn.execute('''
+            SELECT date, exercise_count, sets, volume FROM daily_activity
+            WHERE user_id = ? AND date < ? ORDER BY date DESC LIMIT ?
+        ''', (user_id, anchor, limit + 1)).fetchall()
+    else:
+        rows = conn.execute('''
+            SELECT date, exercise_count, sets, volume FROM daily_activity
+            WHERE user_id = ? AND date > ? ORDER BY date ASC LIMIT ?
+        ''', (user_id, anchor, limit + 1)).fetchall()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+
+    sessions = [{
+        "date": r["date"],
+        "exercise_count": r["exercise_count"],
+        "sets": r["sets"],
+        "volume": r["volume"],
+        "exercises": []
+    } for r in rows]
+
+    if not sessions:
+        return {"sessions": [], "next_cursor": None, "prev_cursor": None}
+
+    newest, oldest = sessions[0]["date"], sessions[-1]["date"]
+
+    # 2. Per-exercise details for exactly these dates, one indexed range read
+    if with_exercises:
+        by_date = {s["date"]: s for s in sessions}
+        for r in conn.execute('''
+            SELECT date, exercise_id, sets, reps, weight FROM workouts
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            ORDER BY date DESC, id ASC
+        ''', (user_id, oldest, newest)):
+            by_date[r["date"]]["exercises"].append({
+                "name": r["exercise_id"], "sets": r["sets"], "reps": r["reps"], "weight": r["weight"]
+            })
+
+    # 3. Cursors
+    if direction == "next":
+        has_older = more
+        has_newer = cursor is not None and conn.execute(
+            "SELECT 1 FROM daily_activity WHERE user_id = ? AND date > ? LIMIT 1", (user_id, newest)).fetchone() is not None
+    else:
+        has_newer = more
+        has_older = conn.execute(
+            "SELECT 1 FROM daily_activity WHERE user_id = ? AND date < ? LIMIT 1", (user_id, oldest)).fetchone() is not None
+
+    return {
+        "sessions": sessions,
+        "next_cursor": encode_cursor(oldest, "next") if has_older else None,
+        "prev_cursor": encode_cursor(newest, "prev") if has_newer else None
+    }
+
+# --- STREAKS ---
+
+def recompute_streak(conn, user_id):
+    """
+    Repair path: rebuilds the streak record from the daily rollup in one pass.
+    Walks active dates newest-first and stops at the first gap, so the cost is
+    proportional to the streak length, not the history length.
+    """
+    cursor = conn.execute(
+        "SELECT date FROM daily_activity WHERE user_id = ? ORDER BY date DESC", (user_id,))
+
+    streak = 0
+    last_active = None
+    expected = None
+    for (date_str,) in cursor:
+        day = _parse(date_str)
+        if last_active is None:
+            last_active = day
+        elif day != expected:
+            break
+        streak += 1
+        expected = day - datetime.timedelta(days=1)
+    cursor.close()
+
+    conn.execute('''
+        INSERT INTO user_streaks (user_id, current_streak, last_active_date) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            current_streak = excluded.current_streak, last_active_date = excluded.last_active_date
+    ''', (user_id, streak, last_active.strftime(DATE_FMT) if last_active else None))
+    return streak, last_active
+
+def record_activity(conn, user_id, date_str):
+    """Call after logging workouts on `date_str`."""
+    refresh_daily_rollup(conn, user_id, date_str)
+
+    row = conn.execute("SELECT current_streak, last_active_date FROM user_streaks WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None or row["last_active_date"] is None:
+        recompute_streak(conn, user_id)
+        return
+
+    day = _parse(date_str)
+    last_active = _parse(row["last_active_date"])
+    if day == last_active:
+        return
+    if day == last_active + datetime.timedelta(days=1):
+        streak = row["current_streak"] + 1
+    elif day > last_active:
+        streak = 1 # Gap: a new streak starts today
+    else:
+        # Back-dated entry (e.g. offline sync) may bridge an old gap
+        recompute_streak(conn, user_id)
+        return
+
+    conn.execute("UPDATE user_streaks SET current_streak = ?, last_active_date = ? WHERE user_id = ?",
+                 (streak, date_str, user_id))
+
+def record_deletion(conn, user_id, date_str):
+    """Call after deleting a day's workouts. Only days inside the current run matter for the streak."""
+    refresh_daily_rollup(conn, user_id, date_str)
+
+    row = conn.execute("SELECT current_streak, last_active_date FROM user_streaks WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None or row["last_active_date"] is None:
+        return
+
+    day = _parse(date_str)
+    last_active = _parse(row["last_active_date"])
+    run_start = last_active - datetime.timedelta(days=row["current_streak"] - 1)
+    if run_start <= day <= last_active:
+        recompute_streak(conn, user_id)
+
+def current_streak(conn, user_id, today):
+    """
+    Streak as shown on the profile: the run must end today, or yesterday
+    if today's workout is not done yet. Constant cost.
+    """
+    row = conn.execute("SELECT current_streak, last_active_date FROM user_streaks WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        streak, last_active = recompute_streak(conn, user_id) # Users from before streak tracking
+        conn.commit()
+    else:
+        streak = row["current_streak"]
+        last_active = _parse(row["last_active_date"]) if row["last_active_date"] else None
+
+    if last_active is None or (today - last_active).days > 1:
+        return 0
+    return streak
@@ -0,0 +1,242 @@
+"""
+Progressive-overload analytics over the per-set log (`workout_sets`).
+
+A user's history is loaded once into NumPy arrays sorted by (exercise, day);
+estimated 1RMs, per-session aggregates, weekly volume per muscle group and
+next-session targets are all computed as whole-array passes (reduceat /
+bincount / where), so cost grows with the number of sets but no Python code
+runs per set.
+"""
+import datetime
+import numpy as np
+from backend.trainer_engine import muscle_group
+
+TARGET_RIR = 2 # Next session's top sets aim for ~RPE 8
+LOAD_INCREMENT = 2.5 # kg, smallest jump we suggest
+MAX_LOAD_JUMP = 0.10 # Never suggest more than +10% over the last top set (or one increment)
+RECENT_DAYS = 21 # Current e1RM = best session in the 3 weeks up to the latest one
+HIGH_RPE = 9.5 # At or above this, repeat the reps instead of adding one
+MAX_SETS_PER_EXERCISE = 50
+
+# --- INPUT ---
+
+def validate_sets(performed):
+    """[(reps, weight, rpe)] from the client's per-set log. Raises ValueError."""
+    if not isinstance(performed, list) or len(performed) > MAX_SETS_PER_EXERCISE:
+        raise ValueError(f"'performed' must be a list of at most {MAX_SETS_PER_EXERCISE} sets")
+    rows = []
+    for s in performed:
+        if not isinstance(s, dict):
+            raise ValueError(f"Invalid set entry: {s!r}")
+        reps, weight, rpe = s.get("reps"), s.get("weight") or 0, s.get("rpe")
+        if isinstance(reps, bool) or not isinstance(reps, int) or not 0 <= reps <= 100:
+            raise ValueError("Set 'reps' must be an integer between 0 and 100")
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not 0 <= weight <= 1000:
+            raise ValueError("Set 'weight' must be a number of kg between 0 and 1000")
+        if rpe is not None and (isinstance(rpe, bool) or not isinstance(rpe, (int, float)) or not 1 <= rpe <= 10):
+            raise ValueError("Set 'rpe' must be between 1 and 10")
+        rows.append((reps, float(weight), rpe))
+    return rows
+
+def parse_rep_range(reps):
+    """'8-12' -> (8, 12), '10' -> (10, 10). None for timed work like '30s'."""
+    parts = str(reps).split("-")
+    if len(parts) > 2 or not all(p.strip().isdigit() for p in parts):
+        return None
+    lo, hi = int(parts[0]), int(parts[-1])
+    return (lo, hi) if 0 < lo <= hi else None
+
+# --- HISTORY ---
+
+def empty_history():
+    return {"names": [], "exercise": np.zeros(0, np.int64), "day": np.zeros(0, np.int64),
+            "reps": np.zeros(0), "weight": np.zeros(0), "rpe": np.zeros(0)}
+
+def history_arrays(rows):
+    """(exercise_id, day, reps, weight, rpe) rows -> column arrays sorted by exercise, then day. day = days since 1970-01-01."""
+    if not rows:
+        return empty_history()
+    names, days, reps, weight, rpe = zip(*rows)
+    unique_names, exercise = np.unique(np.array(names), return_inverse=True)
+    day = np.array(days, dtype=np.int64)
+    order = np.lexsort((day, exercise))
+    return {
+        "names": unique_names.tolist(),
+        "exercise": exercise[order],
+        "day": day[order],
+        "reps": np.array(reps, dtype=float)[order],
+        "weight": np.array(weight, dtype=float)[order],
+        "rpe": np.array(rpe, dtype=float)[order], # None -> nan
+    }
+
+def load_history(conn, user_id, exercise_names=None):
+    """A user's set log (optionally only some exercises), straight off the (user_id, exercise_id, date) index."""
+    # SQLite turns the date into a day number, so NumPy never parses date strings
+    sql = '''
+        SELECT exercise_id, CAST(julianday(date) - 2440587.5 AS INTEGER), reps, weight, rpe
+        FROM workout_sets WHERE user_id = ?
+    '''
+
+    params = [user_id]
+    if exercise_names is not None:
+        if not exercise_names:
+            return empty_history()
+        sql += f" AND exercise_id IN ({', '.join('?' * len(exercise_names))})"
+        params.extend(exercise_names)
+    rows = conn.execute(sql + " ORDER BY exercise_id, date", params).fetchall()
+    return history_arrays([tuple(r) for r in rows])
+
+# --- MATH ---
+
+def estimate_1rm(weight, reps, rpe=None):
+    """
+    Epley e1RM per set. With RPE, reps left in reserve (10 - RPE) count as
+    reps done, so a set of 5 @ RPE 8 is treated like 7 to failure.
+    """
+    weight = np.asarray(weight, dtype=float)
+    reps = np.asarray(reps, dtype=float)
+    if rpe is not None:
+        rpe = np.asarray(rpe, dtype=float)
+        reps = reps + np.where(np.isnan(rpe), 0.0, np.clip(10.0 - rpe, 0.0, 5.0))
+    e1rm = np.where(reps <= 1, weight, weight * (1.0 + reps / 30.0))
+    return np.where(reps > 0, e1rm, 0.0)
+
+def group_starts(*keys):
+    """Start index of each run of equal keys (arrays already sorted by those keys)."""
+    n = len(keys[0])
+    if n == 0:
+        return np.zeros(0, np.int64)
+    new = np.zeros(n, dtype=bool)
+    new[0] = True
+    for k in keys:
+        new[1:] |= k[1:] != k[:-1]
+    return np.flatnonzero(new)
+
+def summarize(history):
+    """
+    Per-exercise progress from the full history:
+    {name: {"e1rm", "best_e1rm", "sessions", "last_date", "last_weight", "last_reps", "last_rpe"}}
+    """
+    if not len(history["day"]):
+        return {}
+    ex, day, reps, weight, rpe = (history[k] for k in ("exercise", "day", "reps", "weight", "rpe"))
+
+    # 1. Sets -> sessions (one exercise on one day)
+    e1rm = estimate_1rm(weight, reps, rpe)
+    starts = group_starts(ex, day)
+    s_ex = ex[starts]
+    s_day = day[starts]
+    s_e1rm = np.maximum.reduceat(e1rm, starts)
+    s_top = np.maximum.reduceat(weight, starts)
+    s_min_reps = np.minimum.reduceat(reps, starts)
+    s_rpe = np.fmax.reduceat(rpe, starts) # nan only if no set had an RPE
+
+    # 2. Sessions -> exercises
+    ex_starts = group_starts(s_ex)
+    counts = np.diff(np.r_[ex_starts, len(s_ex)])
+    last = ex_starts + counts - 1
+    best = np.maximum.reduceat(s_e1rm, ex_starts)
+    # Each session compared against its exercise's latest session day
+    recent = s_day >= np.repeat(s_day[last], counts) - RECENT_DAYS
+    current = np.maximum.reduceat(np.where(recent, s_e1rm, 0.0), ex_starts)
+
+    last_dates = np.array(s_day[last], dtype="datetime64[D]").astype(str)
+    out = {}
+    for i, code in enumerate(s_ex[ex_starts].tolist()):
+        j = last[i]
+        out[history["names"][code]] = {
+            "e1rm": round(float(current[i]), 1),
+            "best_e1rm": round(float(best[i]), 1),
+            "sessions": int(counts[i]),
+            "last_date": str(last_dates[i]),
+            "last_weight": float(s_top[j]),
+            "last_reps": int(s_min_reps[j]),
+            "last_rpe": None if np.isnan(s_rpe[j]) else float(s_rpe[j]),
+        }
+    return out
+
+def weekly_volume(history, since=None):
+    """
+    Sets and tonnage (reps x kg) per muscle group per week (Monday start):
+    [{"week": "YYYY-MM-DD", "muscle", "sets", "volume"}] oldest first.
+    """
+    day = history["day"]
+    if not len(day):
+        return []
+    muscles = sorted({muscle_group(n) for n in history["names"]})
+    muscle_of_exercise = np.array([muscles.index(muscle_group(n)) for n in history["names"]])
+
+    mask = np.ones(len(day), dtype=bool) if since is None else day >= np.datetime64(since, "D").astype(np.int64)
+    week = day[mask] - (day[mask] + 3) % 7 # 1970-01-01 was a Thursday
+    muscle = muscle_of_exercise[history["exercise"][mask]]
+    key = week * len(muscles) + muscle
+
+    keys, inverse = np.unique(key, return_inverse=True)
+    sets = np.bincount(inverse)
+    volume = np.bincount(inverse, weights=history["reps"][mask] * history["weight"][mask])
+    weeks = np.array(keys // len(muscles), dtype="datetime64[D]").astype(str)
+    return [
+        {"week": str(w), "muscle": muscles[m], "sets": int(s), "volume": round(float(v), 1)}
+        for w, m, s, v in zip(weeks, (keys % len(muscles)).tolist(), sets.tolist(), volume.tolist())
+    ]
+
+def next_targets(summary, exercises):
+    """
+    Next-session {"weight", "reps"} for each planned exercise with history
+    ({"name", "reps": "8-12"}). Double progression, vectorized across exercises:
+    - top of the range on every set -> add load (from the e1RM at the bottom of the range, +1 increment minimum), reset reps
+    - inside the range -> same load, one more rep (repeat the reps after a near-max RPE)
+    - below the range -> back off to a load the e1RM says fits the bottom of the range
+    Bodyweight moves (no load) just add a rep.
+    """
+    picked = []
+    for ex in exercises:
+        rep_range = parse_rep_range(ex.get("reps"))
+        if rep_range and ex["name"] in summary:
+            picked.append((ex["name"], rep_range, summary[ex["name"]]))
+    if not picked:
+        return {}
+
+    lo = np.array([r[0] for _, r, _ in picked], dtype=float)
+    hi = np.array([r[1] for _, r, _ in picked], dtype=float)
+    e1rm = np.array([s["e1rm"] for _, _, s in picked])
+    top = np.array([s["last_weight"] for _, _, s in picked])
+    done = np.array([s["last_reps"] for _, _, s in picked], dtype=float)
+    rpe = np.array([np.nan if s["last_rpe"] is None else s["last_rpe"] for _, _, s in picked])
+
+    def round_down(kg):
+        return np.floor(kg / LOAD_INCREMENT) * LOAD_INCREMENT
+
+    at_lo = round_down(e1rm / (1.0 + (lo + TARGET_RIR) / 30.0))
+    step_up = np.clip(at_lo, top + LOAD_INCREMENT, np.maximum(round_down(top * (1 + MAX_LOAD_JUMP)), top + LOAD_INCREMENT))
+    above, below = done >= hi, done < lo
+    grind = np.nan_to_num(rpe) >= HIGH_RPE
+
+    weight = np.where(above, step_up, np.where(below, np.minimum(at_lo, top), top))
+    reps = np.where(above | below, lo, np.where(grind, done, done + 1))
+
+    bodyweight = top <= 0
+    weight = np.where(bodyweight, 0.0, weight)
+    reps = np.where(bodyweight, done + 1, reps)
+
+    return {
+        name: {"weight": float(w), "reps": int(r), "e1rm": s["e1rm"]}
+        for (name, _, s), w, r in zip(picked, weight.tolist(), reps.tolist())
+    }
+
+# --- QUERIES (run on the DB executor) ---
+
+def targets_for(conn, user_id, exercises):
+    """Targets for a list of planned exercises, reading only those exercises' history."""
+    names = sorted({ex["name"] for ex in exercises})
+    return next_targets(summarize(load_history(conn, user_id, names)), exercises)
+
+def training_summary(conn, user_id, today, weeks=12):
+    """Everything /workout/analytics shows, from one pass over the full history."""
+    history = load_history(conn, user_id)
+    since = today - datetime.timedelta(days=7 * weeks - 1)
+    return {
+        "exercises": summarize(history),
+        "weekly_volume": weekly_volume(history, since - datetime.timedelta(days=since.weekday())),
+        "total_sets": int(len(history["day"])),
+    }
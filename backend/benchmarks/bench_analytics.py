@@ -0,0 +1,133 @@
+"""
+Benchmark for the progressive-overload engine over synthetic multi-year histories.
+
+Generates a realistic set log (4 sessions/week, 5 exercises/session, 3-5 sets,
+slowly progressing loads with noise and optional RPE), then times the NumPy
+passes in backend.analytics against a straightforward per-row Python version
+of the same computations, and checks they agree.
+
+    python -m backend.benchmarks.bench_analytics --years 1 3 10 --rounds 20
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.analytics import (
+    history_arrays, summarize, weekly_volume, next_targets, RECENT_DAYS
+)
+from backend.trainer_engine import exercise_vocabulary, muscle_group
+
+EPOCH = datetime.date(1970, 1, 1)
+
+def synthetic_rows(years, seed=7):
+    """(exercise_id, date, reps, weight, rpe) rows as stored in workout_sets."""
+    rng = random.Random(seed)
+    vocab = exercise_vocabulary()
+    start = datetime.date.today() - datetime.timedelta(days=365 * years)
+    base = {name: rng.uniform(20, 100) for name in vocab}
+    rows = []
+    for d in range(365 * years):
+        day = start + datetime.timedelta(days=d)
+        if day.weekday() not in (0, 1, 3, 4):
+            continue
+        date_str = day.isoformat()
+        progress = 1 + 0.3 * d / (365 * years)
+        for name in rng.sample(vocab, 5):
+            load = round(base[name] * progress * rng.uniform(0.95, 1.05) / 2.5) * 2.5
+            for _ in range(rng.randint(3, 5)):
+                rpe = rng.choice((None, 7, 7.5, 8, 8.5, 9, 10))
+                rows.append((name, date_str, rng.randint(5, 12), load, rpe))
+    rows.sort(key=lambda r: (r[0], r[1]))
+    return rows
+
+def legacy_epley(weight, reps, rpe):
+    if rpe is not None:
+        reps += min(max(10 - rpe, 0), 5)
+    if reps <= 0:
+        return 0.0
+    return weight if reps <= 1 else weight * (1 + reps / 30)
+
+def legacy_summarize(rows):
+    """Per-row Python loops over the same rows, kept here as the baseline."""
+    sessions = defaultdict(lambda: defaultdict(list))
+    for name, date_str, reps, weight, rpe in rows:
+        sessions[name][date_str].append((reps, weight, rpe))
+
+    out = {}
+    for name, by_date in sessions.items():
+        dates = sorted(by_date)
+        per_session = {d: max(legacy_epley(w, r, p) for r, w, p in by_date[d]) for d in dates}
+        last = dates[-1]
+        last_day = datetime.date.fromisoformat(last)
+        cutoff = (last_day - datetime.timedelta(days=RECENT_DAYS)).isoformat()
+        rpes = [p for _, _, p in by_date[last] if p is not None]
+        out[name] = {
+            "e1rm": round(max(v for d, v in per_session.items() if d >= cutoff), 1),
+            "best_e1rm": round(max(per_session.values()), 1),
+            "sessions": len(dates),
+            "last_date": last,
+            "last_weight": max(w for _, w, _ in by_date[last]),
+            "last_reps": min(r for r, _, _ in by_date[last]),
+            "last_rpe": max(rpes) if rpes else None,
+        }
+    return out
+
+def legacy_weekly_volume(rows):
+    totals = defaultdict(lambda: [0, 0.0])
+    for name, date_str, reps, weight, _ in rows:
+        day = datetime.date.fromisoformat(date_str)
+        week = (day - datetime.timedelta(days=day.weekday())).isoformat()
+        t = totals[(week, muscle_group(name))]
+        t[0] += 1
+        t[1] += reps * weight
+    return [{"week": w, "muscle": m, "sets": s, "volume": round(v, 1)} for (w, m), (s, v) in sorted(totals.items())]
+
+def best_of(fn, rounds):
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 3, 10], help="History lengths to generate")
+    parser.add_argument("--rounds", type=int, default=20, help="Timed repetitions (best is reported)")
+    args = parser.parse_args()
+
+    plan = [{"name": name, "reps": "8-12"} for name in exercise_vocabulary()]
+    print(f"{'history':<10}{'sets':>9}{'arrays ms':>11}{'numpy ms':>10}{'python ms':>11}{'speedup':>9}  match")
+    for years in args.years:
+        rows = synthetic_rows(years)
+
+        # What load_history() gets back from SQLite: the date already as a day number
+        day_rows = [(n, (datetime.date.fromisoformat(d) - EPOCH).days, r, w, p) for n, d, r, w, p in rows]
+        history = history_arrays(day_rows)
+        fast = summarize(history)
+        slow = legacy_summarize(rows)
+        vol_fast = weekly_volume(history)
+        vol_slow = legacy_weekly_volume(rows)
+        same = fast == slow and len(vol_fast) == len(vol_slow) and all(
+            a["week"] == b["week"] and a["muscle"] == b["muscle"] and a["sets"] == b["sets"]
+            and abs(a["volume"] - b["volume"]) < 0.5 for a, b in zip(vol_fast, vol_slow))
+
+        def engine():
+            weekly_volume(history)
+            return next_targets(summarize(history), plan)
+
+        t_arrays = best_of(lambda: history_arrays(day_rows), args.rounds)
+        t_numpy = best_of(engine, args.rounds)
+        t_python = best_of(lambda: (legacy_summarize(rows), legacy_weekly_volume(rows)), max(1, args.rounds // 4))
+
+        print(f"{str(years) + 'y':<10}{len(rows):>9}{t_arrays * 1e3:>11.2f}{t_numpy * 1e3:>10.2f}"
+              f"{t_python * 1e3:>11.2f}{t_python / t_numpy:>8.1f}x  {'yes' if same else 'NO'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Mixed login + browsing benchmark for password hashing.
+
+A burst of logins (fetch user + bcrypt verify) runs alongside steady browsing
+clients (the profile query through the DB executor). First bcrypt runs inline
+in the coroutine (old behaviour), then on the bounded hashing executor.
+Browsing latency is measured from each request's scheduled arrival, so time
+spent behind a blocked event loop counts against it.
+
+    python -m backend.benchmarks.bench_auth_concurrency --logins 40 --browsers 20 --rounds 12
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+TMP_DIR = tempfile.mkdtemp(prefix="fitapp-bench-")
+os.environ["FITAPP_DB"] = os.path.join(TMP_DIR, "bench.db")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.database import init_db, db_connection, run_query
+from backend.passwords import hash_password_sync, verify_password_sync, verify_password, hashing_stats, HashingBusy
+from backend.routers.auth import fetch_user_by_email
+from backend.routers.profile import load_profile
+
+PASSWORD = "correct horse battery staple"
+
+def seed(users, rounds):
+    hashed = hash_password_sync(PASSWORD, rounds)
+    today = datetime.date.today()
+    with db_connection() as conn:
+        conn.executemany("INSERT INTO users (id, email, password_hash, name) VALUES (?, ?, ?, ?)",
+                         [(u, f"user{u}@bench.local", hashed, f"User {u}") for u in range(1, users + 1)])
+        conn.executemany("INSERT INTO weight_logs (user_id, date, weight) VALUES (?, ?, ?)",
+                         [(u, (today - datetime.timedelta(days=d)).isoformat(), 80.0)
+                          for u in range(1, users + 1) for d in range(90)])
+        conn.commit()
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] if values else 0.0
+
+async def login_inline(email):
+    user = await run_query(fetch_user_by_email, email)
+    return verify_password_sync(PASSWORD, user["password_hash"])
+
+async def login_executor(email):
+    user = await run_query(fetch_user_by_email, email)
+    return await verify_password(PASSWORD, user["password_hash"])
+
+async def heartbeat(stop, lags, interval=0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+async def scenario(login, logins, browsers, requests, interval, users):
+    loop = asyncio.get_running_loop()
+    today = datetime.date.today()
+    browse_lat, login_lat, lags = [], [], []
+    rejected = 0
+    stop = asyncio.Event()
+    start = loop.time()
+
+    async def browser(offset):
+        for i in range(requests):
+            arrival = start + offset + i * interval
+            await asyncio.sleep(max(0.0, arrival - loop.time()))
+            await run_query(load_profile, random.randint(1, users), today)
+            browse_lat.append(loop.time() - arrival)
+
+    async def login_client(arrival):
+        nonlocal rejected
+        await asyncio.sleep(max(0.0, arrival - loop.time()))
+        try:
+            assert await login(f"user{random.randint(1, users)}@bench.local")
+            login_lat.append(loop.time() - arrival)
+        except HashingBusy:
+            rejected += 1
+
+    # Logins arrive as a burst over the first second, browsing runs throughout
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.gather(
+        *(browser(random.random() * interval) for _ in range(browsers)),
+        *(login_client(start + random.random()) for _ in range(logins)),
+    )
+    wall = loop.time() - start
+    stop.set()
+    await beat
+    return browse_lat, login_lat, lags, rejected, wall
+
+def report(label, browse_lat, login_lat, lags, rejected, wall):
+    b = [x * 1000 for x in browse_lat]
+    l = [x * 1000 for x in login_lat]
+    print(f"{label:<18} browse p50={percentile(b, 50):7.1f}ms p99={percentile(b, 99):7.1f}ms | "
+          f"login p50={percentile(l, 50):7.1f}ms p99={percentile(l, 99):7.1f}ms ok={len(l)} rejected={rejected} | "
+          f"max loop stall={max(lags, default=0) * 1000:6.1f}ms | wall={wall:5.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40, help="Logins in the burst")
+    parser.add_argument("--browsers", type=int, default=20, help="Concurrent browsing clients")
+    parser.add_argument("--requests", type=int, default=20, help="Page loads per browsing client")
+    parser.add_argument("--interval", type=float, default=0.25, help="Seconds between a client's page loads")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor of the stored hashes")
+    args = parser.parse_args()
+
+    try:
+        init_db()
+        seed(args.users, args.rounds)
+        print(f"{args.logins} logins (bcrypt cost {args.rounds}) + {args.browsers} browsers x {args.requests} page loads")
+        for label, login in (("inline bcrypt", login_inline), ("hashing executor", login_executor)):
+            report(label, *asyncio.run(scenario(login, args.logins, args.browsers, args.requests, args.interval, args.users)))
+        print(hashing_stats())
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
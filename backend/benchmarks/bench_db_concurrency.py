@@ -0,0 +1,121 @@
+"""
+Concurrency benchmark for DB access from async handlers.
+
+Runs N parallel clients hitting the profile query, first calling sqlite3 inline
+on the event loop (old behaviour), then through the DB executor (run_query).
+
+    python -m backend.benchmarks.bench_db_concurrency --clients 50 --requests 20
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+# Point the app at a throwaway DB before backend.database is imported
+TMP_DIR = tempfile.mkdtemp(prefix="fitapp-bench-")
+os.environ["FITAPP_DB"] = os.path.join(TMP_DIR, "bench.db")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.database import init_db, db_connection, run_query, pool_stats
+from backend.routers.profile import load_profile
+from backend.activity import record_activity
+
+def seed(users, days):
+    today = datetime.date.today()
+    with db_connection() as conn:
+        for uid in range(1, users + 1):
+            conn.execute("INSERT INTO users (id, email, password_hash, name) VALUES (?, ?, 'x', ?)",
+                         (uid, f"user{uid}@bench.local", f"User {uid}"))
+            rows = []
+            active = []
+            for d in reversed(range(days)):
+                if random.random() < 0.6:
+                    date_str = (today - datetime.timedelta(days=d)).strftime("%Y-%m-%d")
+                    rows += [(uid, date_str, f"Exercise {i}", 3, "8-12") for i in range(5)]
+                    active.append(date_str)
+            conn.executemany("INSERT INTO workouts (user_id, date, exercise_id, sets, reps, completed) VALUES (?, ?, ?, ?, ?, 1)", rows)
+            # Same write hooks as the app (rollup + streak), oldest day first
+            for date_str in active:
+                record_activity(conn, uid, date_str)
+            conn.executemany("INSERT INTO weight_logs (user_id, date, weight) VALUES (?, ?, ?)",
+                             [(uid, (today - datetime.timedelta(days=d)).strftime("%Y-%m-%d"), 80 + random.random()) for d in range(days)])
+        conn.commit()
+
+def percentile(values, pct):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+async def blocking_call(user_id, today):
+    with db_connection() as conn:
+        return load_profile(conn, user_id, today)
+
+async def executor_call(user_id, today):
+    return await run_query(load_profile, user_id, today)
+
+async def heartbeat(stop, lags, interval=0.005):
+    """Measures how late the event loop wakes up (how long it was blocked)."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+async def run_clients(call, clients, requests, users, interval):
+    """
+    Each client sends `requests` requests on a fixed schedule. Latency is measured
+    from the scheduled arrival time, so time spent waiting behind a blocked event
+    loop counts against the request, as it would for a real HTTP client.
+    """
+    today = datetime.date.today()
+    latencies = []
+    lags = []
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def client(offset):
+        for i in range(requests):
+            arrival = start + offset + i * interval
+            await asyncio.sleep(max(0.0, arrival - loop.time()))
+            await call(random.randint(1, users), today)
+            latencies.append(loop.time() - arrival)
+
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.gather(*(client(random.random() * interval) for _ in range(clients)))
+    wall = loop.time() - start
+    stop.set()
+    await beat
+    return latencies, lags, wall
+
+def report(label, latencies, lags, wall):
+    ms = [l * 1000 for l in latencies]
+    print(f"{label:<20} p50={percentile(ms, 50):8.2f}ms  p95={percentile(ms, 95):8.2f}ms  "
+          f"p99={percentile(ms, 99):8.2f}ms  max loop stall={max(lags, default=0) * 1000:7.2f}ms  "
+          f"throughput={len(ms) / wall:7.1f} req/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365, help="Days of history per user")
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between a client's requests")
+    args = parser.parse_args()
+
+    init_db()
+    print(f"Seeding {args.users} users x {args.days} days into {os.environ['FITAPP_DB']} ...")
+    seed(args.users, args.days)
+
+    print(f"{args.clients} clients x {args.requests} requests")
+    report("before (inline)", *asyncio.run(run_clients(blocking_call, args.clients, args.requests, args.users, args.interval)))
+    report("after (run_query)", *asyncio.run(run_clients(executor_call, args.clients, args.requests, args.users, args.interval)))
+    print(pool_stats())
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
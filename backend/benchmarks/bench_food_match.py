@@ -0,0 +1,67 @@
+"""
+Per-scan cost of mapping classifier predictions to food_db.json entries.
+
+"before" is the old loop: every prediction x every food x every keyword,
+substring-checked on each scan. "after" is the precomputed label index
+(database_service.build_label_index): built once, then one dict lookup per
+prediction. Uses a synthetic food DB of --foods items and 1000 synthetic labels,
+so it runs without the exported ImageNet labels file.
+
+    python -m backend.benchmarks.bench_food_match --foods 100 1000 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import database_service
+
+def old_find(predictions, food_db):
+    for pred in predictions:
+        predicted_label = pred[1].lower().replace('_', ' ')
+        for food_item in food_db:
+            for keyword in food_item['keywords']:
+                if keyword in predicted_label:
+                    return food_item
+    return None
+
+def synthetic(n_foods, n_labels=1000, seed=0):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9))) for _ in range(3000)]
+    labels = [(f"n{i:08d}", "_".join(rng.sample(words, rng.randint(1, 2)))) for i in range(n_labels)]
+    foods = [{"id": f"food_{i}", "name": f"Food {i}", "keywords": rng.sample(words, 3),
+              "calories": 100, "protein": 1, "carbs": 1, "fat": 1} for i in range(n_foods)]
+    return labels, foods
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--foods", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--scans", type=int, default=2000)
+    args = parser.parse_args()
+
+    for n_foods in args.foods:
+        labels, foods = synthetic(n_foods)
+        database_service.FOOD_DB = foods
+        database_service.FOOD_BY_ID = {f['id']: f for f in foods}
+        t0 = time.perf_counter()
+        database_service.build_label_index(labels)
+        build = time.perf_counter() - t0
+
+        rng = random.Random(1)
+        scans = [[(w, l, p) for (w, l), p in zip(rng.sample(labels, 5), (0.5, 0.2, 0.1, 0.05, 0.02))] for _ in range(args.scans)]
+        t0 = time.perf_counter()
+        for predictions in scans:
+            old_find(predictions, foods)
+        before = (time.perf_counter() - t0) / len(scans)
+        t0 = time.perf_counter()
+        for predictions in scans:
+            database_service.find_nutrition_by_classification(predictions)
+        after = (time.perf_counter() - t0) / len(scans)
+        print(f"foods={n_foods:<6} before={before * 1e6:9.1f}us/scan  after={after * 1e6:6.1f}us/scan  "
+              f"(index build {build * 1000:.0f}ms, once)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark for exercise -> GIF resolution over the full exercise vocabulary.
+
+Compares the original per-call lookup chain with the compiled GifResolver
+(cold, memoized, and batch), and checks both give the same answers.
+
+    python -m backend.benchmarks.bench_gif_resolver --rounds 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.trainer_engine import (
+    KNOWN_GIFS, GIF_ALIASES, GifResolver, exercise_vocabulary, placeholder_gif
+)
+from backend.routers.exercises import EXERCISES_DB
+
+def legacy_get_exercise_gif(name):
+    """The pre-resolver implementation, kept here as the baseline."""
+    if name in KNOWN_GIFS:
+        return KNOWN_GIFS[name]
+    lower_name = name.lower()
+    if "squat" in lower_name: return KNOWN_GIFS["Barbell Squat"]
+    if "push-up" in lower_name: return KNOWN_GIFS["Push-Ups"]
+    if "pull-up" in lower_name: return KNOWN_GIFS["Pull-Ups"]
+    if "bench press" in lower_name: return KNOWN_GIFS["Bench Press"]
+    if "curl" in lower_name: return KNOWN_GIFS["Barbell Curl"]
+    return placeholder_gif(name)
+
+def build_vocabulary():
+    names = set(exercise_vocabulary()) | set(KNOWN_GIFS)
+    for cat in EXERCISES_DB:
+        names.update(ex["name"] for ex in cat["exercises"])
+    return sorted(names)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000, help="Passes over the whole vocabulary")
+    args = parser.parse_args()
+
+    vocab = build_vocabulary()
+    resolver = GifResolver(KNOWN_GIFS, GIF_ALIASES)
+
+    mismatches = [n for n in vocab if legacy_get_exercise_gif(n) != resolver.resolve(n)]
+    print(f"Vocabulary: {len(vocab)} exercises, mismatches vs legacy: {len(mismatches)} {mismatches}")
+
+    def legacy():
+        for name in vocab:
+            legacy_get_exercise_gif(name)
+
+    def cold():
+        fresh = GifResolver(KNOWN_GIFS, GIF_ALIASES)
+        for name in vocab:
+            fresh.resolve(name)
+
+    def warm():
+        for name in vocab:
+            resolver.resolve(name)
+
+    def batch():
+        resolver.resolve_many(vocab)
+
+    for label, fn, rounds in (
+        ("legacy chain", legacy, args.rounds),
+        ("cold (incl. compile)", cold, max(1, args.rounds // 20)),
+        ("resolver (memoized)", warm, args.rounds),
+        ("resolve_many (batch)", batch, args.rounds),
+    ):
+        elapsed = timeit.timeit(fn, number=rounds)
+        print(f"{label:<22} {elapsed * 1e9 / (rounds * len(vocab)):8.1f} ns/name")
+
+    print(resolver.cache_info())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Load test for the XP leaderboard at hundreds of thousands of users.
+
+Seeds a temporary database with N users and skewed lifetime XP, then measures:
+- rebuilding the in-memory rank index from SQLite (startup cost)
+- "my rank" through the Fenwick index vs a COUNT(*) over the total_xp index
+  vs sorting everyone (the naive approach)
+- global top-K through the (total_xp DESC, user_id) index
+- mixed XP awards + rank lookups from several threads, verified against a
+  full sort at the end
+
+    python -m backend.benchmarks.bench_leaderboard --users 10000 100000 300000 --threads 8
+"""
+import argparse
+import bisect
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+TMP_DIR = tempfile.mkdtemp(prefix="fitapp-bench-")
+os.environ["FITAPP_DB"] = os.path.join(TMP_DIR, "bench.db")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.database import init_db, db_connection
+from backend.leaderboard import Leaderboard, load_leaderboard, global_leaderboard
+
+XP_PER_WORKOUT = 50
+
+def seed(conn, n, rng):
+    """n users; most train a little, a few train a lot (lifetime XP in workout-sized steps)."""
+    conn.execute("DELETE FROM user_stats")
+    conn.execute("DELETE FROM users")
+    conn.executemany("INSERT INTO users (id, email, password_hash, name) VALUES (?, ?, 'x', ?)",
+                     ((i, f"user{i}@bench.local", f"User {i}") for i in range(1, n + 1)))
+    stats = []
+    for i in range(1, n + 1):
+        workouts = min(int(rng.paretovariate(1.2) * 10), 2 * 365 * 20) # Capped at twice a day for 20 years
+        total = workouts * XP_PER_WORKOUT
+        level = 1
+        while total - 50 * level * (level + 1) >= 0:
+            level += 1
+        stats.append((i, total - 50 * level * (level - 1), level, total))
+    conn.executemany("INSERT INTO user_stats (user_id, xp, level, total_xp) VALUES (?, ?, ?, ?)", stats)
+    conn.commit()
+
+def per_op_us(fn, args_list):
+    t0 = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - t0) * 1e6 / len(args_list)
+
+def run(n, threads, lookups, rng):
+    board = Leaderboard(resync=float("inf"))
+    with db_connection() as conn:
+        seed(conn, n, rng)
+
+        t0 = time.perf_counter()
+        load_leaderboard(conn, board)
+        rebuild_ms = (time.perf_counter() - t0) * 1e3
+
+        sample = [(rng.randint(1, n),) for _ in range(lookups)]
+
+        def sql_rank(user_id):
+            xp = conn.execute("SELECT total_xp FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()[0]
+            return 1 + conn.execute("SELECT COUNT(*) FROM user_stats WHERE total_xp > ?", (xp,)).fetchone()[0]
+
+        def sort_rank(user_id):
+            rows = conn.execute("SELECT user_id, total_xp FROM user_stats").fetchall()
+            ordered = sorted((r[1] for r in rows), reverse=True)
+            mine = next(r[1] for r in rows if r[0] == user_id)
+            return 1 + sum(1 for xp in ordered if xp > mine)
+
+        fenwick_us = per_op_us(board.rank, sample)
+        sql_us = per_op_us(sql_rank, sample[: max(1, lookups // 20)])
+        sort_us = per_op_us(sort_rank, sample[:3])
+        topk_us = per_op_us(lambda: global_leaderboard(conn, 1, 10, board), [()] * 200)
+
+        # Sanity: index agrees with SQL
+        bad = sum(1 for (u,) in sample[:200] if board.rank(u)[0] != sql_rank(u))
+
+    # Mixed load: each thread awards XP and looks up ranks on its own users
+    scores = dict(board._scores)
+    per_thread = lookups // threads
+    lock = threading.Lock()
+    latencies = []
+
+    def worker(seed_value):
+        local = random.Random(seed_value)
+        mine = []
+        for _ in range(per_thread):
+            user_id = local.randint(1, n)
+            t0 = time.perf_counter()
+            if local.random() < 0.2:
+                with lock:
+                    scores[user_id] += XP_PER_WORKOUT
+                    board.set_score(user_id, scores[user_id])
+            else:
+                board.rank(user_id)
+            mine.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(mine)
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    p99_us = latencies[int(len(latencies) * 0.99)] * 1e6
+    ordered = sorted(scores.values(), reverse=True)
+    neg = [-x for x in ordered]
+    checks = rng.sample(range(1, n + 1), 500)
+    mixed_bad = sum(1 for u in checks if board.rank(u)[0] != 1 + bisect.bisect_left(neg, -scores[u]))
+
+    print(f"{n:>8} users | rebuild {rebuild_ms:7.1f} ms | rank: fenwick {fenwick_us:6.2f} us, "
+          f"SQL COUNT {sql_us:8.1f} us, sort-all {sort_us / 1000:8.1f} ms | top-10 {topk_us:6.1f} us | "
+          f"mixed {len(latencies) / elapsed:9.0f} ops/s p99 {p99_us:5.1f} us | mismatches {bad + mixed_bad}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    try:
+        init_db()
+        rng = random.Random(42)
+        for n in args.users:
+            run(n, args.threads, args.lookups, rng)
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
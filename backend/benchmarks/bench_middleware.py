@@ -0,0 +1,135 @@
+"""
+Microbenchmark of the auth middleware stack.
+
+Drives two otherwise identical apps straight through ASGI (no sockets, no
+HTTP client), so the numbers are the framework + middleware cost per request:
+- before: the old `@app.middleware("http")` session check (BaseHTTPMiddleware),
+  given the same public-path table so both apps answer the same statuses
+  (the old list redirected /static/ and /healthz to /login)
+- after:  backend.middleware.AuthMiddleware (raw ASGI, public-path bypass)
+
+Each case reports the best of --repeat runs.
+
+Routes: a static asset, /healthz, and an authenticated JSON endpoint (session
+cookie already in the user-context cache, as on a warm worker).
+
+    python -m backend.benchmarks.bench_middleware --requests 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+TMP_DIR = tempfile.mkdtemp(prefix="fitapp-bench-")
+os.environ["FITAPP_DB"] = os.path.join(TMP_DIR, "bench.db")
+os.environ.setdefault("FITAPP_SESSION_SECRET", "bench-only-secret")
+os.environ["FITAPP_SESSION_CACHE_TTL"] = "3600" # No DB here: the cached context must outlive the run
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from fastapi import FastAPI, Request, Depends
+from fastapi.responses import PlainTextResponse, RedirectResponse
+from backend.middleware import AuthMiddleware, PUBLIC_PATHS, PUBLIC_PREFIXES
+from backend.sessions import SESSION_COOKIE, SESSION_CACHE, resolve_session, sign_session, current_user
+
+USER = {"id": 1, "name": "Bench", "epoch": 0, "settings": None}
+
+def add_routes(app):
+    @app.get("/static/app.css")
+    async def asset():
+        return PlainTextResponse("body{}", media_type="text/css")
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/me")
+    async def me(user = Depends(current_user)):
+        return {"id": user["id"], "name": user["name"]}
+    return app
+
+def before_app():
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def auth_middleware(request: Request, call_next):
+        if request.url.path in PUBLIC_PATHS or request.url.path.startswith(PUBLIC_PREFIXES):
+            return await call_next(request)
+        user = await resolve_session(request.cookies.get(SESSION_COOKIE))
+        if user is None:
+            return RedirectResponse(url="/login")
+        request.state.user = user
+        return await call_next(request)
+    return add_routes(app)
+
+def after_app():
+    app = FastAPI()
+    app.add_middleware(AuthMiddleware)
+    return add_routes(app)
+
+async def call(app, path, cookie):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"cookie", cookie)] if cookie else [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    sent = []
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if body_sent:
+            await asyncio.Event().wait() # Client stays connected (BaseHTTPMiddleware polls for disconnects)
+        body_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+async def throughput(app, path, cookie, requests, concurrency):
+    per_client = requests // concurrency
+
+    async def client():
+        for _ in range(per_client):
+            await call(app, path, cookie)
+
+    statuses = {await call(app, path, cookie)} # Warm-up, and what the client would see
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return per_client * concurrency / (time.perf_counter() - t0), statuses.pop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        SESSION_CACHE.put(USER["id"], USER)
+        cookie = f"{SESSION_COOKIE}={sign_session(USER['id'], USER['epoch'])}".encode()
+        cases = (
+            ("static asset, no cookie", "/static/app.css", None),
+            ("healthz, no cookie", "/healthz", None),
+            ("authenticated /me", "/me", cookie),
+        )
+        apps = (("before", before_app()), ("after", after_app()))
+        print(f"{args.requests} requests per case, {args.concurrency} concurrent clients")
+        for label, path, case_cookie in cases:
+            results = {name: max(asyncio.run(throughput(app, path, case_cookie, args.requests, args.concurrency))
+                                 for _ in range(args.repeat))
+                       for name, app in apps}
+            (before, before_status), (after, after_status) = results["before"], results["after"]
+            print(f"{label:<24} before {before:8.0f} req/s (HTTP {before_status}) | "
+                  f"after {after:8.0f} req/s (HTTP {after_status}) | x{after / before:4.2f}")
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Compares scanner inference backends (see backend/services/inference_backends.py).
+
+Each backend runs in its own process so memory numbers don't mix. It reports:
+
+- load time, and RSS once the model is loaded (plus peak RSS);
+- single-image latency (p50/p99 of one forward pass plus decode);
+- throughput at --batch images per forward pass;
+- top-1 and top-5 agreement with the first backend listed, on the same fixture
+  photos. Full agreement is not expected from int8; this measures how far off it is.
+
+    python -m backend.benchmarks.bench_scan_backends --images backend/data/scan_fixtures --backends keras tflite
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT)
+
+from backend.services.export_model import DEFAULT_CALIBRATION_DIR, list_images
+
+def rss_mb():
+    """Current resident set size (Linux), falling back to the peak."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] if values else 0.0
+
+def worker(name, files, repeats, batch_size):
+    """Runs in the child process: measures one backend, prints one JSON line."""
+    from backend.services.inference_backends import BACKENDS
+    from backend.services.local_ai_service import prepare_image
+
+    base_rss = rss_mb()
+    t0 = time.perf_counter()
+    bundle = BACKENDS[name]()
+    load_seconds = time.perf_counter() - t0
+    loaded_rss = rss_mb()
+
+    inputs = []
+    for path in files:
+        with open(path, "rb") as f:
+            inputs.append(prepare_image(f.read()))
+
+    # 1. Latency: one image per forward pass
+    latencies, top5 = [], []
+    for _ in range(repeats):
+        for x in inputs:
+            t0 = time.perf_counter()
+            bundle["decode"](bundle["predict"](x[np.newaxis])[0])
+            latencies.append((time.perf_counter() - t0) * 1000)
+    for x in inputs:
+        top5.append([p[0] for p in bundle["decode"](bundle["predict"](x[np.newaxis])[0])])
+
+    # 2. Throughput: batch_size images per forward pass
+    batch = np.stack([inputs[i % len(inputs)] for i in range(batch_size)])
+    bundle["predict"](batch) # Warm-up (TFLite re-plans for the new batch size)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        bundle["predict"](batch)
+    throughput = repeats * batch_size / (time.perf_counter() - t0)
+
+    print(json.dumps({
+        "backend": name,
+        "load_s": load_seconds,
+        "rss_mb": loaded_rss,
+        "model_rss_mb": loaded_rss - base_rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "throughput": throughput,
+        "top5": top5,
+    }))
+
+def agreement(reference, other):
+    top1 = np.mean([a[0] == b[0] for a, b in zip(reference, other)])
+    top5 = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(reference, other)])
+    return top1, top5
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=DEFAULT_CALIBRATION_DIR, help="Folder of fixture photos")
+    parser.add_argument("--backends", nargs="+", default=["keras", "tflite"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    files = list_images(args.images)
+    if not files:
+        sys.exit(f"No images in {args.images}")
+    if args.worker:
+        return worker(args.worker, files, args.repeats, args.batch)
+
+    from backend.services.inference_backends import backend_available
+
+    results = []
+    for name in args.backends:
+        if not backend_available(name):
+            print(f"{name:<8} skipped: runtime not installed or model not exported")
+            continue
+        out = subprocess.run(
+            [sys.executable, "-m", "backend.benchmarks.bench_scan_backends", "--worker", name, "--images", args.images,
+             "--repeats", str(args.repeats), "--batch", str(args.batch)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"{len(files)} fixture images, batch={args.batch}")
+    for r in results:
+        top1, top5 = agreement(results[0]["top5"], r["top5"])
+        print(f"{r['backend']:<8} load={r['load_s']:5.1f}s rss={r['rss_mb']:6.0f}MB (model +{r['model_rss_mb']:.0f}MB, "
+              f"peak {r['peak_rss_mb']:.0f}MB) | p50={r['p50_ms']:6.1f}ms p99={r['p99_ms']:6.1f}ms | "
+              f"{r['throughput']:7.1f} img/s | vs {results[0]['backend']}: top1={top1:.0%} top5={top5:.0%}")
+
+if __name__ == "__main__":
+    main()
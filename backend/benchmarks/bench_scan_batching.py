@@ -0,0 +1,112 @@
+"""
+Throughput benchmark for the scan micro-batching queue.
+
+N concurrent clients each submit images back to back through BatchingQueue,
+first with batching off (max_batch=1: one forward pass per scan, the old
+behaviour minus the blocked event loop), then with batching on.
+
+--model keras uses the real MobileNetV2 (whichever FITAPP_SCAN_BACKEND selects:
+Keras or int8 TFLite, see inference_backends.py). --model synthetic
+is a stand-in for hosts without it: a fixed per-call overhead (framework
+dispatch) plus a real BLAS matmul per image, so it rewards batching the same
+way a CNN forward pass does, just with made-up constants.
+
+Then times a multi-food scan: its crops as one submit_batch block vs. one pass each.
+
+    python -m backend.benchmarks.bench_scan_batching --concurrency 1 4 16 64 --model synthetic
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.inference_queue import BatchingQueue
+
+def synthetic_model(call_overhead_ms):
+    weights = np.random.default_rng(0).standard_normal((56 * 56 * 3, 1000)).astype(np.float32)
+
+    def predict(batch):
+        time.sleep(call_overhead_ms / 1000)
+        logits = batch[:, ::4, ::4, :].reshape(len(batch), -1) @ weights
+        return logits - logits.max(axis=1, keepdims=True)
+    return predict
+
+def keras_model():
+    from backend.services.local_ai_service import predict_batch, SCANNER_AVAILABLE
+    if not SCANNER_AVAILABLE:
+        sys.exit("No scan backend is installed; use --model synthetic")
+    return predict_batch
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] if values else 0.0
+
+async def run(predict, concurrency, per_client, max_batch, max_wait):
+    q = BatchingQueue(predict, max_batch=max_batch, max_wait=max_wait, max_queue=max(64, concurrency))
+    image = np.random.default_rng(1).uniform(-1, 1, (224, 224, 3)).astype(np.float32)
+    await q.submit(image) # Warm-up (worker thread start, first call)
+    latencies = []
+
+    async def client():
+        for _ in range(per_client):
+            t0 = time.perf_counter()
+            await q.submit(image)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    return len(latencies) / wall, latencies, q.stats()
+
+async def run_plate(predict, crops, repeats=20):
+    """Multi-food scan cost: one image, `crops` images as one submit_batch block, `crops` separate passes."""
+    q = BatchingQueue(predict, max_batch=16, max_wait=0.0)
+    image = np.random.default_rng(1).uniform(-1, 1, (224, 224, 3)).astype(np.float32)
+    block = np.stack([image] * crops)
+    await q.submit(image) # Warm-up
+
+    async def one_pass_each():
+        for _ in range(crops):
+            await q.submit(image)
+
+    timings = {}
+    for label, fn in (("1 image", lambda: q.submit(image)),
+                      (f"{crops} crops, one block", lambda: q.submit_batch(block)),
+                      (f"{crops} crops, one pass each", one_pass_each)):
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            await fn()
+        timings[label] = (time.perf_counter() - t0) / repeats
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--images", type=int, default=256, help="Images per concurrency level")
+    parser.add_argument("--model", choices=("keras", "synthetic"), default="synthetic")
+    parser.add_argument("--call-overhead-ms", type=float, default=3.0, help="Synthetic model only")
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--plate-crops", type=int, default=6, help="Multi-food scan crops (0 = skip)")
+    args = parser.parse_args()
+
+    predict = keras_model() if args.model == "keras" else synthetic_model(args.call_overhead_ms)
+    print(f"model={args.model} max_batch={args.max_batch} max_wait={args.max_wait_ms}ms")
+    for concurrency in args.concurrency:
+        per_client = max(1, args.images // concurrency)
+        for label, max_batch, max_wait in (("unbatched", 1, 0.0), ("batched", args.max_batch, args.max_wait_ms / 1000)):
+            rate, latencies, stats = asyncio.run(run(predict, concurrency, per_client, max_batch, max_wait))
+            ms = [x * 1000 for x in latencies]
+            print(f"c={concurrency:<3} {label:<10} {rate:8.1f} img/s | p50={percentile(ms, 50):7.1f}ms "
+                  f"p99={percentile(ms, 99):7.1f}ms | avg batch={stats['avg_batch']:5.2f}")
+
+    if args.plate_crops:
+        for label, seconds in asyncio.run(run_plate(predict, args.plate_crops)).items():
+            print(f"plate  {label:<24} {seconds * 1000:7.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Latency and peak memory of /scan image decoding on 12 MP photos.
+
+"before" is the old path: decode at full resolution, then resize to 224x224.
+"after" is image_preprocess.load_image: JPEG draft decoding, reduce(), EXIF
+transpose and RGB normalization. Each mode runs in its own process, because
+peak RSS can only go up.
+
+The test photo is synthetic: smooth gradients plus sensor-like noise, 4000x3000,
+with an EXIF orientation tag (like a portrait phone shot). It is saved as JPEG
+at --quality.
+
+    python -m backend.benchmarks.bench_scan_preprocess --iterations 20
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT)
+
+def make_photo(width, height, quality, fmt):
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([x / width * 200, y / height * 200, (x + y) / (width + height) * 255], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 6, base.shape), 0, 255).astype(np.uint8)
+    img = Image.fromarray(pixels)
+    exif = img.getexif()
+    exif[0x0112] = 6 # Rotated 90° (portrait phone photo)
+    out = io.BytesIO()
+    img.save(out, fmt, quality=quality, exif=exif.tobytes())
+    return out.getvalue()
+
+def decode_before(image_bytes):
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(image_bytes))
+    return img.resize((224, 224))
+
+def peak_rss_mb():
+    """Peak RSS of this process. VmHWM rather than ru_maxrss, which Linux carries over from the parent across exec."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] if values else 0.0
+
+def worker(mode, path, iterations):
+    from backend.services.image_preprocess import load_image
+
+    with open(path, "rb") as f:
+        data = f.read()
+    decode = decode_before if mode == "before" else (lambda b: load_image(b, (224, 224)))
+    base_peak = peak_rss_mb()
+    latencies = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        img = decode(data)
+        img.load()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    peak = peak_rss_mb()
+    print(json.dumps({"mode": mode, "p50": percentile(latencies, 50), "p99": percentile(latencies, 99),
+                      "peak_mb": peak, "decode_peak_mb": peak - base_peak, "size": img.size, "img_mode": img.mode}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--quality", type=int, default=90)
+    parser.add_argument("--format", choices=("JPEG", "PNG"), default="JPEG")
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args.worker[0], args.worker[1], args.iterations)
+
+    import tempfile
+    data = make_photo(args.width, args.height, args.quality, args.format)
+    with tempfile.NamedTemporaryFile(suffix="." + args.format.lower(), delete=False) as f:
+        f.write(data)
+    try:
+        print(f"{args.width}x{args.height} {args.format} ({len(data) / 1e6:.1f} MB), {args.iterations} iterations")
+        for mode in ("before", "after"):
+            out = subprocess.run(
+                [sys.executable, "-m", "backend.benchmarks.bench_scan_preprocess", "--worker", mode, f.name,
+                 "--iterations", str(args.iterations)],
+                cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:<7} p50={r['p50']:7.1f}ms p99={r['p99']:7.1f}ms | peak RSS {r['peak_mb']:6.1f}MB "
+                  f"(+{r['decode_peak_mb']:.1f}MB while decoding) | {r['img_mode']} {r['size'][0]}x{r['size'][1]}")
+    finally:
+        os.remove(f.name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark for the /workout/complete write path.
+
+Compares the previous per-row INSERT loop + Python read-modify-write of
+user_stats with the batched BEGIN IMMEDIATE version. With --threads > 1 every
+thread completes a session for the same user in lock-step rounds (a barrier
+releases them together), and lost XP is reported.
+
+The old path only races when the session has no exercises: otherwise its
+first INSERT already opens the write transaction, so the XP read-modify-write
+is serialized by SQLite's write lock. The batched path awards no XP for an
+empty session, so its expected XP there is 0.
+
+    python -m backend.benchmarks.bench_workout_complete --sessions 400 --threads 8 --exercises 20 0
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+TMP_DIR = tempfile.mkdtemp(prefix="fitapp-bench-")
+os.environ["FITAPP_DB"] = os.path.join(TMP_DIR, "bench.db")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.database import init_db, db_connection
+from backend.activity import record_activity
+from backend.routers.workout import log_completed_workout, validate_exercises, XP_PER_WORKOUT
+
+def legacy_log_completed_workout(conn, user_id, date_str, exercises):
+    """The previous implementation (one INSERT per row, SELECT then UPDATE of user_stats)."""
+    for ex in exercises:
+        conn.execute('''
+            INSERT INTO workouts (user_id, date, exercise_id, sets, reps, completed)
+            VALUES (?, ?, ?, ?, ?, 1)
+        ''', (user_id, date_str, ex['name'], ex['sets'], ex['reps']))
+    if exercises:
+        record_activity(conn, user_id, date_str)
+
+    stats = conn.execute("SELECT * FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+    current_xp = stats['xp'] if stats else 0
+    current_level = stats['level'] if stats else 1
+    if not stats:
+        conn.execute("INSERT INTO user_stats (user_id, xp, level) VALUES (?, 0, 1)", (user_id,))
+    new_xp = current_xp + XP_PER_WORKOUT
+    new_level = current_level
+    if new_xp >= current_level * 100:
+        new_level += 1
+        new_xp -= current_level * 100
+    conn.execute("UPDATE user_stats SET xp = ?, level = ? WHERE user_id = ?", (new_xp, new_level, user_id))
+    conn.commit()
+
+def batched(conn, user_id, date_str, exercises):
+    log_completed_workout(conn, user_id, date_str, validate_exercises(exercises))
+
+def total_xp_awarded(user_id):
+    """Cumulative XP implied by (level, xp) under the 'Level * 100 per level' rule."""
+    with db_connection() as conn:
+        row = conn.execute("SELECT xp, level FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        return 0
+    return sum(l * 100 for l in range(1, row["level"])) + row["xp"]
+
+def run(fn, user_id, exercises, sessions, threads):
+    date_str = datetime.date.today().strftime("%Y-%m-%d")
+    rounds = sessions // threads
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker():
+        for _ in range(rounds):
+            with db_connection() as conn:
+                barrier.wait() # All threads submit for the same user at once
+                try:
+                    fn(conn, user_id, date_str, exercises)
+                except Exception as e:
+                    errors.append(e)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, rounds * threads - len(errors), errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--exercises", type=int, nargs="+", default=[20, 0], help="Exercises per session")
+    args = parser.parse_args()
+
+    init_db()
+    cases = (
+        ("legacy, 1 thread", legacy_log_completed_workout, 1),
+        ("batched, 1 thread", batched, 1),
+        (f"legacy, {args.threads} threads", legacy_log_completed_workout, args.threads),
+        (f"batched, {args.threads} threads", batched, args.threads),
+    )
+    with db_connection() as conn:
+        conn.executemany("INSERT INTO users (id, email, password_hash, name) VALUES (?, ?, 'x', ?)",
+                         [(i, f"u{i}@bench.local", f"U{i}") for i in range(1, len(cases) * len(args.exercises) + 1)])
+        conn.commit()
+
+    user_id = 0
+    for count in args.exercises:
+        exercises = [{"name": f"Exercise {i}", "sets": 3, "reps": "8-12"} for i in range(count)]
+        print(f"{args.sessions} sessions x {count} exercises")
+        for label, fn, threads in cases:
+            user_id += 1 # A fresh user per case, so XP totals don't mix
+            elapsed, done, errors = run(fn, user_id, exercises, args.sessions, threads)
+            awards = exercises or fn is legacy_log_completed_workout
+            lost = (done * XP_PER_WORKOUT if awards else 0) - total_xp_awarded(user_id)
+            print(f"  {label:<20} {elapsed * 1000 / max(done, 1):7.3f} ms/session  {done / elapsed:8.1f} sessions/s  "
+                  f"lost XP={lost:<6} errors={len(errors)}")
+
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,256 @@
 import sqlite3
 import datetime
+import os
+import queue
+import threading
+import time
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
-DB_FILE = "backend/data/fitapp.db"
+DB_FILE = os.environ.get("FITAPP_DB", "backend/data/fitapp.db")
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
+# --- CONNECTION POOL SETTINGS ---
+POOL_SIZE = int(os.environ.get("FITAPP_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = 10.0 # Seconds to wait for a free connection before giving up
+# How many DB jobs may wait for a worker thread before new ones are rejected
+DB_QUEUE_LIMIT = int(os.environ.get("FITAPP_DB_QUEUE_LIMIT", "64"))
+
+# Applied to every connection we open.
+# WAL lets readers keep going while a writer commits, NORMAL sync is safe under WAL.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000", # ~16MB page cache per connection
+    "PRAGMA mmap_size=134217728", # 128MB memory-mapped reads
+    "PRAGMA busy_timeout=5000", # Wait on locks instead of failing with 'database is locked'
+    "PRAGMA temp_store=MEMORY",
+)
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within POOL_TIMEOUT."""
+
+class DatabaseBusy(Exception):
+    """Raised when the DB executor queue is full (the request should be shed with a 503)."""
+
+def _connect():
+    # check_same_thread=False: a pooled connection is handed to whichever thread checks it out
+    conn = sqlite3.connect(DB_FILE, timeout=5.0, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
+def get_db_connection():
+    """
+    Opens a standalone (unpooled) connection with the tuned pragmas.
+    Caller must close it. Request handlers should use db_connection() instead.
+    """
+    return _connect()
+
+class ConnectionPool:
+    """
+    Bounded pool of reusable SQLite connections.
+    Connections are opened lazily up to `size`; after that callers wait for one to be released.
+    """
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue() # LIFO keeps the hottest connection (warm page cache) in use
+        self._lock = threading.Lock()
+        self._opened = 0
+        # Stats
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._timeouts = 0
+
+    def acquire(self):
+        start = time.perf_counter()
+        conn = None
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+            if can_open:
+                try:
+                    conn = _connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._checkouts += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+        try:
+            # Never hand out a connection with a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken connection: drop it so a fresh one gets opened next time
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "opened": self._opened,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "total_wait_ms": round(self._wait_time * 1000, 3),
+                "avg_wait_ms": round(self._wait_time * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+            }
+
+POOL = ConnectionPool()
+
+@contextmanager
+def db_connection():
+    """
+    Checks a connection out of the pool for the duration of the block.
+    Uncommitted work is rolled back when the block exits.
+
+        with db_connection() as conn:
+            conn.execute(...)
+            conn.commit()
+    """
+    conn = POOL.acquire()
+    try:
+        yield conn
+    finally:
+        POOL.release(conn)
+
+def get_db():
+    """FastAPI dependency: `conn = Depends(get_db)`."""
+    with db_connection() as conn:
+        yield conn
+
+# --- IDEMPOTENCY KEYS ---
+# Both helpers run inside the caller's write transaction and do not commit.
+MAX_IDEMPOTENCY_KEY_LENGTH = 200
+IDEMPOTENCY_KEY_TTL_DAYS = 7
+
+def fetch_idempotent_response(conn, user_id, key):
+    """The stored response for a key already used by this user, or None."""
+    row = conn.execute("SELECT response_json FROM idempotency_keys WHERE user_id = ? AND key = ?", (user_id, key)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def store_idempotent_response(conn, user_id, key, response):
+    conn.execute("INSERT INTO idempotency_keys (user_id, key, response_json) VALUES (?, ?, ?)",
+                 (user_id, key, json.dumps(response)))
+
+def prune_idempotency_keys(conn):
+    conn.execute("DELETE FROM idempotency_keys WHERE created_at < datetime('now', ?)", (f"-{IDEMPOTENCY_KEY_TTL_DAYS} days",))
+    conn.commit()
+
+# --- ASYNC ACCESS ---
+# Route handlers are `async def`, so calling sqlite3 directly would block the event loop.
+# All DB work is shipped to a dedicated executor instead. One worker per pooled
+# connection means a worker never waits on the pool, and the slot semaphore
+# bounds how much work can pile up behind them.
+_EXECUTOR = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="fitapp-db")
+_SLOTS = threading.BoundedSemaphore(POOL_SIZE + DB_QUEUE_LIMIT)
+_queue_lock = threading.Lock()
+_queue_stats = {"submitted": 0, "rejected": 0, "in_flight": 0, "peak_in_flight": 0}
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Runs a blocking function on the DB executor and awaits its result.
+    Use this for helpers that manage their own connection (e.g. workout_engine).
+    """
+    if not _SLOTS.acquire(blocking=False):
+        with _queue_lock:
+            _queue_stats["rejected"] += 1
+        raise DatabaseBusy("Database queue is full")
+
+    with _queue_lock:
+        _queue_stats["submitted"] += 1
+        _queue_stats["in_flight"] += 1
+        _queue_stats["peak_in_flight"] = max(_queue_stats["peak_in_flight"], _queue_stats["in_flight"])
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_EXECUTOR, functools.partial(fn, *args, **kwargs))
+    finally:
+        with _queue_lock:
+            _queue_stats["in_flight"] -= 1
+        _SLOTS.release()
+
+def _with_connection(fn, *args):
+    with db_connection() as conn:
+        return fn(conn, *args)
+
+async def run_query(fn, *args):
+    """
+    Runs `fn(conn, *args)` on the DB executor with a pooled connection.
+
+        user = await run_query(fetch_user, user_id)
+    """
+    return await run_db(_with_connection, fn, *args)
+
+def pool_stats():
+    stats = POOL.stats()
+    with _queue_lock:
+        stats["queue"] = dict(_queue_stats, limit=DB_QUEUE_LIMIT)
+    return stats
+
 def init_db():
+    """
+    Brings the schema up to date and verifies it. Called once at app startup
+    (see the lifespan hook in main.py), never at import time.
+    """
+    from backend.migrations import migrate, check_schema
+
     conn = get_db_connection()
-    c = conn.cursor()
-    
-    # Users Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            name TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Workouts Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS workouts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            date TEXT,
-            exercise_id TEXT,
-            sets INTEGER,
-            reps TEXT,
-            weight REAL,
-            completed BOOLEAN DEFAULT 0,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # Meals Table (For Scan History)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS meals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            date TEXT,
-            name TEXT,
-            calories INTEGER,
-            protein INTEGER,
-            carbs INTEGER,
-            fat INTEGER,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # Weight Logs Table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS weight_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            date TEXT,
-            weight REAL,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # Gamification Table (XP and Level)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS user_stats (
-            user_id INTEGER PRIMARY KEY,
-            xp INTEGER DEFAULT 0,
-            level INTEGER DEFAULT 1,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # User Profile (Onboarding Data)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS user_settings (
-            user_id INTEGER PRIMARY KEY,
-            frequency INTEGER, -- 3 or 4
-            level TEXT, -- Beginner, Intermediate, Advanced
-            goal TEXT, -- Muscle, Fat Loss, Strength
-            equipment TEXT, -- Gym, Home, Bodyweight
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-
-    # Workout Plans (The Generated Schedule)
-    # We will store the full weekly schedule as a JSON string for simplicity
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS workout_plans (
-            user_id INTEGER PRIMARY KEY,
-            schedule_json TEXT, -- JSON blob of the weekly plan
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    print("✅ Database Initialized (SQLite)")
+    try:
+        applied = migrate(conn)
+        version = check_schema(conn)
+        prune_idempotency_keys(conn)
+    finally:
+        conn.close()
 
-# Initialize on import
-init_db()
+    if applied:
+        print(f"✅ Database migrated to v{version} (applied: {', '.join(applied)})")
+    else:
+        print(f"✅ Database Initialized (SQLite, schema v{version})")
@@ -0,0 +1,259 @@
+"""
+XP leaderboard.
+
+- Top-K (global or friends) is read straight from SQLite: the
+  (total_xp DESC, user_id) index makes it a LIMIT scan.
+- "My rank" among all users comes from LEADERBOARD, an in-memory order-statistics
+  index over lifetime XP: a Fenwick tree counting users per XP step. Rank is
+  1 + the number of users with more XP, answered in O(log workouts) instead of a
+  COUNT(*) over everyone above you.
+
+LEADERBOARD is rebuilt from SQLite at startup (see the lifespan hook in main.py)
+and updated after every committed XP award. With several worker processes each
+one only sees its own awards, so it also re-syncs from SQLite every
+LEADERBOARD_RESYNC seconds.
+"""
+import os
+import threading
+import time
+import numpy as np
+
+LEADERBOARD_RESYNC = float(os.environ.get("FITAPP_LEADERBOARD_RESYNC", "300")) # seconds
+# XP is only ever awarded in steps of XP_PER_WORKOUT (routers/workout.py), so the tree
+# counts steps, not points: memory grows with workouts logged, not with XP.
+XP_UNIT = 50
+MAX_TOP_K = 100
+MAX_FRIENDS = 500
+MAX_PENDING_REQUESTS = 100
+
+class Leaderboard:
+    """
+    Thread-safe rank index: user_id -> total_xp, plus a Fenwick tree over
+    xp // unit. Exact while XP moves in multiples of `unit`; otherwise users
+    within the same step would tie.
+    """
+
+    def __init__(self, resync=LEADERBOARD_RESYNC, unit=XP_UNIT):
+        self.resync = resync
+        self.unit = unit
+        self._lock = threading.Lock()
+        self._scores = {}
+        self._tree = [0, 0] # 1-based; position = xp // unit + 1
+        self._size = 1 # Number of representable steps
+        self.built_at = None
+        self.updates = 0
+        self.rebuilds = 0
+
+    def _build(self, scores):
+        """Replaces the whole index. Vectorized: tree[i] = sum(counts[i - lowbit(i) + 1 .. i])."""
+        values = np.fromiter(scores.values(), dtype=np.int64, count=len(scores)) // self.unit
+        size = 1
+        while size <= (int(values.max()) if len(values) else 0):
+            size *= 2
+        counts = np.bincount(values, minlength=size)
+        cumulative = np.concatenate(([0], np.cumsum(counts)))
+        idx = np.arange(1, size + 1)
+        tree = cumulative[idx] - cumulative[idx - (idx & -idx)]
+
+        self._scores = scores
+        self._size = size
+        self._tree = [0] + tree.tolist()
+
+    def _add(self, xp, delta):
+        i = xp // self.unit + 1
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_at_most(self, xp):
+        """Users with total_xp <= xp."""
+        i = min(xp // self.unit + 1, self._size)
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def rebuild(self, scores):
+        with self._lock:
+            self._build(dict(scores))
+            self.built_at = time.monotonic()
+            self.rebuilds += 1
+
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.resync
+
+    def set_score(self, user_id, xp):
+        """
+        Moves a user up to a new lifetime XP (inserting them if new). Lower scores are
+        ignored: XP only grows, so a lower one is a stale read from a concurrent award
+        that committed first, and must not move the user back down.
+        """
+        with self._lock:
+            old = self._scores.get(user_id)
+            if old is not None and xp <= old:
+                return
+            if xp // self.unit >= self._size:
+                # Past the tree's range: regrow (doubling keeps this rare)
+                scores = dict(self._scores)
+                scores[user_id] = xp
+                self._build(scores)
+            else:
+                if old is not None:
+                    self._add(old, -1)
+                self._add(xp, 1)
+                self._scores[user_id] = xp
+            self.updates += 1
+
+    def rank(self, user_id):
+        """(rank, total_xp, ranked_users). Competition ranking: ties share a rank. Users not ranked yet get (None, 0, ...)."""
+        with self._lock:
+            xp = self._scores.get(user_id)
+            if xp is None:
+                return None, 0, len(self._scores)
+            return 1 + len(self._scores) - self._count_at_most(xp), xp, len(self._scores)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._scores),
+                "tree_size": self._size,
+                "updates": self.updates,
+                "rebuilds": self.rebuilds,
+                "age": round(time.monotonic() - self.built_at, 1) if self.built_at else None,
+            }
+
+LEADERBOARD = Leaderboard()
+
+# --- QUERIES (run on the DB executor) ---
+
+def load_leaderboard(conn, board=LEADERBOARD):
+    """
+    Rebuilds the rank index from user_stats. Ranked users are those with a stats row
+    (created by their first workout), the same population the global top-K reads.
+    """
+    rows = conn.execute("SELECT user_id, total_xp FROM user_stats").fetchall()
+    board.rebuild({r[0]: r[1] for r in rows})
+    print(f"🏆 Leaderboard loaded ({len(board)} users)")
+
+def ensure_fresh(conn, board=LEADERBOARD):
+    if board.is_stale():
+        load_leaderboard(conn, board)
+
+def record_xp(conn, user_id, board=LEADERBOARD):
+    """Call after COMMITTING an XP change, so the index never holds a rolled-back score."""
+    row = conn.execute("SELECT total_xp FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+    if row:
+        board.set_score(int(user_id), row[0])
+
+def with_ranks(rows):
+    """Competition ranks for rows already sorted by total_xp DESC."""
+    ranked = []
+    for i, r in enumerate(rows):
+        rank = ranked[-1]["rank"] if ranked and ranked[-1]["total_xp"] == r["total_xp"] else i + 1
+        ranked.append({"rank": rank, "user_id": r["user_id"], "name": r["name"],
+                       "level": r["level"], "total_xp": r["total_xp"]})
+    return ranked
+
+def global_leaderboard(conn, user_id, limit, board=LEADERBOARD):
+    ensure_fresh(conn, board)
+    rows = conn.execute('''
+        SELECT s.user_id, u.name, s.level, s.total_xp FROM user_stats s
+        JOIN users u ON u.id = s.user_id
+        ORDER BY s.total_xp DESC, s.user_id
+        LIMIT ?
+    ''', (limit,)).fetchall()
+    rank, xp, of = board.rank(int(user_id))
+    # rank is None until the user's first workout: they're in neither `top` nor `of`
+    return {"scope": "global", "top": with_ranks(rows), "me": {"rank": rank, "total_xp": xp, "of": of}}
+
+def friends_leaderboard(conn, user_id, limit):
+    """The user and their friends. Friend lists are capped, so this is a small indexed read."""
+    rows = conn.execute('''
+        SELECT u.id AS user_id, u.name, COALESCE(s.level, 1) AS level, COALESCE(s.total_xp, 0) AS total_xp
+        FROM users u LEFT JOIN user_stats s ON s.user_id = u.id
+        WHERE u.id = ? OR u.id IN (SELECT friend_id FROM friendships WHERE user_id = ?)
+        ORDER BY total_xp DESC, u.id
+    ''', (user_id, user_id)).fetchall()
+    ranked = with_ranks(rows)
+    me = next((r for r in ranked if str(r["user_id"]) == str(user_id)), None)
+    return {
+        "scope": "friends",
+        "top": ranked[:limit],
+        "me": {"rank": me["rank"] if me else None, "total_xp": me["total_xp"] if me else 0, "of": len(ranked)}
+    }
+
+def _befriend(conn, user_id, friend_id):
+    """Writes both directions of a friendship and drops the requests between the two users. Caller commits."""
+    conn.executemany("INSERT OR IGNORE INTO friendships (user_id, friend_id) VALUES (?, ?)",
+                     [(user_id, friend_id), (friend_id, user_id)])
+    conn.executemany("DELETE FROM friend_requests WHERE from_user_id = ? AND to_user_id = ?",
+                     [(user_id, friend_id), (friend_id, user_id)])
+
+def _check_friend_limit(conn, user_id):
+    count = conn.execute("SELECT COUNT(*) FROM friendships WHERE user_id = ?", (user_id,)).fetchone()[0]
+    if count >= MAX_FRIENDS:
+        raise ValueError(f"Friend list is limited to {MAX_FRIENDS}")
+
+def request_friend(conn, user_id, email):
+    """
+    Asks the user registered under `email` to be friends. Returns nothing either way:
+    whether the email is registered is not revealed. If they already asked us, this accepts.
+    """
+    me = conn.execute("SELECT email FROM users WHERE id = ?", (user_id,)).fetchone()
+    if me and me["email"] == email:
+        raise ValueError("You can't add yourself")
+    # 1. Limits only depend on the caller, so they can't leak anything about `email`
+    _check_friend_limit(conn, user_id)
+    pending = conn.execute("SELECT COUNT(*) FROM friend_requests WHERE from_user_id = ?", (user_id,)).fetchone()[0]
+    if pending >= MAX_PENDING_REQUESTS:
+        raise ValueError(f"You can have at most {MAX_PENDING_REQUESTS} pending friend requests")
+
+    friend = conn.execute("SELECT id FROM users WHERE email = ?", (email,)).fetchone()
+    if not friend:
+        return
+    friend_id = friend["id"]
+    if conn.execute("SELECT 1 FROM friendships WHERE user_id = ? AND friend_id = ?", (user_id, friend_id)).fetchone():
+        return
+
+    # 2. They asked first: both sides agreed
+    if conn.execute("SELECT 1 FROM friend_requests WHERE from_user_id = ? AND to_user_id = ?",
+                    (friend_id, user_id)).fetchone():
+        _befriend(conn, user_id, friend_id)
+    else:
+        conn.execute("INSERT OR IGNORE INTO friend_requests (from_user_id, to_user_id) VALUES (?, ?)",
+                     (user_id, friend_id))
+    conn.commit()
+
+def incoming_requests(conn, user_id):
+    rows = conn.execute('''
+        SELECT r.from_user_id AS user_id, u.name, r.created_at
+        FROM friend_requests r JOIN users u ON u.id = r.from_user_id
+        WHERE r.to_user_id = ?
+        ORDER BY r.created_at DESC
+    ''', (user_id,)).fetchall()
+    return [dict(r) for r in rows]
+
+def accept_friend(conn, user_id, from_id):
+    """Accepts the request `from_id` sent to `user_id`."""
+    if not conn.execute("SELECT 1 FROM friend_requests WHERE from_user_id = ? AND to_user_id = ?",
+                        (from_id, user_id)).fetchone():
+        raise LookupError("No such friend request")
+    _check_friend_limit(conn, user_id)
+    _befriend(conn, user_id, from_id)
+    conn.commit()
+
+def decline_friend(conn, user_id, from_id):
+    conn.execute("DELETE FROM friend_requests WHERE from_user_id = ? AND to_user_id = ?", (from_id, user_id))
+    conn.commit()
+
+def remove_friend(conn, user_id, friend_id):
+    """Unfriends, and withdraws any pending request between the two users."""
+    conn.executemany("DELETE FROM friendships WHERE user_id = ? AND friend_id = ?",
+                     [(user_id, friend_id), (friend_id, user_id)])
+    conn.executemany("DELETE FROM friend_requests WHERE from_user_id = ? AND to_user_id = ?",
+                     [(user_id, friend_id), (friend_id, user_id)])
+    conn.commit()
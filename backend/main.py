@@ -1,69 +1,120 @@
 from fastapi import FastAPI, Request, UploadFile, File, Form, Depends
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 import uvicorn
 import datetime
 import os
 import sys
 import json
+import asyncio
+from contextlib import asynccontextmanager
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import our Logic Engine
-from backend.workout_engine import get_workout_for_date, get_weekly_schedule
+from backend.workout_engine import get_workout_for_date, get_weekly_schedule, PLAN_CACHE
 
 # Services
-from services.local_ai_service import analyze_image_locally, TF_AVAILABLE
-from services.database_service import find_nutrition_by_classification, search_food_text
+from services.local_ai_service import analyze_image, analyze_plate, scanner_state, scanner_status, warmup, SCANNER_AVAILABLE, SCAN_QUEUE, MODEL_NAME
+from services.inference_queue import InferenceBusy
+from services.database_service import (
+    find_nutrition_by_classification, find_foods_by_classification, total_nutrition, search_food_text, FOOD_DB_VERSION
+)
+from services.scan_cache import ScanCache
+from services.image_preprocess import read_upload, run_decode, UploadTooLarge, MAX_UPLOAD_BYTES
 
 # Auth & DB
-from backend.routers import auth, workout, profile, exercises, onboarding
-from backend.database import init_db
+from backend.routers import auth, workout, profile, exercises, onboarding, sync, leaderboard
+from backend.media import MEDIA_DIR, MEDIA_URL
+from backend.database import init_db, run_db, run_query, pool_stats, DatabaseBusy, PoolTimeout
+from backend.leaderboard import load_leaderboard, LEADERBOARD
+from backend.passwords import HashingBusy, hashing_stats
+from backend.sessions import current_user, get_secret, SESSION_CACHE
+from backend.middleware import AuthMiddleware, BodyLimitMiddleware
 
-app = FastAPI()
+# Seconds after startup to begin loading the scanner model; "off" = load on the first scan
+MODEL_WARMUP_DELAY = None if os.environ.get("FITAPP_MODEL_WARMUP_DELAY") == "off" else float(os.environ.get("FITAPP_MODEL_WARMUP_DELAY", "1"))
+
+MULTIPART_SLACK = 64 * 1024 # Form boundaries, headers and the text_query field around the image
+
+# Scan results by image content; a new model or food DB starts a fresh namespace
+SCAN_CACHE = ScanCache(namespace=f"{MODEL_NAME}:{FOOD_DB_VERSION}")
+MULTI_SCAN_CACHE = ScanCache(namespace=f"{MODEL_NAME}:{FOOD_DB_VERSION}:multi")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Apply pending migrations and verify the schema before serving traffic
+    await run_db(init_db)
+    get_secret() # Create the session key now, not on the first login
+    await run_query(load_leaderboard)
+    # The scanner model loads in the background once we are serving, never before
+    if MODEL_WARMUP_DELAY is not None:
+        asyncio.get_running_loop().call_later(MODEL_WARMUP_DELAY, warmup)
+    yield
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth.router)
 app.include_router(workout.router)
 app.include_router(profile.router)
 app.include_router(exercises.router)
 app.include_router(onboarding.router)
+app.include_router(sync.router)
+app.include_router(leaderboard.router)
 
 templates = Jinja2Templates(directory="backend/templates")
 
+# --- STATIC MEDIA ---
+# Exercise media mirrored by `python -m backend.media`. Filenames are content-hashed,
+# so a URL never changes meaning and browsers may cache it forever.
+class ImmutableStaticFiles(StaticFiles):
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+app.mount(MEDIA_URL, ImmutableStaticFiles(directory=MEDIA_DIR, check_dir=False), name="exercise-media")
+
+# --- DB OVERLOAD ---
+# The DB, hashing and scan queues shed load instead of queueing forever; tell the client to retry.
+@app.exception_handler(DatabaseBusy)
+@app.exception_handler(PoolTimeout)
+@app.exception_handler(HashingBusy)
+@app.exception_handler(InferenceBusy)
+async def db_overload_handler(request: Request, exc: Exception):
+    return JSONResponse({"status": "error", "message": "Server busy, please retry"},
+                        status_code=503, headers={"Retry-After": "1"})
+
 # --- MIDDLEWARE & AUTH CHECK ---
-@app.middleware("http")
-async def auth_middleware(request: Request, call_next):
-    # Public Routes
-    if request.url.path in ["/login", "/register", "/docs", "/openapi.json"]:
-        return await call_next(request)
-    
-    # Check Cookie
-    user_id = request.cookies.get("user_id")
-    if not user_id:
-        # Redirect to login if no cookie
-        return RedirectResponse(url="/login")
-        
-    response = await call_next(request)
-    return response
+# Raw ASGI: public paths and /static/ skip the session check entirely (see backend/middleware.py)
+app.add_middleware(AuthMiddleware)
+# Outermost: oversized scans are refused before the session check or any body parsing
+app.add_middleware(BodyLimitMiddleware, limits={"/scan": MAX_UPLOAD_BYTES + MULTIPART_SLACK})
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness, scanner readiness and pool/queue/cache counters. Public and DB-free, so probes never queue behind traffic."""
+    return {
+        "status": "ok",
+        "db": pool_stats(),
+        "hashing": hashing_stats(),
+        "caches": {"plans": PLAN_CACHE.stats(), "sessions": SESSION_CACHE.stats()},
+        "leaderboard": LEADERBOARD.stats(),
+        "scan_queue": SCAN_QUEUE.stats(),
+        "scan_cache": {"single": SCAN_CACHE.stats(), "multi": MULTI_SCAN_CACHE.stats()},
+        "scanner": scanner_status(),
+    }
 
 @app.get("/", response_class=HTMLResponse)
-async def read_root(request: Request):
-    user_name = "User"
-    user_id = request.cookies.get("user_id")
-    
-    if user_id:
-        from backend.database import get_db_connection
-        conn = get_db_connection()
-        user = conn.execute("SELECT name FROM users WHERE id = ?", (user_id,)).fetchone()
-        conn.close()
-        if user:
-            user_name = user["name"]
+async def read_root(request: Request, user = Depends(current_user)):
+    user_id = user["id"]
+    user_name = user["name"] or "User"
 
     today = datetime.date.today()
     # Dummy start date
     start_date = datetime.date.today()
-    workout = get_workout_for_date(today, start_date, user_id)
+    workout = await run_db(get_workout_for_date, today, start_date, user_id)
     
     # Check if needs onboarding
     show_onboarding = False
@@ -79,22 +130,24 @@ async def read_root(request: Request):
     })
 
 @app.get("/workout", response_class=HTMLResponse)
-async def read_workout(request: Request):
+async def read_workout(request: Request, user = Depends(current_user)):
     try:
-        user_id = request.cookies.get("user_id")
+        user_id = user["id"]
         today = datetime.date.today()
         
         # Use simple dummy date for fallback if DB is gone
         start_date = datetime.date.today()
         
-        workout = get_workout_for_date(today, start_date, user_id)
-        weekly_schedule = get_weekly_schedule(start_date, user_id)
+        workout = await run_db(get_workout_for_date, today, start_date, user_id, True)
+        weekly_schedule = await run_db(get_weekly_schedule, start_date, user_id)
         
         return templates.TemplateResponse("workout.html", {
             "request": request, "active_page": "workout",
             "workout": workout, "weekly_schedule": weekly_schedule,
             "today_date": today.strftime("%A, %B %d")
         })
+    except (DatabaseBusy, PoolTimeout):
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -109,16 +162,18 @@ async def read_workout(request: Request):
 async def scan_page(request: Request):
     return templates.TemplateResponse("scan.html", {
         "request": request, "active_page": "scan", 
-        "result": None, "tf_enabled": TF_AVAILABLE
+        "result": None, "tf_enabled": SCANNER_AVAILABLE
     })
 
 @app.post("/scan", response_class=HTMLResponse)
 async def handle_scan(
     request: Request, 
     file: UploadFile = File(None), 
-    text_query: str = Form(None)
+    text_query: str = Form(None),
+    multi: bool = Form(False)
 ):
     food_match = None
+    items = None
     status_msg = ""
     
     # A. Text Search Mode
@@ -131,24 +186,60 @@ async def handle_scan(
         else:
             status_msg = "No match found in local database."
 
-    # B. Image Scan Mode
+    # B. Image Scan Mode (multi: every food on the plate, not just the dominant one)
     elif file:
-        print("📸 Analyzing Image Locally...")
-        content = await file.read()
-        
-        # 1. Run Local Neural Network
-        predictions = analyze_image_locally(content)
-        
+        try:
+            content = await read_upload(file)
+        except UploadTooLarge as e:
+            return templates.TemplateResponse("scan.html", {
+                "request": request, "active_page": "scan", "result": None,
+                "message": str(e), "tf_enabled": SCANNER_AVAILABLE
+            }, status_code=413)
+        # Same photo (or a re-encoded copy) scanned before: skip decode + forward pass.
+        # Checked before readiness, so repeat scans are answered even while the model loads.
+        cache = MULTI_SCAN_CACHE if multi else SCAN_CACHE
+        cache_key, phash, cached = await run_decode(cache.lookup, content)
+        state = scanner_state()
+        foods = []
+
+        if cached:
+            predictions, foods = cached["predictions"], cached["matches"]
+        elif state != "ready":
+            # Degrade instead of blocking on a model load: search keeps working meanwhile
+            predictions = None
+        else:
+            print("📸 Analyzing Image Locally...")
+            # 1. Run Local Neural Network (batched with concurrent scans, off the event loop)
+            predictions = await (analyze_plate(content) if multi else analyze_image(content))
+            if predictions:
+                # 2. Map AI labels (e.g. 'king_crab') to DB (e.g. 'salmon')
+                # This is a 'heuristic' logic
+                if multi:
+                    foods = find_foods_by_classification(predictions)
+                else:
+                    match = find_nutrition_by_classification(predictions)
+                    foods = [match] if match else []
+                await asyncio.to_thread(cache.put, cache_key, phash, {
+                    "predictions": [[p[0], p[1], float(p[2])] for p in predictions],
+                    "matches": foods,
+                })
+
         if predictions:
-            # 2. Map AI labels (e.g. 'king_crab') to DB (e.g. 'salmon')
-            # This is a 'heuristic' logic
-            food_match = find_nutrition_by_classification(predictions)
-            
-            if food_match:
+            if len(foods) > 1:
+                # Plate: one card with the summed macros, items listed above it
+                food_match, items = total_nutrition(foods), foods
+                status_msg = f"AI Identified {len(foods)} foods"
+            elif foods:
+                food_match = foods[0]
                 status_msg = f"AI Identified: {food_match['name']}"
             else:
                 top_guess = predictions[0][1]
                 status_msg = f"AI saw '{top_guess}' but it's not in your food_db.json"
+        elif state in ("idle", "loading"):
+            warmup() # Only starts anything if warmup is off (FITAPP_MODEL_WARMUP_DELAY=off)
+            status_msg = "AI scanner is still starting up. Try again in a few seconds, or use search above."
+        elif state == "failed":
+            status_msg = "AI scanner failed to load. Use search above."
         else:
             status_msg = "Could not analyze image (TensorFlow missing?)"
             
@@ -156,8 +247,9 @@ async def handle_scan(
         "request": request, 
         "active_page": "scan", 
         "result": food_match,
+        "items": items,
         "message": status_msg,
-        "tf_enabled": TF_AVAILABLE
+        "tf_enabled": SCANNER_AVAILABLE
     })
 
 if __name__ == "__main__":
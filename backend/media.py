@@ -0,0 +1,122 @@
+"""
+Local mirror of exercise media.
+
+Build step (run once per deploy, or whenever KNOWN_GIFS / the pools change):
+
+    python -m backend.media
+
+It downloads every remote exercise GIF, generates an SVG for every placeholder
+and writes them to backend/static/exercises/ under content-hashed filenames,
+plus a manifest (backend/data/media_manifest.json) mapping each source URL to
+its local URL. main.py serves the media folder with far-future immutable cache
+headers and trainer_engine rewrites resolved URLs through the manifest.
+"""
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import urllib.parse
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+MEDIA_DIR = os.path.join(STATIC_DIR, "exercises")
+# Outside MEDIA_DIR: that folder is served as immutable, and the manifest changes on every build
+MANIFEST_FILE = os.path.join(BASE_DIR, "data", "media_manifest.json")
+STATIC_URL = "/static"
+MEDIA_URL = STATIC_URL + "/exercises"
+
+PLACEHOLDER_HOST = "placehold.co"
+DOWNLOAD_TIMEOUT = 20 # seconds
+USER_AGENT = "FitVision-media-build/1.0"
+
+def load_manifest():
+    """Returns {source_url: local_url}. Empty if the build step has not been run."""
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE, "r") as f:
+            return json.load(f).get("files", {})
+    return {}
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "exercise"
+
+def placeholder_svg(text):
+    """Same look as the placehold.co images (600x400, dark background, cyan text), but local."""
+    label = html.escape(text)
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="600" height="400" viewBox="0 0 600 400">'
+        '<rect width="600" height="400" fill="#1a1a1a"/>'
+        '<text x="300" y="200" fill="#00d4ff" font-family="Inter, sans-serif" font-size="40" '
+        f'text-anchor="middle" dominant-baseline="middle">{label}</text>'
+        '</svg>'
+    ).encode("utf-8")
+
+def fetch(url):
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(req, timeout=DOWNLOAD_TIMEOUT) as resp:
+        return resp.read()
+
+def materialize(url):
+    """Returns (bytes, extension, slug) for a source URL."""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.netloc == PLACEHOLDER_HOST:
+        text = urllib.parse.parse_qs(parsed.query).get("text", ["Exercise"])[0]
+        return placeholder_svg(text), ".svg", slugify(text)
+
+    name, ext = os.path.splitext(os.path.basename(parsed.path))
+    return fetch(url), (ext.lower() or ".gif"), slugify(name)
+
+def media_sources():
+    """Every URL the app can hand out for an exercise."""
+    from backend.trainer_engine import KNOWN_GIFS, GIF_RESOLVER, exercise_vocabulary
+    from backend.routers.exercises import EXERCISES_DB
+
+    names = set(exercise_vocabulary()) | set(KNOWN_GIFS)
+    for cat in EXERCISES_DB:
+        names.update(ex["name"] for ex in cat["exercises"])
+    return sorted(set(GIF_RESOLVER.resolve_remote(n) for n in names) | set(KNOWN_GIFS.values()))
+
+def build():
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    files = {}
+    failed = []
+
+    for url in media_sources():
+        try:
+            data, ext, slug = materialize(url)
+        except Exception as e:
+            print(f"⚠️ Could not mirror {url}: {e} (will keep serving the remote URL)")
+            failed.append(url)
+            continue
+
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        filename = f"{slug}.{digest}{ext}"
+        path = os.path.join(MEDIA_DIR, filename)
+        if not os.path.exists(path): # Content-hashed: an existing file is already correct
+            with open(path, "wb") as f:
+                f.write(data)
+        files[url] = f"{MEDIA_URL}/{filename}"
+
+    # Drop files referenced by neither this manifest nor the previous one. Pages rendered
+    # by the old release (and browsers holding them) still point at the previous hashes
+    # while a deploy rolls out; those go one build later.
+    keep = {os.path.basename(u) for u in files.values()}
+    keep |= {os.path.basename(u) for u in load_manifest().values()}
+    for filename in os.listdir(MEDIA_DIR):
+        if filename not in keep:
+            os.remove(os.path.join(MEDIA_DIR, filename))
+
+    # Written then renamed, so workers starting mid-build never read half a manifest
+    tmp = MANIFEST_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"files": files}, f, indent=2, sort_keys=True)
+    os.replace(tmp, MANIFEST_FILE)
+
+    print(f"✅ Mirrored {len(files)} exercise media files into {MEDIA_DIR} ({len(failed)} failed)")
+    return files
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(BASE_DIR))
+    build()
@@ -0,0 +1,82 @@
+"""
+Session check as a raw ASGI middleware.
+
+`@app.middleware("http")` runs on BaseHTTPMiddleware, which wraps every request
+(static files included) in an extra task plus a streamed response body. This
+class looks at the ASGI scope directly instead:
+
+- public paths and prefixes (login, static media, /healthz) are passed straight
+  to the app, with no cookie parsing and no Request object;
+- everything else needs a valid signed session cookie (backend/sessions.py).
+  The user context is put in scope["state"], where `current_user` finds it as
+  request.state.user. Browsers without a session are redirected to /login.
+
+BodyLimitMiddleware refuses uploads whose Content-Length is over a per-path
+limit with 413, before the multipart body is read at all.
+"""
+from starlette.requests import cookie_parser
+from starlette.responses import JSONResponse, RedirectResponse
+from backend.database import DatabaseBusy, PoolTimeout
+from backend.media import STATIC_URL
+from backend.sessions import SESSION_COOKIE, resolve_session
+
+PUBLIC_PATHS = frozenset(["/login", "/register", "/docs", "/docs/oauth2-redirect", "/openapi.json", "/healthz"])
+PUBLIC_PREFIXES = (STATIC_URL + "/",)
+LOGIN_URL = "/login"
+
+def session_cookie(scope):
+    """The session cookie from the raw headers, without building a Request."""
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            return cookie_parser(value.decode("latin-1")).get(SESSION_COOKIE)
+    return None
+
+class AuthMiddleware:
+    def __init__(self, app, public_paths=PUBLIC_PATHS, public_prefixes=PUBLIC_PREFIXES, login_url=LOGIN_URL):
+        self.app = app
+        self.public_paths = frozenset(public_paths)
+        self.public_prefixes = tuple(public_prefixes)
+        self.login_url = login_url
+
+    def is_public(self, path):
+        return path in self.public_paths or path.startswith(self.public_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        # Lifespan/websocket events and public routes: zero-overhead bypass
+        if scope["type"] != "http" or self.is_public(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        # Check the signed session cookie (no DB access unless the user context isn't cached)
+        try:
+            user = await resolve_session(session_cookie(scope))
+        except (DatabaseBusy, PoolTimeout):
+            # App-level exception handlers don't cover middleware
+            response = JSONResponse({"status": "error", "message": "Server busy, please retry"},
+                                    status_code=503, headers={"Retry-After": "1"})
+            await response(scope, receive, send)
+            return
+        if user is None:
+            # Missing, tampered with, expired or revoked
+            await RedirectResponse(url=self.login_url)(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["user"] = user
+        await self.app(scope, receive, send)
+
+class BodyLimitMiddleware:
+    def __init__(self, app, limits):
+        """limits: {path: max request body bytes}. Bodies without Content-Length are left to the handler's own cap."""
+        self.app = app
+        self.limits = dict(limits)
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is not None:
+            for name, value in scope["headers"]:
+                if name == b"content-length" and value.isdigit() and int(value) > limit:
+                    response = JSONResponse({"status": "error", "message": f"Upload is larger than {limit} bytes"},
+                                            status_code=413, headers={"Connection": "close"})
+                    await response(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
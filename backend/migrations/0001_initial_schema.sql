@@ -0,0 +1,72 @@
+-- Initial schema (previously created by init_db() at import time).
+
+-- Users Table
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    name TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Workouts Table
+CREATE TABLE IF NOT EXISTS workouts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    date TEXT,
+    exercise_id TEXT,
+    sets INTEGER,
+    reps TEXT,
+    weight REAL,
+    completed BOOLEAN DEFAULT 0,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+
+-- Meals Table (For Scan History)
+CREATE TABLE IF NOT EXISTS meals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    date TEXT,
+    name TEXT,
+    calories INTEGER,
+    protein INTEGER,
+    carbs INTEGER,
+    fat INTEGER,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+
+-- Weight Logs Table
+CREATE TABLE IF NOT EXISTS weight_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    date TEXT,
+    weight REAL,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+
+-- Gamification Table (XP and Level)
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    xp INTEGER DEFAULT 0,
+    level INTEGER DEFAULT 1,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+
+-- User Profile (Onboarding Data)
+CREATE TABLE IF NOT EXISTS user_settings (
+    user_id INTEGER PRIMARY KEY,
+    frequency INTEGER, -- 3 or 4
+    level TEXT, -- Beginner, Intermediate, Advanced
+    goal TEXT, -- Muscle, Fat Loss, Strength
+    equipment TEXT, -- Gym, Home, Bodyweight
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+
+-- Workout Plans (The Generated Schedule)
+-- We store the full weekly schedule as a JSON string for simplicity
+CREATE TABLE IF NOT EXISTS workout_plans (
+    user_id INTEGER PRIMARY KEY,
+    schedule_json TEXT, -- JSON blob of the weekly plan
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
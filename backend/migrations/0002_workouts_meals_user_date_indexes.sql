@@ -0,0 +1,4 @@
+-- Profile, history and streak queries all filter by (user_id, date).
+-- Without these every one of them is a full table scan over all users.
+CREATE INDEX IF NOT EXISTS idx_workouts_user_date ON workouts(user_id, date);
+CREATE INDEX IF NOT EXISTS idx_meals_user_date ON meals(user_id, date);
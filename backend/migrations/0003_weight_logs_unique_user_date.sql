@@ -0,0 +1,6 @@
+-- One weight entry per user per day, so log_weight can upsert in a single statement.
+-- Collapse any existing same-day duplicates first, keeping the latest entry.
+DELETE FROM weight_logs
+WHERE id NOT IN (SELECT MAX(id) FROM weight_logs GROUP BY user_id, date);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_weight_logs_user_date ON weight_logs(user_id, date);
@@ -0,0 +1,5 @@
+-- Plans reference a shared program template (trainer_engine.PROGRAM_CATALOG)
+-- plus optional per-user overrides, instead of a private JSON copy each.
+-- schedule_json stays for legacy rows and is NULL for template-backed plans.
+ALTER TABLE workout_plans ADD COLUMN template_id TEXT;
+ALTER TABLE workout_plans ADD COLUMN overrides_json TEXT;
@@ -0,0 +1,9 @@
+-- Streaks are maintained on write (backend/activity.py) instead of being
+-- recounted one day at a time on every profile view.
+-- current_streak = length of the run of consecutive workout days ending at last_active_date.
+CREATE TABLE IF NOT EXISTS user_streaks (
+    user_id INTEGER PRIMARY KEY,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    last_active_date TEXT,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
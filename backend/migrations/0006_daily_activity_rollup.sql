@@ -0,0 +1,18 @@
+-- Per-user daily rollup of logged workouts, maintained on write (backend/activity.py).
+-- Charts and the heatmap read ranges of this instead of aggregating `workouts`.
+-- volume = sets x reps x weight (kg); reps like "8-12" count their lower bound.
+CREATE TABLE IF NOT EXISTS daily_activity (
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    exercise_count INTEGER NOT NULL DEFAULT 0,
+    sets INTEGER NOT NULL DEFAULT 0,
+    volume REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, date)
+) WITHOUT ROWID;
+
+INSERT OR REPLACE INTO daily_activity (user_id, date, exercise_count, sets, volume)
+SELECT user_id, date, COUNT(*), COALESCE(SUM(sets), 0),
+       COALESCE(SUM(COALESCE(sets, 0) * CAST(reps AS INTEGER) * COALESCE(weight, 0)), 0)
+FROM workouts
+WHERE user_id IS NOT NULL AND date IS NOT NULL
+GROUP BY user_id, date;
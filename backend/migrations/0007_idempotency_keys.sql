@@ -0,0 +1,11 @@
+-- Client-supplied idempotency keys for write endpoints (e.g. POST /workout/complete).
+-- A retried request with the same key replays the stored response instead of writing again.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    response_json TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, key)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at);
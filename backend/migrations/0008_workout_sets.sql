@@ -0,0 +1,19 @@
+-- Per-set performance log (one row per performed set) under a `workouts` row.
+-- user_id/exercise_id/date are repeated here so analytics can read one user's
+-- history for an exercise from the index alone (backend/analytics.py).
+CREATE TABLE IF NOT EXISTS workout_sets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workout_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    exercise_id TEXT NOT NULL,
+    set_number INTEGER NOT NULL,
+    reps INTEGER NOT NULL,
+    weight REAL NOT NULL DEFAULT 0, -- kg, 0 for bodyweight
+    rpe REAL, -- 1-10, optional
+    FOREIGN KEY(workout_id) REFERENCES workouts(id),
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_workout_sets_user_exercise_date ON workout_sets(user_id, exercise_id, date);
+CREATE INDEX IF NOT EXISTS idx_workout_sets_workout ON workout_sets(workout_id);
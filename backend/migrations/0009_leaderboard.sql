@@ -0,0 +1,17 @@
+-- Lifetime XP for ranking. `xp` is only the progress inside the current level
+-- (it resets on level-up); reaching level L takes 100 + 200 + ... + 100(L-1) = 50 L (L-1) XP.
+ALTER TABLE user_stats ADD COLUMN total_xp INTEGER NOT NULL DEFAULT 0;
+UPDATE user_stats SET total_xp = 50 * level * (level - 1) + xp;
+
+-- Global top-K is a LIMIT scan of this index (backend/leaderboard.py)
+CREATE INDEX IF NOT EXISTS idx_user_stats_total_xp ON user_stats(total_xp DESC, user_id);
+
+-- Friends leaderboard. Stored in both directions so "my friends" is one index range.
+CREATE TABLE IF NOT EXISTS friendships (
+    user_id INTEGER NOT NULL,
+    friend_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, friend_id),
+    FOREIGN KEY(user_id) REFERENCES users(id),
+    FOREIGN KEY(friend_id) REFERENCES users(id)
+) WITHOUT ROWID;
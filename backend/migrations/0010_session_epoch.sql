@@ -0,0 +1,3 @@
+-- Signed session cookies (backend/sessions.py) carry the epoch they were issued under.
+-- Bumping it (on password change) invalidates every outstanding session for the user.
+ALTER TABLE users ADD COLUMN session_epoch INTEGER NOT NULL DEFAULT 0;
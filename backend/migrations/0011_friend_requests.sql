@@ -0,0 +1,13 @@
+-- Friendships need the other user's consent: POST /leaderboard/friends only files a request,
+-- and the friendships rows are written when the recipient accepts it (backend/leaderboard.py).
+CREATE TABLE IF NOT EXISTS friend_requests (
+    from_user_id INTEGER NOT NULL,
+    to_user_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (from_user_id, to_user_id),
+    FOREIGN KEY(from_user_id) REFERENCES users(id),
+    FOREIGN KEY(to_user_id) REFERENCES users(id)
+) WITHOUT ROWID;
+
+-- "Requests addressed to me"
+CREATE INDEX IF NOT EXISTS idx_friend_requests_to ON friend_requests(to_user_id, from_user_id);
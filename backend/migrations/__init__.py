@@ -0,0 +1,81 @@
+"""
+Versioned schema migrations.
+
+Each migration is a `NNNN_description.sql` file in this folder, applied in
+order inside its own transaction. The applied version is recorded in the
+`schema_version` table, so adding a schema change means adding a new file,
+never editing an old one.
+"""
+import os
+import re
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+FILENAME_RE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+
+def discover():
+    """Returns [(version, name, path), ...] sorted by version."""
+    found = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = FILENAME_RE.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    found.sort()
+
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+    return found
+
+def latest_version():
+    migrations = discover()
+    return migrations[-1][0] if migrations else 0
+
+def current_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def migrate(conn):
+    """Applies every pending migration in order. Returns the names applied."""
+    version = current_version(conn)
+    applied = []
+
+    for number, name, path in discover():
+        if number <= version:
+            continue
+        with open(path, "r") as f:
+            sql = f.read()
+
+        # executescript() commits any open transaction first, so the BEGIN/COMMIT
+        # has to live inside the script to keep each migration all-or-nothing.
+        try:
+            conn.executescript(
+                "BEGIN;\n" + sql + "\n"
+                f"INSERT INTO schema_version (version, name) VALUES ({number}, '{name}');\n"
+                "COMMIT;"
+            )
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            raise RuntimeError(f"Migration {number:04d}_{name} failed: {e}") from e
+
+        applied.append(f"{number:04d}_{name}")
+
+    return applied
+
+def check_schema(conn):
+    """Startup check: the DB must be exactly at the version this code expects."""
+    version = current_version(conn)
+    expected = latest_version()
+    if version > expected:
+        raise RuntimeError(f"Database schema v{version} is newer than this code (v{expected}). Refusing to start.")
+    if version < expected:
+        raise RuntimeError(f"Database schema v{version} is behind (v{expected}). Run migrations first.")
+    return version
@@ -0,0 +1,115 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow (~100-300 ms per call at the default cost) and
+used to run inline in async handlers, freezing the whole worker for every
+login. Hashing and verification now run on a small dedicated executor: bcrypt
+releases the GIL, so the event loop keeps serving other requests meanwhile.
+Like the DB executor, the queue in front of it is bounded: once full, new
+requests fail fast with HashingBusy (answered as 503) instead of piling up.
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+
+# Work factor for new hashes (2^rounds iterations). Raising it takes effect on
+# each user's next login (see needs_rehash).
+BCRYPT_ROUNDS = int(os.environ.get("FITAPP_BCRYPT_ROUNDS", "12"))
+# Leave most cores to the event loop and the DB executor
+HASH_WORKERS = int(os.environ.get("FITAPP_HASH_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+HASH_QUEUE_LIMIT = int(os.environ.get("FITAPP_HASH_QUEUE_LIMIT", "32"))
+BCRYPT_MAX_BYTES = 72 # bcrypt only reads this many; bcrypt>=5 raises instead of truncating
+
+if not 4 <= BCRYPT_ROUNDS <= 31:
+    raise ValueError(f"FITAPP_BCRYPT_ROUNDS must be between 4 and 31, got {BCRYPT_ROUNDS}")
+
+class HashingBusy(Exception):
+    """Raised when the password-hashing queue is full."""
+
+def _encode(password):
+    # Same truncation older bcrypt releases applied silently, so existing hashes keep verifying
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+def hash_password_sync(password, rounds=None):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds or BCRYPT_ROUNDS)).decode("utf-8")
+
+def verify_password_sync(password, hashed):
+    try:
+        return bcrypt.checkpw(_encode(password), hashed.encode("utf-8") if isinstance(hashed, str) else hashed)
+    except ValueError as e:
+        print(f"Auth Check Error: {e}") # Malformed stored hash
+        return False
+
+def hash_rounds(hashed):
+    """Cost factor of a stored hash ('$2b$12$...' -> 12), or None if it isn't bcrypt."""
+    parts = hashed.split("$") if hashed else []
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+
+def needs_rehash(hashed, rounds=None):
+    return hash_rounds(hashed) != (rounds or BCRYPT_ROUNDS)
+
+# --- EXECUTOR ---
+_EXECUTOR = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="fitapp-bcrypt")
+_SLOTS = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+_stats_lock = threading.Lock()
+_stats = {"submitted": 0, "rejected": 0, "in_flight": 0, "peak_in_flight": 0,
+          "wait_total": 0.0, "wait_max": 0.0, "run_total": 0.0, "completed": 0}
+
+def _timed(fn, args, queued_at):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        done = time.perf_counter()
+        with _stats_lock:
+            wait = started - queued_at
+            _stats["wait_total"] += wait
+            _stats["wait_max"] = max(_stats["wait_max"], wait)
+            _stats["run_total"] += done - started
+            _stats["completed"] += 1
+
+async def run_hash(fn, *args):
+    """Runs a bcrypt call on the hashing executor. Raises HashingBusy when the queue is full."""
+    if not _SLOTS.acquire(blocking=False):
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise HashingBusy("Password hashing queue is full")
+
+    with _stats_lock:
+        _stats["submitted"] += 1
+        _stats["in_flight"] += 1
+        _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_EXECUTOR, functools.partial(_timed, fn, args, time.perf_counter()))
+    finally:
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+        _SLOTS.release()
+
+async def hash_password(password):
+    return await run_hash(hash_password_sync, password)
+
+async def verify_password(password, hashed):
+    return await run_hash(verify_password_sync, password, hashed)
+
+def hashing_stats():
+    with _stats_lock:
+        completed = _stats["completed"]
+        return {
+            "workers": HASH_WORKERS,
+            "queue_limit": HASH_QUEUE_LIMIT,
+            "rounds": BCRYPT_ROUNDS,
+            "submitted": _stats["submitted"],
+            "rejected": _stats["rejected"],
+            "in_flight": _stats["in_flight"],
+            "queued": max(0, _stats["in_flight"] - HASH_WORKERS),
+            "peak_in_flight": _stats["peak_in_flight"],
+            "avg_wait_ms": round(_stats["wait_total"] * 1e3 / completed, 2) if completed else 0.0,
+            "max_wait_ms": round(_stats["wait_max"] * 1e3, 2),
+            "avg_run_ms": round(_stats["run_total"] * 1e3 / completed, 2) if completed else 0.0,
+        }
@@ -1,29 +1,40 @@
 from fastapi import APIRouter, Request, Form, Depends, HTTPException, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-import bcrypt
-from backend.database import get_db_connection
+from backend.database import run_query
+from backend.passwords import hash_password, verify_password, needs_rehash
+from backend.sessions import set_session_cookie, clear_session_cookie, evict_session
 import sqlite3
 
 router = APIRouter()
 templates = Jinja2Templates(directory="backend/templates")
 
-def verify_password(plain_password, hashed_password):
-    # Ensure bytes
+# --- QUERIES (run on the DB executor) ---
+
+def fetch_user_by_email(conn, email):
+    return conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
+
+def save_password_hash(conn, user_id, hashed):
+    """Same password, new hash (rehash on login): existing sessions stay valid."""
+    conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (hashed, user_id))
+    conn.commit()
+
+def save_new_password(conn, user_id, hashed):
+    """Password change: bumps session_epoch so every session issued before is rejected. Returns the new epoch."""
+    conn.execute("UPDATE users SET password_hash = ?, session_epoch = session_epoch + 1 WHERE id = ?", (hashed, user_id))
+    epoch = conn.execute("SELECT session_epoch FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+    conn.commit()
+    return epoch
+
+def create_user(conn, email, hashed_pw, name):
+    """Returns False if the email is already registered."""
     try:
-        if isinstance(hashed_password, str):
-            hashed_password = hashed_password.encode('utf-8')
-        plain_password = plain_password.encode('utf-8')
-        return bcrypt.checkpw(plain_password, hashed_password)
-    except Exception as e:
-        print(f"Auth Check Error: {e}")
+        conn.execute('INSERT INTO users (email, password_hash, name) VALUES (?, ?, ?)', 
+                     (email, hashed_pw, name))
+        conn.commit()
+    except sqlite3.IntegrityError:
         return False
-
-def get_password_hash(password):
-    # bcrypt.hashpw takes bytes
-    pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(pwd_bytes, salt).decode('utf-8')
+    return True
 
 # --- ROUTES ---
 
@@ -33,16 +44,18 @@ async def login_page(request: Request):
 
 @router.post("/login", response_class=HTMLResponse)
 async def login(request: Request, email: str = Form(...), password: str = Form(...)):
-    conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
-    conn.close()
+    user = await run_query(fetch_user_by_email, email)
 
-    if not user or not verify_password(password, user['password_hash']):
+    if not user or not await verify_password(password, user['password_hash']):
         return templates.TemplateResponse("login.html", {"request": request, "error": "Invalid Credentials"})
+
+    # Work factor changed since this hash was made: upgrade it while we have the plain password
+    if needs_rehash(user['password_hash']):
+        await run_query(save_password_hash, user['id'], await hash_password(password))
     
-    # Session Management (Simple Cookie for MVP)
+    # Signed session cookie; the middleware verifies it without a DB lookup
     response = RedirectResponse(url="/", status_code=303)
-    response.set_cookie(key="user_id", value=str(user['id']))
+    set_session_cookie(response, user['id'], user['session_epoch'])
     return response
 
 @router.get("/register", response_class=HTMLResponse)
@@ -56,21 +69,17 @@ async def register(
     password: str = Form(...),
     name: str = Form(...)
 ):
-    conn = get_db_connection()
-    try:
-        hashed_pw = get_password_hash(password)
-        conn.execute('INSERT INTO users (email, password_hash, name) VALUES (?, ?, ?)', 
-                     (email, hashed_pw, name))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        conn.close()
+    hashed_pw = await hash_password(password)
+    if not await run_query(create_user, email, hashed_pw, name):
         return templates.TemplateResponse("register.html", {"request": request, "error": "Email already exists"})
     
-    conn.close()
     return RedirectResponse(url="/login", status_code=303)
 
 @router.get("/logout")
-async def logout():
+async def logout(request: Request):
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        evict_session(user["id"])
     response = RedirectResponse(url="/login")
-    response.delete_cookie("user_id")
+    clear_session_cookie(response)
     return response
@@ -13,7 +13,7 @@ print(f"DEBUG: Exercises Router Template Dir: {TEMPLATE_DIR}")
 
 templates = Jinja2Templates(directory=TEMPLATE_DIR)
 
-from backend.trainer_engine import KNOWN_GIFS, get_exercise_gif
+from backend.trainer_engine import KNOWN_GIFS, get_exercise_gifs
 import backend.trainer_engine as trainer
 
 # Build Library dynamically from the Trainer Engine pools
@@ -36,10 +36,10 @@ def build_library():
     final_lib = []
     for cat in library_structure:
         ex_list = []
-        for name in cat["exercises"]:
+        for name, gif in zip(cat["exercises"], get_exercise_gifs(cat["exercises"])):
             ex_list.append({
                 "name": name,
-                "gif": get_exercise_gif(name)
+                "gif": gif
             })
         final_lib.append({"category": cat["category"], "exercises": ex_list})
     
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Request, HTTPException, Query, Form, Depends
+from fastapi.responses import JSONResponse
+from backend.sessions import current_user
+from backend.database import run_query
+from backend.leaderboard import (
+    global_leaderboard, friends_leaderboard, request_friend, incoming_requests, accept_friend, decline_friend,
+    remove_friend, MAX_TOP_K
+)
+
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+SCOPES = ("global", "friends")
+
+@router.get("/")
+async def get_leaderboard(
+    request: Request,
+    scope: str = "global",
+    limit: int = Query(10, ge=1, le=MAX_TOP_K),
+    user = Depends(current_user)
+):
+    """Top `limit` users by lifetime XP plus the caller's own rank, e.g. /leaderboard/?scope=friends"""
+    user_id = user["id"]
+    if scope not in SCOPES:
+        raise HTTPException(400, f"scope must be one of {', '.join(SCOPES)}")
+
+    if scope == "friends":
+        board = await run_query(friends_leaderboard, user_id, limit)
+    else:
+        board = await run_query(global_leaderboard, user_id, limit)
+    return JSONResponse(board)
+
+@router.post("/friends")
+async def post_friend(request: Request, email: str = Form(...), user = Depends(current_user)):
+    """Sends a friend request. Same answer whether or not `email` is registered."""
+    user_id = user["id"]
+
+    try:
+        await run_query(request_friend, user_id, email.strip())
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"status": "success", "message": "Friend request sent"}
+
+@router.get("/friends/requests")
+async def get_friend_requests(request: Request, user = Depends(current_user)):
+    user_id = user["id"]
+
+    return {"requests": await run_query(incoming_requests, user_id)}
+
+@router.post("/friends/requests/{from_id}/accept")
+async def post_accept_friend(from_id: int, request: Request, user = Depends(current_user)):
+    user_id = user["id"]
+
+    try:
+        await run_query(accept_friend, user_id, from_id)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"status": "success", "friend_id": from_id}
+
+@router.delete("/friends/requests/{from_id}")
+async def delete_friend_request(from_id: int, request: Request, user = Depends(current_user)):
+    user_id = user["id"]
+
+    await run_query(decline_friend, user_id, from_id)
+    return {"status": "success"}
+
+@router.delete("/friends/{friend_id}")
+async def delete_friend(friend_id: int, request: Request, user = Depends(current_user)):
+    user_id = user["id"]
+
+    await run_query(remove_friend, user_id, friend_id)
+    return {"status": "success"}
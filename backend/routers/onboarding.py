@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, HTTPException, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from backend.database import get_db_connection
-from backend.trainer_engine import generate_program
-import json
+from backend.sessions import current_user, evict_session
+from backend.database import run_query
+from backend.trainer_engine import PROGRAM_CATALOG, FREQUENCIES, LEVELS, GOALS, EQUIPMENT
+from backend.workout_engine import invalidate_plan
 import os
 
 router = APIRouter(prefix="/onboarding", tags=["onboarding"])
@@ -11,6 +12,17 @@ router = APIRouter(prefix="/onboarding", tags=["onboarding"])
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
 
+def save_plan(conn, user_id, frequency, level, goal, equipment, template_id):
+    # Save settings
+    conn.execute("INSERT OR REPLACE INTO user_settings (user_id, frequency, level, goal, equipment) VALUES (?, ?, ?, ?, ?)", 
+                 (user_id, frequency, level, goal, equipment))
+    
+    # Save plan as a reference to the shared template (replaces any per-user overrides)
+    conn.execute("INSERT OR REPLACE INTO workout_plans (user_id, template_id, schedule_json, overrides_json) VALUES (?, ?, NULL, NULL)", 
+                 (user_id, template_id))
+    
+    conn.commit()
+
 @router.get("/", response_class=HTMLResponse)
 async def onboarding_form(request: Request):
     return templates.TemplateResponse("onboarding.html", {"request": request})
@@ -21,27 +33,20 @@ async def generate_plan_handler(
     frequency: str = Form(...),
     level: str = Form(...),
     goal: str = Form(...),
-    equipment: str = Form(...)
+    equipment: str = Form(...),
+    user = Depends(current_user)
 ):
-    user_id = request.cookies.get("user_id")
-    if not user_id: return RedirectResponse("/login")
+    user_id = user["id"]
 
-    # 1. Generate Logic
-    program = generate_program(frequency, level, goal, equipment)
+    # 1. Pick the precompiled program (only the form's options exist in the catalog)
+    for value, options in ((frequency, FREQUENCIES), (level, LEVELS), (goal, GOALS), (equipment, EQUIPMENT)):
+        if value not in options:
+            raise HTTPException(400, f"{value!r} is not one of {', '.join(options)}")
+    template_id = PROGRAM_CATALOG.template_id_for(frequency, level, goal, equipment)
     
     # 2. Save to DB
-    conn = get_db_connection()
-    
-    # Save settings
-    conn.execute("INSERT OR REPLACE INTO user_settings (user_id, frequency, level, goal, equipment) VALUES (?, ?, ?, ?, ?)", 
-                 (user_id, frequency, level, goal, equipment))
-    
-    # Save generated plan
-    program_json = json.dumps(program)
-    conn.execute("INSERT OR REPLACE INTO workout_plans (user_id, schedule_json) VALUES (?, ?)", 
-                 (user_id, program_json))
-    
-    conn.commit()
-    conn.close()
+    await run_query(save_plan, user_id, frequency, level, goal, equipment, template_id)
+    invalidate_plan(user_id)
+    evict_session(user_id) # Settings are part of the cached user context
     
     return RedirectResponse(url="/", status_code=303)
@@ -1,77 +1,56 @@
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, HTTPException, Query, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from backend.database import get_db_connection
+from backend.sessions import current_user, evict_session, set_session_cookie
+from backend.database import run_query
+from backend.activity import current_streak, record_deletion, activity_series, sessions_page, BUCKETS, MAX_RANGE_DAYS
+from backend.series import lttb_indices, moving_average
+from backend.passwords import hash_password
+from backend.routers.auth import save_new_password
 import datetime
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 templates = Jinja2Templates(directory="backend/templates")
 
-@router.get("/", response_class=HTMLResponse)
-async def read_profile(request: Request):
-    user_id = request.cookies.get("user_id")
-    if not user_id: return HTMLResponse("Unauthorized", status_code=401)
-    
-    conn = get_db_connection()
-    
+# Weight chart payload stays bounded no matter how long the history is
+WEIGHT_CHART_POINTS = 60 # Points rendered on the profile page
+MAX_WEIGHT_POINTS = 1000 # Upper bound for ?points= on /profile/weight-series
+WEIGHT_SMOOTHING_DAYS = 7
+
+# --- QUERIES (run on the DB executor) ---
+
+def load_profile(conn, user_id, today):
+    """Gathers everything the profile page shows in one connection checkout."""
     # 1. Total Workouts
-    total_workouts = conn.execute("SELECT COUNT(DISTINCT date) FROM workouts WHERE user_id = ?", (user_id,)).fetchone()[0]
-    
-    # 2. History (Recent 5)
-    rows = conn.execute('''
-        SELECT date, count(exercise_id) as ex_count 
-        FROM workouts 
-        WHERE user_id = ? 
-        GROUP BY date 
-        ORDER BY date DESC 
-        LIMIT 10
-    ''', (user_id,)).fetchall()
-    
+    total_workouts = conn.execute("SELECT COUNT(*) FROM daily_activity WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    # 2. History (first page; older pages via /workout/sessions?cursor=)
+    page = sessions_page(conn, user_id, 10, None, False)
+
     history_list = []
-    for r in rows:
-        d = datetime.datetime.strptime(r["date"], "%Y-%m-%d")
+    for s in page["sessions"]:
+        d = datetime.datetime.strptime(s["date"], "%Y-%m-%d")
         history_list.append({
-            "date": r["date"],
+            "date": s["date"],
             "display_date": d.strftime("%b %d"),
-            "exercises": r["ex_count"]
+            "exercises": s["exercise_count"]
         })
 
-    # 3. Activity Chart Data (Last 7 Days)
-    today = datetime.date.today()
-    chart_labels = []
-    chart_data = []
-    for i in range(6, -1, -1):
-        d = today - datetime.timedelta(days=i)
-        d_str = d.strftime("%Y-%m-%d")
-        chart_labels.append(d.strftime("%a"))
-        count = conn.execute("SELECT count(*) FROM workouts WHERE user_id = ? AND date = ?", (user_id, d_str)).fetchone()[0]
-        chart_data.append(count)
-
-    # 4. Weight Chart Data (Limit 10)
-    w_rows = conn.execute("SELECT date, weight FROM weight_logs WHERE user_id = ? ORDER BY date ASC", (user_id,)).fetchall()
-    weight_labels = []
-    weight_data = []
-    current_weight = 0
-    if w_rows:
-        current_weight = w_rows[-1]["weight"]
-        for r in w_rows:
-            weight_labels.append(r["date"][5:]) # MM-DD
-            weight_data.append(r["weight"])
-    
-    # 5. Streak Logic
-    streak = 0
-    check_date = today
-    while True:
-        c = conn.execute("SELECT count(*) FROM workouts WHERE user_id = ? AND date = ?", (user_id, check_date.strftime("%Y-%m-%d"))).fetchone()[0]
-        if c > 0:
-            streak += 1
-            check_date -= datetime.timedelta(days=1)
-        else:
-            if streak == 0 and check_date == today: # Allow streak to start yesterday if today not done
-                 check_date -= datetime.timedelta(days=1)
-                 continue
-            break
-            
+    # 3. Activity Chart Data (Last 7 Days, from the daily rollup)
+    week = activity_series(conn, user_id, today - datetime.timedelta(days=6), today, "day")
+    chart_labels = [datetime.datetime.strptime(b["start"], "%Y-%m-%d").strftime("%a") for b in week]
+    chart_data = [b["exercises"] for b in week]
+
+    # 4. Weight Chart Data (downsampled, see load_weight_series)
+    weight = load_weight_series(conn, user_id, None, None, WEIGHT_CHART_POINTS, WEIGHT_SMOOTHING_DAYS)
+    weight_labels = [d[5:] for d in weight["dates"]] # MM-DD
+    weight_data = weight["weights"]
+    latest = conn.execute("SELECT weight FROM weight_logs WHERE user_id = ? ORDER BY date DESC LIMIT 1", (user_id,)).fetchone()
+    current_weight = latest["weight"] if latest else 0
+
+    # 5. Streak (maintained on write, see backend/activity.py)
+    streak = current_streak(conn, user_id, today)
+
     # 6. Gamification Stats
     stats = conn.execute("SELECT * FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
     xp = 0
@@ -79,77 +58,181 @@ async def read_profile(request: Request):
     if stats:
         xp = stats['xp']
         level = stats['level']
-    
+
     xp_needed = level * 100
     xp_percent = (xp / xp_needed) * 100
-            
-    conn.close()
 
-    return templates.TemplateResponse("profile.html", {
-        "request": request, 
-        "active_page": "profile",
+    return {
         "total_workouts": total_workouts,
         "current_streak": streak,
         "history": history_list,
+        "history_next_cursor": page["next_cursor"],
         "chart_labels": chart_labels,
         "chart_data": chart_data,
         "weight_labels": weight_labels,
         "weight_data": weight_data,
+        "weight_trend": weight["trend"],
         "current_weight": current_weight,
         "xp": xp,
         "level": level,
         "xp_needed": xp_needed,
         "xp_percent": min(xp_percent, 100)
-    })
+    }
 
-@router.delete("/history/{date_str}")
-async def delete_history(date_str: str, request: Request):
-    user_id = request.cookies.get("user_id")
-    if not user_id: raise HTTPException(401)
-    
-    conn = get_db_connection()
+def load_weight_series(conn, user_id, start, end, points, smooth):
+    """
+    Weight logs in [start, end] (None = unbounded), smoothed with a trailing
+    `smooth`-day moving average over the full-resolution data, then LTTB-downsampled to at
+    most `points` entries.
+    """
+    sql = "SELECT date, weight FROM weight_logs WHERE user_id = ?"
+    params = [user_id]
+    if start:
+        sql += " AND date >= ?"
+        params.append(start.strftime("%Y-%m-%d"))
+    if end:
+        sql += " AND date <= ?"
+        params.append(end.strftime("%Y-%m-%d"))
+    rows = conn.execute(sql + " ORDER BY date ASC", params).fetchall()
+
+    dates = [r["date"] for r in rows]
+    weights = [r["weight"] for r in rows]
+    xy = [(datetime.datetime.strptime(d, "%Y-%m-%d").toordinal(), w) for d, w in zip(dates, weights)]
+    trend = moving_average(xy, smooth) # `smooth` days, however sparse the logs are
+    keep = lttb_indices(xy, points)
+    return {
+        "dates": [dates[i] for i in keep],
+        "weights": [weights[i] for i in keep],
+        "trend": [round(trend[i], 2) for i in keep],
+        "total_points": len(rows)
+    }
+
+def parse_date_param(value, default):
+    if not value:
+        return default
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(400, f"Invalid date '{value}', expected YYYY-MM-DD")
+
+def delete_workouts_on(conn, user_id, date_str):
+    conn.execute("DELETE FROM workout_sets WHERE user_id = ? AND date = ?", (user_id, date_str))
     conn.execute("DELETE FROM workouts WHERE user_id = ? AND date = ?", (user_id, date_str))
+    record_deletion(conn, user_id, date_str)
     conn.commit()
-    conn.close()
+
+def upsert_weight(conn, user_id, date_str, weight):
+    """One entry per day: re-logging a day overwrites it (UNIQUE index on user_id, date). Does not commit."""
+    conn.execute('''
+        INSERT INTO weight_logs (user_id, date, weight) VALUES (?, ?, ?)
+        ON CONFLICT(user_id, date) DO UPDATE SET weight = excluded.weight
+    ''', (user_id, date_str, weight))
+
+def save_weight(conn, user_id, date_str, weight):
+    upsert_weight(conn, user_id, date_str, weight)
+    conn.commit()
+
+# --- ROUTES ---
+
+@router.get("/", response_class=HTMLResponse)
+async def read_profile(request: Request, user = Depends(current_user)):
+    user_id = user["id"]
+
+    today = datetime.date.today()
+    context = await run_query(load_profile, user_id, today)
+
+    return templates.TemplateResponse("profile.html", {
+        "request": request,
+        "active_page": "profile",
+        **context
+    })
+
+@router.get("/activity")
+async def get_activity(
+    request: Request,
+    date_from: str = Query(None, alias="from"),
+    date_to: str = Query(None, alias="to"),
+    bucket: str = "day",
+    user = Depends(current_user)
+):
+    """Activity totals for any range, e.g. /profile/activity?from=2025-01-01&to=2025-12-31&bucket=week"""
+    user_id = user["id"]
+
+    if bucket not in BUCKETS:
+        raise HTTPException(400, f"bucket must be one of {', '.join(BUCKETS)}")
+    end = parse_date_param(date_to, datetime.date.today())
+    start = parse_date_param(date_from, end - datetime.timedelta(days=29))
+    if start > end:
+        raise HTTPException(400, "'from' must not be after 'to'")
+    if (end - start).days > MAX_RANGE_DAYS:
+        raise HTTPException(400, f"Range is limited to {MAX_RANGE_DAYS} days")
+
+    series = await run_query(activity_series, user_id, start, end, bucket)
+    return {
+        "from": start.strftime("%Y-%m-%d"),
+        "to": end.strftime("%Y-%m-%d"),
+        "bucket": bucket,
+        "series": series
+    }
+
+@router.get("/weight-series")
+async def get_weight_series(
+    request: Request,
+    date_from: str = Query(None, alias="from"),
+    date_to: str = Query(None, alias="to"),
+    points: int = Query(WEIGHT_CHART_POINTS, ge=3, le=MAX_WEIGHT_POINTS),
+    smooth: int = Query(WEIGHT_SMOOTHING_DAYS, ge=1, le=90),
+    user = Depends(current_user)
+):
+    """Downsampled weight history, e.g. /profile/weight-series?from=2025-01-01&points=120&smooth=7"""
+    user_id = user["id"]
+
+    start = parse_date_param(date_from, None)
+    end = parse_date_param(date_to, None)
+    if start and end and start > end:
+        raise HTTPException(400, "'from' must not be after 'to'")
+
+    series = await run_query(load_weight_series, user_id, start, end, points, smooth)
+    return {
+        "from": date_from,
+        "to": date_to,
+        "points": points,
+        "smooth": smooth,
+        **series
+    }
+
+@router.delete("/history/{date_str}")
+async def delete_history(date_str: str, request: Request, user = Depends(current_user)):
+    user_id = user["id"]
+
+    day = parse_date_param(date_str, None) # 400 before anything touches the rollup
+    await run_query(delete_workouts_on, user_id, day.strftime("%Y-%m-%d"))
     return {"status": "success"}
 
 @router.post("/weight")
-async def log_weight(request: Request):
-    user_id = request.cookies.get("user_id")
-    if not user_id: raise HTTPException(401)
-    
+async def log_weight(request: Request, user = Depends(current_user)):
+    user_id = user["id"]
+
     data = await request.form()
     weight = float(data.get("weight"))
     date_str = datetime.date.today().strftime("%Y-%m-%d")
-    
-    conn = get_db_connection()
-    # Check if logged today, update if so
-    exists = conn.execute("SELECT id FROM weight_logs WHERE user_id = ? AND date = ?", (user_id, date_str)).fetchone()
-    if exists:
-        conn.execute("UPDATE weight_logs SET weight = ? WHERE id = ?", (weight, exists['id']))
-    else:
-        conn.execute("INSERT INTO weight_logs (user_id, date, weight) VALUES (?, ?, ?)", (user_id, date_str, weight))
-    conn.commit()
-    conn.close()
-    
+
+    await run_query(save_weight, user_id, date_str, weight)
+
     return RedirectResponse("/profile", status_code=303)
 
 @router.post("/password")
-async def change_password(request: Request):
-    user_id = request.cookies.get("user_id")
-    if not user_id: raise HTTPException(401)
+async def change_password(request: Request, user = Depends(current_user)):
+    user_id = user["id"]
 
     data = await request.form()
     new_password = data.get("new_password")
-    
-    import bcrypt
-    pwd_bytes = new_password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(pwd_bytes, salt).decode('utf-8')
-    
-    conn = get_db_connection()
-    conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (hashed, user_id))
-    conn.commit()
-    conn.close()
-    
-    return RedirectResponse("/profile", status_code=303)
+
+    hashed = await hash_password(new_password)
+    epoch = await run_query(save_new_password, user_id, hashed)
+    evict_session(user_id)
+
+    # Every other session is now revoked; keep this one signed in under the new epoch
+    response = RedirectResponse("/profile", status_code=303)
+    set_session_cookie(response, user_id, epoch)
+    return response
@@ -0,0 +1,215 @@
+"""
+Offline sync: the PWA queues workouts, weight logs and meals while the phone has
+no signal and flushes them here in one request once it is back online.
+
+    POST /sync
+    Content-Type: application/x-ndjson
+
+    {"type": "workout", "id": "5f0c...", "date": "2026-03-02", "workout_name": "Push", "exercises": [...]}
+    {"type": "weight", "id": "9a1e...", "logged_at": "2026-03-03T07:12:00+01:00", "weight": 81.4}
+    {"type": "meal", "id": "c27d...", "date": "2026-03-03", "name": "Oats", "calories": 450, "protein": 15}
+
+The body is read line by line and written in batches of SYNC_BATCH_SIZE items,
+one transaction per batch. Every item needs a client-generated `id`. It is
+used as an idempotency key (the same namespace as the Idempotency-Key header
+on /workout/complete), so re-sending a queue after a dropped connection never
+logs anything twice. The response lists one result per line.
+"""
+from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.responses import JSONResponse
+from backend.sessions import current_user
+from backend.database import (
+    run_query, fetch_idempotent_response, store_idempotent_response, MAX_IDEMPOTENCY_KEY_LENGTH
+)
+from backend.routers.workout import validate_exercises, apply_completed_workout
+from backend.routers.profile import upsert_weight
+from backend.leaderboard import record_xp
+import datetime
+import json
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+SYNC_BATCH_SIZE = 100 # Items per transaction
+MAX_SYNC_ITEMS = 2000 # Per request; the client re-sends whatever was not acknowledged
+MAX_LINE_BYTES = 64 * 1024
+MEAL_MACROS = ("calories", "protein", "carbs", "fat")
+
+# --- PARSING (event loop, no DB) ---
+
+def parse_item_date(item, today):
+    """
+    The day the item belongs to, as YYYY-MM-DD. Takes `date`, or the local
+    date of an ISO 8601 `logged_at` (the client's offset is kept, so a late
+    workout doesn't drift into the next UTC day).
+    """
+    if item.get("date"):
+        day = datetime.datetime.strptime(str(item["date"]), "%Y-%m-%d").date()
+    elif item.get("logged_at"):
+        day = datetime.datetime.fromisoformat(str(item["logged_at"])).date()
+    else:
+        raise ValueError("Missing 'date' or 'logged_at'")
+
+    # One day of slack for clients ahead of the server's timezone
+    if day > today + datetime.timedelta(days=1):
+        raise ValueError(f"Date {day} is in the future")
+    return day.strftime("%Y-%m-%d")
+
+def parse_number(item, field, required=False):
+    value = item.get(field)
+    if value is None:
+        if required:
+            raise ValueError(f"Missing '{field}'")
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"'{field}' must be a non-negative number")
+    return value
+
+def parse_item(line, today):
+    """
+    Validates one NDJSON line. Returns (key, kind, date_str, data) where data
+    is already in the shape the writer needs. Raises ValueError.
+    """
+    try:
+        item = json.loads(line)
+    except ValueError:
+        raise ValueError("Invalid JSON")
+    if not isinstance(item, dict):
+        raise ValueError("Each line must be a JSON object")
+
+    key = item.get("id")
+    if not isinstance(key, str) or not key:
+        raise ValueError("Missing 'id' (needed to make re-sends safe)")
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise ValueError("'id' too long")
+
+    kind = item.get("type")
+    date_str = parse_item_date(item, today)
+
+    if kind == "workout":
+        data = validate_exercises(item.get("exercises", []))
+        if not data:
+            raise ValueError("A workout needs at least one exercise")
+    elif kind == "weight":
+        data = parse_number(item, "weight", required=True)
+        if not data:
+            raise ValueError("'weight' must be positive")
+    elif kind == "meal":
+        if not isinstance(item.get("name"), str) or not item["name"]:
+            raise ValueError("Missing 'name'")
+        data = (item["name"],) + tuple(parse_number(item, f) for f in MEAL_MACROS)
+    else:
+        raise ValueError(f"Unknown type {kind!r} (expected workout, weight or meal)")
+    return key, kind, date_str, data
+
+# --- QUERIES (run on the DB executor) ---
+
+def insert_meal(conn, user_id, date_str, meal):
+    name, calories, protein, carbs, fat = meal
+    conn.execute('''
+        INSERT INTO meals (user_id, date, name, calories, protein, carbs, fat)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, date_str, name, calories, protein, carbs, fat))
+
+def apply_item(conn, user_id, kind, date_str, data):
+    """Writes one item without committing. Returns its result payload."""
+    if kind == "workout":
+        return apply_completed_workout(conn, user_id, date_str, data)
+    if kind == "weight":
+        upsert_weight(conn, user_id, date_str, data)
+        return {"status": "success", "message": f"Logged {data} kg on {date_str}"}
+    insert_meal(conn, user_id, date_str, data)
+    return {"status": "success", "message": f"Logged {data[0]} on {date_str}"}
+
+def apply_sync_batch(conn, user_id, items):
+    """
+    Writes a batch of parsed items in one BEGIN IMMEDIATE transaction. Each
+    item runs in its own SAVEPOINT, so one failing item is rolled back alone
+    and the rest of the batch still commits.
+    Returns [(line, key, status, payload)].
+    """
+    results = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for line_no, key, kind, date_str, data in items:
+            stored = fetch_idempotent_response(conn, user_id, key)
+            if stored is not None:
+                results.append((line_no, key, "duplicate", stored))
+                continue
+
+            conn.execute("SAVEPOINT sync_item")
+            try:
+                payload = apply_item(conn, user_id, kind, date_str, data)
+                store_idempotent_response(conn, user_id, key, payload)
+                conn.execute("RELEASE sync_item")
+                results.append((line_no, key, "ok", payload))
+            except Exception as e:
+                conn.execute("ROLLBACK TO sync_item")
+                conn.execute("RELEASE sync_item")
+                print(f"⚠️ Sync item {key} failed: {e}")
+                results.append((line_no, key, "error", {"status": "error", "message": str(e)}))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if any(kind == "workout" for _, _, kind, _, _ in items):
+        record_xp(conn, user_id)
+    return results
+
+# --- ROUTES ---
+
+async def read_lines(request):
+    """Yields (line_no, bytes) for each non-empty line as the body streams in."""
+    buffer = b""
+    line_no = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_LINE_BYTES:
+            raise HTTPException(413, f"Line {line_no + len(lines) + 1} exceeds {MAX_LINE_BYTES} bytes")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+    if buffer.strip():
+        yield line_no + 1, buffer
+
+@router.post("")
+async def sync_queue(request: Request, user = Depends(current_user)):
+    user_id = user["id"]
+
+    today = datetime.date.today()
+    results = []
+    pending = []
+    truncated = False
+
+    async def flush():
+        for line_no, key, status, payload in await run_query(apply_sync_batch, user_id, pending):
+            results.append({"line": line_no, "id": key, "status": status, "message": payload.get("message")})
+        pending.clear()
+
+    count = 0
+    async for line_no, line in read_lines(request):
+        if count == MAX_SYNC_ITEMS:
+            truncated = True
+            break
+        count += 1
+
+        try:
+            key, kind, date_str, data = parse_item(line, today)
+        except ValueError as e:
+            results.append({"line": line_no, "status": "error", "message": str(e)})
+            continue
+
+        pending.append((line_no, key, kind, date_str, data))
+        if len(pending) >= SYNC_BATCH_SIZE:
+            await flush()
+
+    if pending:
+        await flush()
+
+    # DatabaseBusy / PoolTimeout propagate to the 503 handler. Batches committed
+    # before that are safe to re-send: their ids come back as "duplicate".
+    results.sort(key=lambda r: r["line"])
+    summary = {s: sum(1 for r in results if r["status"] == s) for s in ("ok", "duplicate", "error")}
+    return JSONResponse({"status": "success", "summary": summary, "truncated": truncated, "results": results})
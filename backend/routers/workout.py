@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
-from backend.database import get_db_connection
+from backend.sessions import current_user
+from backend.database import (
+    run_db, run_query, DatabaseBusy, PoolTimeout,
+    fetch_idempotent_response, store_idempotent_response, MAX_IDEMPOTENCY_KEY_LENGTH
+)
 import datetime
-import json
 import os
 
 router = APIRouter(prefix="/workout", tags=["workout"])
@@ -12,20 +15,119 @@ router = APIRouter(prefix="/workout", tags=["workout"])
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
 
-from backend.trainer_engine import get_exercise_gif
+from backend.workout_engine import get_user_plan, thaw
+from backend.activity import record_activity, sessions_page, MAX_PAGE_SIZE
+from backend.analytics import validate_sets, training_summary
+from backend.leaderboard import record_xp
+
+# --- QUERIES (run on the DB executor) ---
+
+XP_PER_WORKOUT = 50
+
+def validate_exercises(exercises):
+    """(name, sets, reps, performed) rows for the inserts. Raises ValueError before any write happens."""
+    if not isinstance(exercises, list):
+        raise ValueError("'exercises' must be a list")
+    rows = []
+    for ex in exercises:
+        # ex looks like: {"name": "Bench Press", "sets": 4, "reps": "8-12",
+        #                 "performed": [{"reps": 8, "weight": 60, "rpe": 8}, ...]}
+        # Without 'performed' we log the planned sets/reps as what was completed.
+        if not isinstance(ex, dict) or not isinstance(ex.get("name"), str) or not ex["name"].strip():
+            raise ValueError(f"Invalid exercise entry: {ex!r}")
+        for field in ("sets", "reps"):
+            value = ex.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, str))):
+                raise ValueError(f"Exercise '{field}' must be a number or a string like '8-12'")
+        performed = validate_sets(ex["performed"]) if ex.get("performed") else []
+        rows.append((ex["name"], len(performed) or ex.get("sets"), ex.get("reps"), performed))
+    return rows
+
+def apply_completed_workout(conn, user_id, date_str, exercise_rows):
+    """
+    Writes one session and its XP inside the caller's write transaction
+    (does not commit). Returns the response payload.
+    """
+    if not exercise_rows:
+        # Nothing was trained: no rows, no streak day and no XP (or empty posts would farm the leaderboard)
+        return {"status": "success", "message": "No exercises logged."}
+
+    # 1. All exercise rows in one batch (weight = heaviest logged set)
+    conn.executemany('''
+        INSERT INTO workouts (user_id, date, exercise_id, sets, reps, weight, completed)
+        VALUES (?, ?, ?, ?, ?, ?, 1)
+    ''', [(user_id, date_str, name, sets, reps, max((w for _, w, _ in performed), default=None))
+          for name, sets, reps, performed in exercise_rows])
+
+    # 2. Per-set log. The write lock is held, so the newest rows for this user-day are the ones just inserted.
+    if any(performed for *_, performed in exercise_rows):
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM workouts WHERE user_id = ? AND date = ? ORDER BY id DESC LIMIT ?",
+            (user_id, date_str, len(exercise_rows)))][::-1]
+        conn.executemany('''
+            INSERT INTO workout_sets (workout_id, user_id, date, exercise_id, set_number, reps, weight, rpe)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(workout_id, user_id, date_str, name, n, reps, weight, rpe)
+              for workout_id, (name, _, _, performed) in zip(ids, exercise_rows)
+              for n, (reps, weight, rpe) in enumerate(performed, 1)])
+
+    record_activity(conn, user_id, date_str)
+
+    # --- GAMIFICATION UPDATE ---
+    # 3. Add XP in SQL (no read-modify-write in Python).
+    # XP bar logic: when XP reaches Level * 100 you level up and the bar resets by that amount.
+    conn.execute("INSERT INTO user_stats (user_id, xp, level) VALUES (?, 0, 1) ON CONFLICT(user_id) DO NOTHING", (user_id,))
+    old_level = conn.execute("SELECT level FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()[0]
+    conn.execute('''
+        UPDATE user_stats SET
+            total_xp = total_xp + :gain,
+            level = level + (xp + :gain >= level * 100),
+            xp = CASE WHEN xp + :gain >= level * 100 THEN xp + :gain - level * 100 ELSE xp + :gain END
+        WHERE user_id = :user_id
+    ''', {"gain": XP_PER_WORKOUT, "user_id": user_id})
+    new_level = conn.execute("SELECT level FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    msg = f"Logged {len(exercise_rows)} exercises. +{XP_PER_WORKOUT} XP!"
+    if new_level > old_level:
+        msg += f" 🎉 LEVEL UP! You are now Level {new_level}!"
+    return {"status": "success", "message": msg}
+
+def log_completed_workout(conn, user_id, date_str, exercise_rows, idempotency_key=None):
+    """
+    Logs the session and awards XP in a single BEGIN IMMEDIATE transaction.
+    Returns (payload, replayed). A repeated idempotency_key returns the stored
+    payload without writing anything.
+    """
+    # IMMEDIATE takes the write lock up front, so the idempotency check, the inserts
+    # and the XP update can't interleave with a concurrent submission.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if idempotency_key:
+            stored = fetch_idempotent_response(conn, user_id, idempotency_key)
+            if stored is not None:
+                conn.rollback()
+                return stored, True
+
+        payload = apply_completed_workout(conn, user_id, date_str, exercise_rows)
+
+        if idempotency_key:
+            store_idempotent_response(conn, user_id, idempotency_key, payload)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    record_xp(conn, user_id)
+    return payload, False
+
+# --- ROUTES ---
 
 @router.get("/plan", response_class=HTMLResponse)
-async def view_full_plan(request: Request):
-    user_id = request.cookies.get("user_id")
-    if not user_id: return RedirectResponse("/login")
+async def view_full_plan(request: Request, user = Depends(current_user)):
+    user_id = user["id"]
     
-    conn = get_db_connection()
-    row = conn.execute("SELECT schedule_json FROM workout_plans WHERE user_id = ?", (user_id,)).fetchone()
-    conn.close()
-    
-    schedule = {}
-    if row and row[0]:
-        schedule = json.loads(row[0])
+    # Decoded + GIF-resolved plan from the workout_engine cache
+    schedule = await run_db(get_user_plan, user_id) or {}
         
     # Prepare Data for Template
     days_data = []
@@ -43,15 +145,8 @@ async def view_full_plan(request: Request):
             if name != "Rest Day":
                 is_rest = False
                 workout_name = name
-                raw_exercises = w.get("exercises", [])
-                
-                # INJECT GIFS DYNAMICALLY
-                # We always overwrite to ensure latest GIF is used from our codebase
-                # even if an old one is saved in the DB.
-                exercises = []
-                for ex in raw_exercises:
-                    ex['gif'] = get_exercise_gif(ex['name'])
-                    exercises.append(ex)
+                # GIFs were already injected when the plan was cached
+                exercises = thaw(w.get("exercises", ()))
                 
         days_data.append({
             "name": day_names[i],
@@ -68,120 +163,64 @@ async def view_full_plan(request: Request):
     })
 
 @router.post("/complete")
-async def complete_workout(request: Request):
-    # Get User ID from cookie (Middleware already checked auth, but we need the ID)
-    user_id = request.cookies.get("user_id")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+async def complete_workout(request: Request, user = Depends(current_user)):
+    user_id = user["id"]
 
     try:
         data = await request.json()
         workout_name = data.get("workout_name")
-        exercises = data.get("exercises", [])
+        exercise_rows = validate_exercises(data.get("exercises", []))
         date_str = datetime.date.today().strftime("%Y-%m-%d")
 
-        conn = get_db_connection()
-        
-        # We'll log each exercise as a completed entry
-        # In a more complex app, we might have a 'WorkoutSession' table and 'WorkoutLogs' table.
-        # For this MVP schema, we log rows into 'workouts'.
-        
-        for ex in exercises:
-            # ex looks like: {"name": "Bench Press", "sets": 4, "reps": "8-12"}
-            # We can log the 'planned' sets/reps as what was completed for now.
-            conn.execute('''
-                INSERT INTO workouts (user_id, date, exercise_id, sets, reps, completed)
-                VALUES (?, ?, ?, ?, ?, 1)
-            ''', (user_id, date_str, ex['name'], ex['sets'], ex['reps']))
-            
-
-            
-        # --- GAMIFICATION UPDATE ---
-        # 1. Get current stats
-        stats = conn.execute("SELECT * FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
-        
-        current_xp = 0
-        current_level = 1
-        
-        if stats:
-            current_xp = stats['xp']
-            current_level = stats['level']
-        else:
-            # Initialize if not exists
-            conn.execute("INSERT INTO user_stats (user_id, xp, level) VALUES (?, 0, 1)", (user_id,))
-            
-        # 2. Add XP (50 per workout)
-        xp_gained = 50
-        new_xp = current_xp + xp_gained
-        
-        # 3. Check Level Up (Simple formula: Level * 100 XP needed)
-        xp_needed = current_level * 100
-        leveled_up = False
-        new_level = current_level
-        
-        if new_xp >= xp_needed:
-            new_level += 1
-            new_xp = new_xp - xp_needed # Reset XP for next level?? Or keep total?
-            # Let's keep total XP but increase threshold. 
-            # Actually standard RPG: Total XP increases, Level is function of Total.
-            # But let's stick to "XP bar fills up" logic.
-            # If new_xp >= 100 * level: level up.
-            # Simplified: Threshold = 100 * Level. 
-            
-            # Let's use simple cumulative logic:
-            # Level 1: 0-100
-            # Level 2: 100-300
-            # Level 3: 300-600
-            
-            # For MVP: Explicit threshold check
-            pass
-
-        # Let's use a simpler logic: Total XP accumulates. Level = floor(TotalXP / 100) + 1
-        # But that makes high levels too easy.
-        # Let's just update XP and recalulate level
-        
-        # ACTUALLY, let's keep it simple: Add 50 XP. 
-        # If (XP + 50) > (Level * 100): Level Up!
-        
-        if new_xp >= (current_level * 100):
-            new_level += 1
-            leveled_up = True
-            
-        if stats:
-             conn.execute("UPDATE user_stats SET xp = ?, level = ? WHERE user_id = ?", (new_xp, new_level, user_id))
-        else:
-             conn.execute("UPDATE user_stats SET xp = ?, level = ? WHERE user_id = ?", (new_xp, new_level, user_id))
-             # Wait, insert was done above. Update is correct.
-        
-        conn.commit()
-        conn.close()
-        
-        msg = f"Logged {len(exercises)} exercises. +{xp_gained} XP!"
-        if leveled_up:
-            msg += f" 🎉 LEVEL UP! You are now Level {new_level}!"
+        # Retries of the same submission (flaky network, double tap) must not log twice
+        idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+        if idempotency_key is not None and not isinstance(idempotency_key, str):
+            return JSONResponse({"status": "error", "message": "Idempotency key must be a string"}, status_code=400)
+        if idempotency_key and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return JSONResponse({"status": "error", "message": "Idempotency key too long"}, status_code=400)
+
+        payload, replayed = await run_query(log_completed_workout, user_id, date_str, exercise_rows, idempotency_key)
         
-        return JSONResponse({"status": "success", "message": msg})
+        headers = {"Idempotent-Replayed": "true"} if replayed else None
+        return JSONResponse(payload, headers=headers)
         
+    except ValueError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
+    except (DatabaseBusy, PoolTimeout):
+        raise # Let the app-level handler answer 503
     except Exception as e:
         print(f"Error logging workout: {e}")
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @router.get("/history")
-async def get_history(request: Request):
-    user_id = request.cookies.get("user_id")
-    if not user_id: return []
+async def get_history(request: Request, user = Depends(current_user)):
+    user_id = user["id"]
     
-    conn = get_db_connection()
-    # Group by date to show sessions
-    rows = conn.execute('''
-        SELECT date, count(*) as exercise_count 
-        FROM workouts 
-        WHERE user_id = ? 
-        GROUP BY date 
-        ORDER BY date DESC 
-        LIMIT 5
-    ''', (user_id,)).fetchall()
-    conn.close()
+    page = await run_query(sessions_page, user_id, 5, None, False)
     
-    history = [{"date": r["date"], "count": r["exercise_count"]} for r in rows]
+    history = [{"date": s["date"], "count": s["exercise_count"]} for s in page["sessions"]]
     return JSONResponse(history)
+
+@router.get("/sessions")
+async def get_sessions(
+    request: Request,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    user = Depends(current_user)
+):
+    """Paged session history with per-exercise details. Follow next_cursor for older sessions."""
+    user_id = user["id"]
+
+    try:
+        page = await run_query(sessions_page, user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return JSONResponse(page)
+
+@router.get("/analytics")
+async def get_analytics(request: Request, weeks: int = Query(12, ge=1, le=260), user = Depends(current_user)):
+    """Estimated 1RM per exercise and weekly sets/volume per muscle group over the last `weeks` weeks."""
+    user_id = user["id"]
+
+    summary = await run_query(training_summary, user_id, datetime.date.today(), weeks)
+    return JSONResponse(summary)
@@ -0,0 +1,63 @@
+"""
+Helpers for shipping long time series to charts with a bounded payload.
+Points are (x, y) tuples with numeric x (e.g. a date ordinal).
+"""
+
+def moving_average(points, window):
+    """
+    Trailing moving average over x, not over point count: each y is averaged with
+    the points in (x - window, x]. With date ordinals, window=7 is a 7-day average
+    however often the user logs. One pass with two pointers (running sum); points
+    must be sorted by x.
+    """
+    out = []
+    running = 0.0
+    start = 0
+    for i, (x, y) in enumerate(points):
+        running += y
+        while points[start][0] <= x - window:
+            running -= points[start][1]
+            start += 1
+        out.append(running / (i - start + 1))
+    return out
+
+def lttb_indices(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of the
+    `threshold` points that best preserve the visual shape of the series
+    (first and last point always kept).
+    """
+    n = len(points)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1]
+
+    selected = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket (the third triangle vertex)
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(points[j][0] for j in range(next_start, next_end)) / count
+        avg_y = sum(points[j][1] for j in range(next_start, next_end)) / count
+
+        # Pick the point in this bucket forming the largest triangle with the previous pick and that average
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = points[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
@@ -1,5 +1,7 @@
+import hashlib
 import json
 import os
+from .inference_backends import LABELS_FILE, load_labels
 
 # Load the DB
 DB_FILE = "backend/data/food_db.json"
@@ -11,30 +13,100 @@ def load_food_db():
     return []
 
 FOOD_DB = load_food_db()
+# Changes whenever food_db.json does (cached scan matches are keyed on it)
+FOOD_DB_VERSION = hashlib.sha256(json.dumps(FOOD_DB, sort_keys=True).encode()).hexdigest()[:12]
+FOOD_BY_ID = {food['id']: food for food in FOOD_DB}
+
+# --- LABEL INDEX ---
+# The classifier's label space is fixed (1000 ImageNet classes), so which foods a
+# label maps to is computed once, not per scan: {normalized label: [food, ...]},
+# best match first (food_db.json order, as the old first-match loop did).
+LABEL_INDEX = {}
+KEYWORD_INDEX = {} # keyword -> positions in FOOD_DB of the foods listing it
+
+def index_keywords():
+    KEYWORD_INDEX.clear()
+    for position, food_item in enumerate(FOOD_DB):
+        for keyword in food_item['keywords']:
+            KEYWORD_INDEX.setdefault(keyword, set()).add(position)
+
+def normalize_label(label):
+    return label.lower().replace('_', ' ') # e.g. "king_crab" -> "king crab"
+
+def match_label(label):
+    """
+    Foods with a keyword occurring in a normalized label (the old per-scan substring check).
+    Probes the label's substrings against KEYWORD_INDEX instead of scanning every food.
+    """
+    if not KEYWORD_INDEX:
+        index_keywords()
+    longest = max(map(len, KEYWORD_INDEX), default=0)
+    positions = set()
+    for start in range(len(label)):
+        for end in range(start + 1, min(len(label), start + longest) + 1):
+            positions |= KEYWORD_INDEX.get(label[start:end], set())
+    return [FOOD_DB[i] for i in sorted(positions)]
+
+def build_label_index(labels):
+    """Precomputes LABEL_INDEX for every classifier label ([(wnid, label), ...]). Returns the unmapped ones."""
+    index_keywords()
+    LABEL_INDEX.clear()
+    unmapped = []
+    for wnid, label in labels:
+        foods = LABEL_INDEX[normalize_label(label)] = match_label(normalize_label(label))
+        if not foods:
+            unmapped.append((wnid, label))
+    print(f"🍽️ Label index: {len(labels) - len(unmapped)}/{len(labels)} classifier labels map to a food")
+    return unmapped
+
+def foods_for_label(label):
+    """Indexed foods for one predicted label. Labels missing from the index (no labels file) are added on first sight."""
+    label = normalize_label(label)
+    foods = LABEL_INDEX.get(label)
+    if foods is None:
+        foods = LABEL_INDEX[label] = match_label(label)
+    return foods
 
 def find_nutrition_by_classification(predictions):
     """
     Takes a list of ImageNet predictions (e.g., [('n02123', 'salmon', 0.9])
     and tries to find a match in our local Food DB.
+    Confidence-weighted: each prediction votes its probability for its label's best
+    food, so a food backed by several top-5 labels beats one lucky label.
     """
-    if notpredictions:
+    if not predictions:
         return None
-    
-    # predictions is usually a list of tuples: (id, label, probability)
-    # We look at the 'label' (index 1)
-    
+
+    scores = {}
     for pred in predictions:
-        predicted_label = pred[1].lower().replace('_', ' ') # e.g. "king_crab" -> "king crab"
-        print(f"   -> AI Saw: {predicted_label} ({pred[2]:.2f})")
-        
-        # Check against our DB keywords
-        for food_item in FOOD_DB:
-            for keyword in food_item['keywords']:
-                if keyword in predicted_label:
-                    print(f"      ✅ MATCH FOUND: {food_item['name']}")
-                    return food_item
-                    
-    return None
+        foods = foods_for_label(pred[1])
+        if foods:
+            scores[foods[0]['id']] = scores.get(foods[0]['id'], 0.0) + float(pred[2])
+    if not scores:
+        return None
+    best = max(scores, key=scores.get) # Ties: the first food to score (highest-ranked prediction)
+    return FOOD_BY_ID[best]
+
+def find_foods_by_classification(predictions, min_confidence=0.1):
+    """
+    Every distinct food matched by the predictions (e.g. merged across the crops of
+    a plate), best first. Predictions below min_confidence are ignored as noise.
+    """
+    foods = []
+    for pred in predictions or []:
+        if pred[2] < min_confidence:
+            continue
+        food_item = find_nutrition_by_classification([pred])
+        if food_item and all(f['id'] != food_item['id'] for f in foods):
+            foods.append(food_item)
+    return foods
+
+def total_nutrition(foods):
+    """Summed macros of several foods, shaped like one food item (for the scan result card)."""
+    total = {"name": " + ".join(f['name'] for f in foods)}
+    for key in ("calories", "protein", "carbs", "fat"):
+        total[key] = round(sum(f[key] for f in foods), 1)
+    return total
 
 def search_food_text(query):
     query = query.lower()
@@ -43,3 +115,21 @@ def search_food_text(query):
         if query in food['name'].lower() or any(k in query for k in food['keywords']):
             matches.append(food)
     return matches
+
+# Built with the food DB, from the exported classifier labels (see export_model.py)
+UNMAPPED_LABELS = build_label_index(load_labels()) if os.path.exists(LABELS_FILE) else []
+
+def write_unmapped_report(path):
+    """Writes the classifier labels that match no food as JSON (to grow food_db.json keywords from)."""
+    with open(path, "w") as f:
+        json.dump({"food_db_version": FOOD_DB_VERSION, "labels": len(LABEL_INDEX), "unmapped": UNMAPPED_LABELS}, f, indent=2)
+    print(f"✅ Wrote {len(UNMAPPED_LABELS)} unmapped labels to {path}")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Report classifier labels that map to no food in food_db.json.")
+    parser.add_argument("--out", default="backend/data/unmapped_labels.json")
+    args = parser.parse_args()
+    if not os.path.exists(LABELS_FILE):
+        raise SystemExit(f"{LABELS_FILE} missing: run python -m backend.services.export_model")
+    write_unmapped_report(args.out)
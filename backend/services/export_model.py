@@ -0,0 +1,85 @@
+"""
+One-time export of the int8 TFLite scanner model (the "tflite" backend).
+
+    python -m backend.services.export_model --calibration backend/data/scan_fixtures
+
+Needs TensorFlow (only here, not on the serving hosts). Writes the following
+to backend/data/models/:
+
+- mobilenet_v2_int8.tflite: MobileNetV2 with full-integer post-training
+  quantization (int8 weights, activations, input and output). It is
+  calibrated on the images in --calibration, ideally a few hundred real meal
+  photos.
+- imagenet_labels.json: the 1000 ImageNet (wnid, label) pairs in class order.
+  Backends without Keras use it to decode predictions.
+"""
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+from .inference_backends import INPUT_SIZE, LABELS_FILE, MODELS_DIR, TFLITE_MODEL_FILE
+from .local_ai_service import prepare_image
+
+CLASS_INDEX_URL = "https://storage.googleapis.com/download.tensorflow.org/data/imagenet_class_index.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+DEFAULT_CALIBRATION_DIR = os.path.join(os.path.dirname(MODELS_DIR), "scan_fixtures")
+
+def list_images(folder):
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+def export_labels():
+    """Keras' ImageNet class index ({"0": [wnid, label], ...}) as a plain list."""
+    import tensorflow as tf
+
+    path = tf.keras.utils.get_file("imagenet_class_index.json", CLASS_INDEX_URL, cache_subdir="models")
+    with open(path, "r") as f:
+        index = json.load(f)
+    labels = [index[str(i)] for i in range(len(index))]
+    with open(LABELS_FILE, "w") as f:
+        json.dump(labels, f)
+    print(f"🏷️ Wrote {len(labels)} labels to {LABELS_FILE}")
+
+def export_tflite(calibration_files, max_samples):
+    import tensorflow as tf
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+
+    def representative_dataset():
+        # Same preprocessing as serving, so the int8 ranges fit real inputs
+        for path in calibration_files[:max_samples]:
+            with open(path, "rb") as f:
+                x = prepare_image(f.read())
+            yield [x[np.newaxis].astype(np.float32)]
+
+    model = MobileNetV2(weights="imagenet", input_shape=INPUT_SIZE + (3,))
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    data = converter.convert()
+
+    with open(TFLITE_MODEL_FILE, "wb") as f:
+        f.write(data)
+    print(f"✅ Wrote {TFLITE_MODEL_FILE} ({len(data) / 1e6:.1f} MB, calibrated on {min(len(calibration_files), max_samples)} images)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calibration", default=DEFAULT_CALIBRATION_DIR, help="Folder of sample meal photos")
+    parser.add_argument("--max-samples", type=int, default=300)
+    args = parser.parse_args()
+
+    calibration_files = list_images(args.calibration)
+    if not calibration_files:
+        sys.exit(f"No images in {args.calibration}: int8 calibration needs real sample photos")
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    export_labels()
+    export_tflite(calibration_files, args.max_samples)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Upload decoding for /scan.
+
+A 12 MP phone JPEG used to be read whole into memory, decoded at full size
+(~36 MB of RGB) and only then resized to 224x224. Orientation and alpha were
+ignored. Now:
+
+- uploads are read in chunks with a hard cap (MAX_UPLOAD_BYTES), so oversized
+  files are refused with 413. The middleware refuses them even earlier when
+  Content-Length already says so;
+- JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8 while
+  decoding, straight to the smallest size still >= the target. Other formats
+  use reduce() before the final resize;
+- EXIF orientation is applied, and any mode (palette, grayscale, CMYK,
+  alpha) is normalized to RGB. Transparency is composited onto white rather
+  than black;
+- decoding runs on a small bounded worker pool (Pillow releases the GIL while
+  decoding), not on the event loop. When the pool is full, the scan is
+  refused with InferenceBusy (503).
+"""
+import asyncio
+import functools
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .inference_queue import InferenceBusy
+
+MAX_UPLOAD_BYTES = int(float(os.environ.get("FITAPP_SCAN_MAX_UPLOAD_MB", "15")) * 1024 * 1024)
+UPLOAD_CHUNK = 256 * 1024
+DECODE_WORKERS = int(os.environ.get("FITAPP_SCAN_DECODE_WORKERS", str(max(1, min(4, os.cpu_count() or 1)))))
+DECODE_QUEUE_LIMIT = int(os.environ.get("FITAPP_SCAN_DECODE_QUEUE_LIMIT", "32"))
+BACKGROUND = (255, 255, 255) # Transparent pixels become white, like the app's light theme photos
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES."""
+
+async def read_upload(file, limit=MAX_UPLOAD_BYTES):
+    """Reads an UploadFile in chunks, giving up as soon as it passes `limit` bytes."""
+    chunks, size = [], 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK)
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        if size > limit:
+            raise UploadTooLarge(f"Image is larger than {limit // (1024 * 1024)} MB")
+        chunks.append(chunk)
+
+def to_rgb(img):
+    """Any Pillow mode -> RGB, compositing transparency onto BACKGROUND."""
+    from PIL import Image
+
+    if img.mode == "P" and "transparency" in img.info:
+        img = img.convert("RGBA")
+    if img.mode in ("RGBA", "LA", "PA", "RGBa", "La"):
+        rgba = img.convert("RGBA")
+        canvas = Image.new("RGB", rgba.size, BACKGROUND)
+        canvas.paste(rgba, mask=rgba.getchannel("A"))
+        return canvas
+    return img if img.mode == "RGB" else img.convert("RGB")
+
+def load_image(image_bytes, size):
+    """Decodes an upload to an upright RGB image of exactly `size` (w, h), never at full resolution when avoidable."""
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(image_bytes))
+    # 1. JPEG: let libjpeg downscale while decoding (no-op for other formats).
+    #    Draft size is orientation-agnostic: both sides must stay >= the target.
+    side = max(size)
+    img.draft("RGB", (side, side))
+    # 2. Other formats: cheap integer box reduction, keeping >= 2x the target for resize quality
+    factor = min(img.size) // (2 * side)
+    if factor > 1:
+        img = img.reduce(factor)
+    # 3. Upright and RGB, then the final resize
+    img = ImageOps.exif_transpose(img)
+    img = to_rgb(img)
+    return img.resize(size, Image.BILINEAR)
+
+# --- WORKER POOL ---
+_EXECUTOR = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="fitapp-decode")
+_SLOTS = threading.BoundedSemaphore(DECODE_WORKERS + DECODE_QUEUE_LIMIT)
+
+async def run_decode(fn, *args):
+    """Runs an image-decoding call on the decode pool. Raises InferenceBusy when the pool's queue is full."""
+    if not _SLOTS.acquire(blocking=False):
+        raise InferenceBusy("Image decode queue is full")
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_EXECUTOR, functools.partial(fn, *args))
+    finally:
+        _SLOTS.release()
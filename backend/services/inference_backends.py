@@ -0,0 +1,130 @@
+"""
+Inference backends for the food scanner.
+
+Each backend is a loader for ModelRegistry. The loader returns a bundle:
+
+    {"name": ..., "predict": fn(batch) -> (N, 1000) probabilities, "decode": fn(probs) -> top 5}
+
+`batch` is always the same float32 (N, 224, 224, 3) input in [-1, 1], as
+produced by local_ai_service.prepare_image(). That is MobileNetV2's own
+preprocessing, so backends can be swapped without touching the pipeline.
+
+- keras: full-precision MobileNetV2 via TensorFlow (the original path).
+- tflite: int8-quantized MobileNetV2 run by the TFLite interpreter. It is
+  several times smaller and faster per image on CPU, and only needs the
+  small tflite_runtime wheel at serve time. Build it once with:
+
+      python -m backend.services.export_model
+
+FITAPP_SCAN_BACKEND picks one: keras, tflite, or auto (the default).
+auto uses tflite when the exported model and a runtime are present, and
+keras otherwise.
+"""
+import importlib.util
+import json
+import os
+import threading
+import numpy as np
+
+INPUT_SIZE = (224, 224)
+TOP_K = 5
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(BASE_DIR, "data", "models")
+TFLITE_MODEL_FILE = os.path.join(MODELS_DIR, "mobilenet_v2_int8.tflite")
+LABELS_FILE = os.path.join(MODELS_DIR, "imagenet_labels.json") # [[wnid, label], ...] in class order
+
+SCAN_THREADS = int(os.environ.get("FITAPP_SCAN_THREADS", str(os.cpu_count() or 1)))
+
+def load_labels():
+    with open(LABELS_FILE, "r") as f:
+        return [tuple(x) for x in json.load(f)]
+
+def top_k(probs, labels, k=TOP_K):
+    """Same shape as keras decode_predictions()[0]: [(wnid, label, prob), ...] best first."""
+    best = np.argsort(probs)[::-1][:k]
+    return [(labels[i][0], labels[i][1], float(probs[i])) for i in best]
+
+# --- KERAS ---
+
+def load_keras():
+    """Imports TensorFlow and builds MobileNetV2 (downloads the 14MB weights on first run)."""
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, decode_predictions
+
+    model = MobileNetV2(weights='imagenet')
+    model.predict_on_batch(np.zeros((1,) + INPUT_SIZE + (3,), dtype=np.float32)) # Build the graph now, not on the first scan
+    return {
+        "name": "keras",
+        # predict_on_batch skips predict()'s per-call dataset/callback setup
+        "predict": lambda batch: np.asarray(model.predict_on_batch(batch)),
+        "decode": lambda probs: decode_predictions(probs[np.newaxis], top=TOP_K)[0],
+    }
+
+# --- TFLITE (INT8) ---
+
+def tflite_interpreter_class():
+    """The small tflite_runtime wheel if installed, else the interpreter bundled with TensorFlow."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter
+
+def load_tflite():
+    """Loads the int8 model written by export_model.py."""
+    Interpreter = tflite_interpreter_class()
+    if not os.path.exists(TFLITE_MODEL_FILE):
+        raise FileNotFoundError(f"{TFLITE_MODEL_FILE} missing: run python -m backend.services.export_model")
+
+    interpreter = Interpreter(model_path=TFLITE_MODEL_FILE, num_threads=SCAN_THREADS)
+    interpreter.allocate_tensors()
+    inp = interpreter.get_input_details()[0]
+    out = interpreter.get_output_details()[0]
+    in_scale, in_zero = inp["quantization"]
+    out_scale, out_zero = out["quantization"]
+    labels = load_labels()
+    lock = threading.Lock() # An interpreter is not thread-safe (queue worker vs. scripts)
+    shape = [1]
+
+    def predict(batch):
+        if inp["dtype"] != np.float32:
+            info = np.iinfo(inp["dtype"])
+            batch = np.clip(np.round(batch / in_scale + in_zero), info.min, info.max).astype(inp["dtype"])
+        with lock:
+            # Resizing re-plans the graph, so only when the batch size changes
+            if shape[0] != len(batch):
+                interpreter.resize_tensor_input(inp["index"], [len(batch)] + list(INPUT_SIZE) + [3])
+                interpreter.allocate_tensors()
+                shape[0] = len(batch)
+            interpreter.set_tensor(inp["index"], batch)
+            interpreter.invoke()
+            probs = interpreter.get_tensor(out["index"])
+        if out["dtype"] != np.float32:
+            probs = (probs.astype(np.float32) - out_zero) * out_scale
+        return probs
+
+    predict(np.zeros((1,) + INPUT_SIZE + (3,), dtype=np.float32))
+    return {
+        "name": "tflite",
+        "predict": predict,
+        "decode": lambda probs: top_k(probs, labels),
+    }
+
+BACKENDS = {"keras": load_keras, "tflite": load_tflite}
+
+def backend_available(name):
+    """Whether the backend can load here (runtime installed, model exported)."""
+    if name == "keras":
+        return importlib.util.find_spec("tensorflow") is not None
+    if name == "tflite":
+        runtime = importlib.util.find_spec("tflite_runtime") or importlib.util.find_spec("tensorflow")
+        return runtime is not None and os.path.exists(TFLITE_MODEL_FILE) and os.path.exists(LABELS_FILE)
+    return False
+
+def select_backend(requested="auto"):
+    """Backend name to serve with, or None when nothing can run (scanner offline)."""
+    if requested == "auto":
+        return next((name for name in ("tflite", "keras") if backend_available(name)), None)
+    if requested not in BACKENDS:
+        raise ValueError(f"Unknown scan backend {requested!r} (choose from auto, {', '.join(BACKENDS)})")
+    return requested if backend_available(requested) else None
@@ -0,0 +1,155 @@
+"""
+Micro-batching scheduler for model inference.
+
+A forward pass over 16 images costs far less than 16 passes over one image, but
+each /scan request only brings one. BatchingQueue sits between the handlers
+and the model: requests are queued, a worker thread takes the first one, keeps
+collecting until it has `max_batch` images or `max_wait` seconds have passed,
+stacks them into one batch and runs a single forward pass. Each caller's future
+is resolved with its own slice of the output. The wait only applies under load
+(the previous pass served more than one request), so an idle server adds no
+latency; requests arriving during a pass are batched into the next one anyway.
+submit_batch() queues several images at once (multi-food crops), which then
+share the pass with whatever single scans are waiting.
+
+The model runs on the worker thread (TensorFlow releases the GIL during
+inference), so the event loop keeps serving other requests. Like the DB and
+hashing executors, the queue is bounded: once `max_queue` requests are waiting,
+new ones fail fast with InferenceBusy (answered as 503).
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+class InferenceBusy(Exception):
+    """Raised when the inference queue is full."""
+
+class BatchingQueue:
+    def __init__(self, predict, max_batch=16, max_wait=0.005, max_queue=64, name="inference"):
+        """predict(batch) -> outputs, one row per image of the (N, ...) input batch."""
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.name = name
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._thread = None
+        self._last_requests = 0
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "rejected": 0, "batches": 0, "images": 0, "peak_batch": 0,
+                       "wait_total": 0.0, "run_total": 0.0, "errors": 0, "completed": 0}
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"fitapp-{self.name}", daemon=True)
+                    self._thread.start()
+
+    def _enqueue(self, xs):
+        """Queues an (n, ...) block of inputs. Returns a concurrent.futures.Future of its n output rows."""
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._stats["rejected"] += 1
+            raise InferenceBusy(f"{self.name} queue is full")
+        with self._stats_lock:
+            self._stats["requests"] += 1
+        future = Future()
+        self._queue.put((xs, future, time.perf_counter()))
+        self._ensure_worker()
+        return future
+
+    async def submit(self, x):
+        """Output row for one input (given without the batch axis). Raises InferenceBusy when the queue is full."""
+        rows = await asyncio.wrap_future(self._enqueue(np.asarray(x)[np.newaxis]))
+        return rows[0]
+
+    async def submit_batch(self, xs):
+        """
+        Output rows for an (n, ...) block of inputs that belong together (e.g. crops of one photo).
+        The block counts as one request and is never split, so a pass may exceed max_batch by up to n - 1.
+        """
+        return await asyncio.wrap_future(self._enqueue(np.asarray(xs)))
+
+    def _collect(self):
+        """Blocks for the first request, then gathers more until the batch is full or max_wait is up."""
+        items = [self._queue.get()]
+        size = len(items[0][0])
+        # Only hold the batch open under load (the last pass served several requests);
+        # a lone scan on an idle server goes straight to the model.
+        deadline = time.perf_counter() + (self.max_wait if self._last_requests > 1 else 0.0)
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items, size
+
+    def _run(self):
+        while True:
+            items, size = self._collect()
+            # Callers that gave up while queued (client disconnected) are dropped from the batch
+            live = []
+            for item in items:
+                if item[1].set_running_or_notify_cancel():
+                    live.append(item)
+                else:
+                    self._slots.release()
+            if not live:
+                continue
+            items, size = live, sum(len(x) for x, _, _ in live)
+            self._last_requests = len(items)
+            started = time.perf_counter()
+            outputs = error = None
+            try:
+                batch = items[0][0] if len(items) == 1 else np.concatenate([x for x, _, _ in items])
+                outputs = self.predict(batch)
+            except Exception as e:
+                error = e
+            done = time.perf_counter()
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["completed"] += len(items)
+                self._stats["images"] += size
+                self._stats["peak_batch"] = max(self._stats["peak_batch"], size)
+                self._stats["wait_total"] += sum(started - queued_at for _, _, queued_at in items)
+                self._stats["run_total"] += done - started
+                self._stats["errors"] += error is not None
+            # Free the slots first: a woken caller may submit again straight away
+            for _ in items:
+                self._slots.release()
+
+            # Hand each caller its own rows
+            offset = 0
+            for x, future, _ in items:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(outputs[offset:offset + len(x)])
+                offset += len(x)
+
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1e3,
+            "queue_limit": self.max_queue,
+            "queued": self._queue.qsize(),
+            "requests": s["requests"],
+            "rejected": s["rejected"],
+            "errors": s["errors"],
+            "batches": s["batches"],
+            "avg_batch": round(s["images"] / s["batches"], 2) if s["batches"] else 0.0,
+            "peak_batch": s["peak_batch"],
+            "avg_wait_ms": round(s["wait_total"] * 1e3 / s["completed"], 2) if s["completed"] else 0.0,
+            "avg_run_ms": round(s["run_total"] * 1e3 / s["batches"], 2) if s["batches"] else 0.0,
+        }
@@ -1,57 +1,154 @@
 # local_ai.py
 import os
 import numpy as np
+from .image_preprocess import load_image, run_decode
+from .inference_backends import BACKENDS, INPUT_SIZE, select_backend
+from .inference_queue import BatchingQueue, InferenceBusy
+from .model_registry import ModelRegistry, READY, UNAVAILABLE
 
-# We try to import TensorFlow. If user doesn't have it, we handle gracefully.
-try:
-    import tensorflow as tf
-    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2, preprocess_input, decode_predictions
-    from tensorflow.keras.preprocessing import image as keras_image
+# Backend runtimes are optional and heavy: only check what is installed here. The model is
+# loaded by MODEL_REGISTRY on first use or background warmup (see inference_backends.py).
+SCAN_BACKEND = select_backend(os.environ.get("FITAPP_SCAN_BACKEND", "auto"))
+SCANNER_AVAILABLE = SCAN_BACKEND is not None
+if not SCANNER_AVAILABLE:
+    print("⚠️ Local AI: no scan backend available. Please install: pip install tensorflow-cpu")
+else:
+    print(f"🧠 Local AI: using the {SCAN_BACKEND} backend")
+
+MODEL_NAME = f"mobilenet_v2-{SCAN_BACKEND}"
+MODEL_REGISTRY = ModelRegistry(BACKENDS.get(SCAN_BACKEND), name=MODEL_NAME)
+
+# --- BATCHING ---
+# Concurrent scans are stacked into one forward pass (see inference_queue.py)
+SCAN_MAX_BATCH = int(os.environ.get("FITAPP_SCAN_MAX_BATCH", "16"))
+SCAN_MAX_WAIT = float(os.environ.get("FITAPP_SCAN_MAX_WAIT_MS", "5")) / 1000 # seconds
+SCAN_QUEUE_LIMIT = int(os.environ.get("FITAPP_SCAN_QUEUE_LIMIT", "64"))
+
+def prepare_image(image_bytes):
+    """Decodes one upload into a (224, 224, 3) model input, scaled to [-1, 1] like MobileNetV2's preprocess_input."""
+    img = load_image(image_bytes, INPUT_SIZE)
+    x = np.asarray(img, dtype=np.float32)
+    return x / 127.5 - 1.0
+
+# --- MULTI-FOOD CROPS ---
+# One label per photo misses most of a plate. Multi-food scans classify the whole
+# photo plus a grid of overlapping tiles and a center tile, all in one forward pass.
+MULTI_GRID = int(os.environ.get("FITAPP_SCAN_MULTI_GRID", "2")) # 2 -> 2x2 tiles (6 crops with whole + center)
+MULTI_TILE = 0.6 # Tile side as a fraction of the photo side: neighbours overlap, so items on a seam stay whole
+
+def crop_boxes(size, grid=MULTI_GRID, tile=MULTI_TILE):
+    """(left, top, right, bottom) boxes: whole image, grid x grid overlapping tiles, center tile."""
+    w, h = size
+    tw, th = round(w * tile), round(h * tile)
+    boxes = [(0, 0, w, h)]
+    for row in range(grid):
+        for col in range(grid):
+            left = round((w - tw) * col / (grid - 1)) if grid > 1 else (w - tw) // 2
+            top = round((h - th) * row / (grid - 1)) if grid > 1 else (h - th) // 2
+            boxes.append((left, top, left + tw, top + th))
+    center = ((w - tw) // 2, (h - th) // 2, (w - tw) // 2 + tw, (h - th) // 2 + th)
+    if center not in boxes:
+        boxes.append(center)
+    return boxes
+
+def prepare_crops(image_bytes):
+    """Decodes one upload into an (n_crops, 224, 224, 3) model input block (see crop_boxes)."""
     from PIL import Image
-    import io
-    
-    print("🧠 Local AI: TensorFlow Loaded Successfully")
-    TF_AVAILABLE = True
-    
-    # Load Model Globally (Cache it)
-    # This might take a moment on first run to download (14MB)
-    MODEL = MobileNetV2(weights='imagenet')
-    
-except ImportError:
-    print("⚠️ Local AI: TensorFlow not found. Please install: pip install tensorflow-cpu")
-    TF_AVAILABLE = False
-    MODEL = None
-except Exception as e:
-    print(f"⚠️ Local AI Error: {e}")
-    TF_AVAILABLE = False
-    MODEL = None
+
+    # Decode at 2x the input size, so tiles are downscaled rather than upscaled
+    img = load_image(image_bytes, (INPUT_SIZE[0] * 2, INPUT_SIZE[1] * 2))
+    crops = [np.asarray(img.crop(box).resize(INPUT_SIZE, Image.BILINEAR), dtype=np.float32) for box in crop_boxes(img.size)]
+    return np.stack(crops) / 127.5 - 1.0
+
+def merge_predictions(crop_predictions):
+    """Per-crop top-5 lists -> one list of distinct labels, each with its best probability, best first."""
+    best = {}
+    for predictions in crop_predictions:
+        for wnid, label, prob in predictions:
+            if wnid not in best or prob > best[wnid][2]:
+                best[wnid] = (wnid, label, float(prob))
+    return sorted(best.values(), key=lambda p: p[2], reverse=True)
+
+def predict_batch(batch):
+    """One forward pass: (N, 224, 224, 3) -> (N, 1000) ImageNet probabilities."""
+    return MODEL_REGISTRY.load()["predict"](batch)
+
+def decode(probs, bundle):
+    """Top 5 predictions for one image: [(id, label, prob), ...]"""
+    return bundle["decode"](probs)
+
+SCAN_QUEUE = BatchingQueue(predict_batch, max_batch=SCAN_MAX_BATCH, max_wait=SCAN_MAX_WAIT,
+                           max_queue=SCAN_QUEUE_LIMIT, name="scan")
+
+def scanner_state():
+    """'ready', 'loading' (or 'idle' before warmup), 'failed' or 'unavailable'."""
+    return UNAVAILABLE if not SCANNER_AVAILABLE else MODEL_REGISTRY.state
+
+def scanner_status():
+    """Readiness for /healthz."""
+    state = scanner_state()
+    return {**MODEL_REGISTRY.status(), "backend": SCAN_BACKEND, "state": state, "ready": state == READY}
+
+def warmup():
+    """Starts loading the model in the background (called once the server is up)."""
+    if SCANNER_AVAILABLE:
+        MODEL_REGISTRY.start_warmup()
 
 def analyze_image_locally(image_bytes):
     """
-    Uses MobileNetV2 (Local Neural Network) to classify the image.
-    Returns: List of ImageNet decode_predictions tuples or None.
+    Uses MobileNetV2 (Local Neural Network, on the SCAN_BACKEND backend) to classify the image.
+    Blocking, batch of one, loads the model if needed: for scripts. Request handlers use analyze_image().
+    Returns: List of (wnid, label, prob) tuples (top 5, like decode_predictions) or None.
+    """
+    if not SCANNER_AVAILABLE:
+        return None
+    bundle = MODEL_REGISTRY.load()
+    if bundle is None:
+        return None
+
+    try:
+        x = prepare_image(image_bytes)
+        return decode(predict_batch(x[np.newaxis])[0], bundle)
+    except Exception as e:
+        print(f"❌ Prediction Error: {e}")
+        return None
+
+async def analyze_image(image_bytes):
+    """
+    Same result as analyze_image_locally(), without blocking the event loop:
+    decoding runs on the decode pool and the forward pass is batched with
+    concurrent scans. Never waits for the model to load: returns None unless
+    scanner_state() is 'ready'. Raises InferenceBusy when the decode or scan queue is full.
+    """
+    bundle = MODEL_REGISTRY.get_if_ready()
+    if bundle is None:
+        return None
+
+    try:
+        x = await run_decode(prepare_image, image_bytes)
+        return decode(await SCAN_QUEUE.submit(x), bundle)
+    except InferenceBusy:
+        raise
+    except Exception as e:
+        print(f"❌ Prediction Error: {e}")
+        return None
+
+async def analyze_plate(image_bytes):
+    """
+    Multi-food scan: classifies the whole photo and its crops (crop_boxes) as one
+    block through the scan queue, so it costs about one forward pass rather than one per crop.
+    Returns merge_predictions() of all crops, or None (same conditions as analyze_image()).
     """
-    if not TF_AVAILABLE or MODEL is None:
+    bundle = MODEL_REGISTRY.get_if_ready()
+    if bundle is None:
         return None
 
     try:
-        # 1. Prepare Image
-        img = Image.open(io.BytesIO(image_bytes))
-        img = img.resize((224, 224))
-        
-        # 2. Convert to Array
-        x = keras_image.img_to_array(img)
-        x = np.expand_dims(x, axis=0) # Add batch dimension
-        x = preprocess_input(x)
-        
-        # 3. Predict
-        preds = MODEL.predict(x)
-        
-        # 4. Decode
-        # Returns top 5 predictions: [(id, label, prob), ...]
-        decoded = decode_predictions(preds, top=5)[0]
-        return decoded
-        
+        xs = await run_decode(prepare_crops, image_bytes)
+        probs = await SCAN_QUEUE.submit_batch(xs)
+        return merge_predictions([decode(p, bundle) for p in probs])
+    except InferenceBusy:
+        raise
     except Exception as e:
         print(f"❌ Prediction Error: {e}")
         return None
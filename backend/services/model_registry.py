@@ -0,0 +1,58 @@
+"""
+Lazily loaded models.
+
+Importing TensorFlow and building MobileNetV2 takes seconds and hundreds of MB,
+and used to happen at import time in every worker (and every test run), scan
+or no scan. A ModelRegistry entry only runs its loader on first use, or when
+warmup is started in the background once the server is up (see main.py).
+Readiness is reported through status() for /healthz, so /scan can tell the
+user the scanner is still starting instead of blocking on the load.
+"""
+import threading
+import time
+
+IDLE, LOADING, READY, FAILED, UNAVAILABLE = "idle", "loading", "ready", "failed", "unavailable"
+
+class ModelRegistry:
+    def __init__(self, loader, name="model"):
+        """loader() -> model. ImportError marks the model unavailable (optional dependency missing)."""
+        self.loader = loader
+        self.name = name
+        self.state = IDLE
+        self.error = None
+        self.load_seconds = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Loads the model if needed (blocking; concurrent callers wait for the same load). Returns it or None."""
+        if self.state == READY:
+            return self._model
+        with self._lock:
+            if self.state in (IDLE, FAILED):
+                self.state = LOADING
+                started = time.perf_counter()
+                try:
+                    self._model = self.loader()
+                    self.state = READY
+                    print(f"🧠 {self.name} ready in {time.perf_counter() - started:.1f}s")
+                except ImportError as e:
+                    self.state, self.error = UNAVAILABLE, str(e)
+                    print(f"⚠️ {self.name} unavailable: {e}")
+                except Exception as e:
+                    self.state, self.error = FAILED, str(e)
+                    print(f"⚠️ {self.name} failed to load: {e}")
+                self.load_seconds = round(time.perf_counter() - started, 2)
+        return self._model
+
+    def start_warmup(self):
+        """Loads in a background thread. No-op once loading has started."""
+        if self.state != IDLE:
+            return
+        threading.Thread(target=self.load, name=f"fitapp-warmup-{self.name}", daemon=True).start()
+
+    def get_if_ready(self):
+        return self._model if self.state == READY else None
+
+    def status(self):
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
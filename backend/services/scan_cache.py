@@ -0,0 +1,211 @@
+"""
+Cache of scan results, keyed by the uploaded image.
+
+People re-submit the same photo after a failed form post, and identical meal
+images come up a lot. Each of those used to pay for a full decode + forward
+pass. ScanCache keeps the decoded predictions and the resolved food match:
+
+- exact hits: SHA-256 of the uploaded bytes;
+- near-duplicate hits (re-encoded, resized or re-saved copies): a 64-bit
+  difference hash (dHash) of a 9x8 grayscale thumbnail, matched within
+  `phash_bits` differing bits;
+- tiers: a bounded in-memory LRU with a TTL, plus an optional SQLite file
+  (FITAPP_SCAN_CACHE_DB) that survives restarts and is shared by workers.
+  The disk tier matches near-duplicates on the exact hash only.
+
+`namespace` (model + food DB version) is part of every key, so a new model or
+an edited food_db.json never serves old results.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from .image_preprocess import load_image
+
+SCAN_CACHE_SIZE = int(os.environ.get("FITAPP_SCAN_CACHE_SIZE", "1024"))
+SCAN_CACHE_TTL = float(os.environ.get("FITAPP_SCAN_CACHE_TTL", "86400")) # seconds
+SCAN_CACHE_DB = os.environ.get("FITAPP_SCAN_CACHE_DB") # e.g. backend/data/scan_cache.db; unset = memory only
+SCAN_CACHE_DISK_MAX = int(os.environ.get("FITAPP_SCAN_CACHE_DISK_MAX", "100000"))
+SCAN_CACHE_PHASH_BITS = int(os.environ.get("FITAPP_SCAN_CACHE_PHASH_BITS", "4")) # -1 = exact bytes only
+
+HASH_SIZE = 8
+MIN_CONTRAST = 8 # Flat images (all-black frames, blank screenshots) all hash alike: no perceptual key
+
+def content_key(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def perceptual_hash(image_bytes):
+    """64-bit dHash (is each pixel brighter than its right neighbour, on a 9x8 thumbnail), or None."""
+    try:
+        from PIL import Image # Optional like the scanner itself: without Pillow, exact-bytes hits only
+
+        # Same upright, alpha-flattened decode as the model input. Going through a fixed
+        # 32x32 first keeps copies at different resolutions on the same resampling path.
+        img = load_image(image_bytes, (HASH_SIZE * 4, HASH_SIZE * 4)).convert("L")
+        img = img.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    except Exception:
+        return None
+    pixels = list(img.getdata())
+    if max(pixels) - min(pixels) < MIN_CONTRAST:
+        return None
+    bits = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            bits = (bits << 1) | (left > pixels[row * (HASH_SIZE + 1) + col + 1])
+    return bits - (1 << 64) if bits >= 1 << 63 else bits # Signed, so SQLite can store it
+
+def hamming(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+class ScanCache:
+    def __init__(self, namespace, max_size=SCAN_CACHE_SIZE, ttl=SCAN_CACHE_TTL, db_path=SCAN_CACHE_DB,
+                 phash_bits=SCAN_CACHE_PHASH_BITS, disk_max=SCAN_CACHE_DISK_MAX):
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+        self.phash_bits = phash_bits
+        self.disk_max = disk_max
+        self._entries = OrderedDict() # key -> (expires_at, phash, value)
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "exact_hits": 0, "phash_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        self._db = self._open(db_path) if db_path else None
+
+    # --- DISK TIER ---
+
+    def _open(self, path):
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS scan_cache (
+                key TEXT PRIMARY KEY,
+                phash INTEGER,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_cache_phash ON scan_cache(phash)")
+        conn.commit()
+        print(f"🗂️ Scan cache disk tier at {path}")
+        return conn
+
+    def _disk_get(self, key, phash):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT payload, created_at FROM scan_cache WHERE key = ?", (key,)).fetchone()
+            if (row is None or row[1] + self.ttl < now) and phash is not None:
+                # Same namespace only: "<namespace>:<sha256 hex>", not a longer namespace sharing the prefix
+                prefix = self.namespace + ":"
+                row = self._db.execute('''
+                    SELECT payload, created_at FROM scan_cache
+                    WHERE phash = ? AND substr(key, 1, ?) = ? AND length(key) = ?
+                    ORDER BY created_at DESC LIMIT 1
+                ''', (phash, len(prefix), prefix, len(prefix) + 64)).fetchone()
+        if row is None or row[1] + self.ttl < now:
+            return None
+        return json.loads(row[0])
+
+    def _disk_put(self, key, phash, value):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO scan_cache (key, phash, payload, created_at) VALUES (?, ?, ?, ?)",
+                             (key, phash, json.dumps(value), time.time()))
+            # Keep the file bounded: every ~1000 stores, drop the oldest rows past disk_max
+            if self._stats["stores"] % 1000 == 0:
+                self._db.execute('''
+                    DELETE FROM scan_cache WHERE key IN (
+                        SELECT key FROM scan_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (self.disk_max,))
+            self._db.commit()
+
+    # --- LOOKUP ---
+
+    def _memory_put(self, key, phash, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, phash, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def _memory_near(self, phash):
+        """Closest live entry within phash_bits. Linear, but over at most max_size ints."""
+        now = time.monotonic()
+        best, best_key = self.phash_bits + 1, None
+        with self._lock:
+            for key, (expires_at, other, _) in self._entries.items():
+                if other is not None and expires_at > now:
+                    distance = hamming(phash, other)
+                    if distance < best:
+                        best, best_key = distance, key
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][2]
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def lookup(self, image_bytes):
+        """
+        Returns (key, phash, value). value is None on a miss; pass key and phash
+        back to put(). Blocking (hashing may decode a thumbnail): run it off the event loop.
+        """
+        self._count("lookups")
+        key = f"{self.namespace}:{content_key(image_bytes)}"
+        value = self._memory_get(key)
+        if value is not None:
+            self._count("exact_hits")
+            return key, None, value
+
+        phash = perceptual_hash(image_bytes) if self.phash_bits >= 0 else None
+        if phash is not None:
+            value = self._memory_near(phash)
+            if value is not None:
+                self._count("phash_hits")
+                return key, phash, value
+
+        if self._db is not None:
+            value = self._disk_get(key, phash)
+            if value is not None:
+                self._count("disk_hits")
+                self._memory_put(key, phash, value)
+                return key, phash, value
+
+        self._count("misses")
+        return key, phash, None
+
+    def put(self, key, phash, value):
+        """value must be JSON-serializable (it may go to the disk tier)."""
+        self._count("stores")
+        self._memory_put(key, phash, value)
+        if self._db is not None:
+            self._disk_put(key, phash, value)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            size = len(self._entries)
+        hits = s["exact_hits"] + s["phash_hits"] + s["disk_hits"]
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "disk": self._db is not None,
+            **s,
+            "hit_rate": round(hits / s["lookups"], 4) if s["lookups"] else 0.0,
+        }
@@ -0,0 +1,141 @@
+"""
+Signed session cookies and a cached per-user context.
+
+The session cookie used to be the bare user id, so every page looked the user up
+again (and anyone could claim any id). It is now an HMAC-SHA256-signed token
+
+    <user_id>.<epoch>.<expires>.<signature>
+
+verified in the auth middleware without touching the database. What handlers
+need about the user (id, name, onboarding settings) is kept in SESSION_CACHE,
+so hot pages do no per-request user lookup either; they get it through the
+`current_user` dependency.
+
+`epoch` is users.session_epoch. Changing the password bumps it, which
+invalidates every token issued before. Logout and password changes evict the
+cache entry; the cache TTL bounds how long another worker process may keep
+serving a stale context.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from fastapi import HTTPException, Request
+from backend.cache import TTLCache
+from backend.database import DB_FILE, run_query
+
+SESSION_COOKIE = "session"
+SESSION_TTL = int(os.environ.get("FITAPP_SESSION_TTL_DAYS", "14")) * 86400 # seconds
+SESSION_SECURE = os.environ.get("FITAPP_SESSION_SECURE", "0") == "1" # Set behind HTTPS
+SESSION_CACHE_SIZE = int(os.environ.get("FITAPP_SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.environ.get("FITAPP_SESSION_CACHE_TTL", "60")) # seconds
+SECRET_FILE = os.path.join(os.path.dirname(DB_FILE), "session_secret")
+
+def load_secret():
+    """FITAPP_SESSION_SECRET, else a random key generated once and kept next to the DB."""
+    env = os.environ.get("FITAPP_SESSION_SECRET")
+    if env:
+        return env.encode("utf-8")
+    try:
+        # O_EXCL: when several workers start at once, only the first one writes it
+        fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(SECRET_FILE, "rb") as f:
+            secret = f.read()
+        if len(secret) < 32:
+            raise RuntimeError(f"{SECRET_FILE} is truncated; delete it to generate a new key (logs everyone out)")
+        return secret
+    secret = secrets.token_bytes(32)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    print(f"🔑 Generated session key at {SECRET_FILE}")
+    return secret
+
+_secret = None
+
+def get_secret():
+    """The signing key, loaded (or generated) on first use rather than at import, so tools importing this module write nothing."""
+    global _secret
+    if _secret is None:
+        _secret = load_secret()
+    return _secret
+
+# --- TOKENS ---
+
+def _signature(payload):
+    """URL-safe base64 HMAC of an ASCII payload, as bytes."""
+    digest = hmac.new(get_secret(), payload.encode("ascii"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=")
+
+def sign_session(user_id, epoch, now=None):
+    expires = int(now or time.time()) + SESSION_TTL
+    payload = f"{int(user_id)}.{int(epoch)}.{expires}"
+    return f"{payload}.{_signature(payload).decode('ascii')}"
+
+def verify_session(token, now=None):
+    """(user_id, epoch) for a well-formed, correctly signed, unexpired token, else None."""
+    # Cookies are client input: anything non-ASCII is malformed, not an error
+    if not token or not token.isascii() or token.count(".") != 3:
+        return None
+    payload, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(signature.encode("ascii"), _signature(payload)):
+        return None
+    user_id, epoch, expires = payload.split(".")
+    if not (user_id.isdigit() and epoch.isdigit() and expires.isdigit()):
+        return None
+    if int(expires) < (now or time.time()):
+        return None
+    return int(user_id), int(epoch)
+
+def set_session_cookie(response, user_id, epoch):
+    response.set_cookie(key=SESSION_COOKIE, value=sign_session(user_id, epoch), max_age=SESSION_TTL,
+                        httponly=True, samesite="lax", secure=SESSION_SECURE)
+
+def clear_session_cookie(response):
+    response.delete_cookie(SESSION_COOKIE)
+    response.delete_cookie("user_id") # Pre-signing cookie, ignored since
+
+# --- USER CONTEXT ---
+SESSION_CACHE = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+def load_user_context(conn, user_id):
+    """Everything request handlers need about the user, in one indexed read. None if the user is gone."""
+    row = conn.execute('''
+        SELECT u.id, u.name, u.session_epoch, s.frequency, s.level, s.goal, s.equipment
+        FROM users u LEFT JOIN user_settings s ON s.user_id = u.id
+        WHERE u.id = ?
+    ''', (user_id,)).fetchone()
+    if not row:
+        return None
+    settings = None
+    if row["frequency"] is not None:
+        settings = {k: row[k] for k in ("frequency", "level", "goal", "equipment")}
+    return {"id": row["id"], "name": row["name"], "epoch": row["session_epoch"], "settings": settings}
+
+async def resolve_session(token):
+    """User context for a session cookie, or None if the token is invalid or revoked."""
+    claims = verify_session(token)
+    if not claims:
+        return None
+    user_id, epoch = claims
+
+    user = SESSION_CACHE.get(user_id)
+    # A newer epoch than cached means the password changed in another worker: reload
+    if user is TTLCache.MISSING or (user is not None and epoch > user["epoch"]):
+        user = await run_query(load_user_context, user_id)
+        SESSION_CACHE.put(user_id, user)
+    if user is None or user["epoch"] != epoch:
+        return None
+    return user
+
+def evict_session(user_id):
+    SESSION_CACHE.invalidate(int(user_id))
+
+def current_user(request: Request):
+    """FastAPI dependency: `user = Depends(current_user)`. Set by the auth middleware."""
+    user = getattr(request.state, "user", None)
+    if user is None:
+        raise HTTPException(401)
+    return user
@@ -1,4 +1,11 @@
 import json
+import functools
+import hashlib
+import itertools
+import re
+import threading
+
+from backend.media import load_manifest as load_media_manifest
 
 # --- EXERCISE DATABASE (With GIFs) ---
 # In a real app, this would be in the SQLite database 'exercises' table.
@@ -8,7 +15,7 @@ DEFAULT_GIF = "https://media.giphy.com/media/3o7TKSjRrfPHvzSHrG/giphy.gif" # Gen
 EXERCISE_DB = {}
 
 # Reliable Public URLs
-# Note: In production, download these assets to backend/static/exercises/
+# Note: `python -m backend.media` mirrors these into backend/static/exercises/
 KNOWN_GIFS = {
     # Valid Wikimedia/Public Domain (These usually work, but let's be safe)
     "Barbell Squat": "https://upload.wikimedia.org/wikipedia/commons/1/18/Bodyweight_Squats.gif", 
@@ -24,26 +31,157 @@ KNOWN_GIFS = {
     "Triceps Pushdown": "https://placehold.co/600x400/1a1a1a/00d4ff?text=Triceps+Pushdown",
 }
 
-def get_exercise_gif(name):
-    """Returns a GIF URL for the exercise."""
-    # 1. Check exact match
-    if name in KNOWN_GIFS:
-        return KNOWN_GIFS[name]
-    
-    # 2. Fuzzy match maps
-    lower_name = name.lower()
-    
-    # Map common variations to single good asset
-    if "squat" in lower_name: return KNOWN_GIFS["Barbell Squat"]
-    if "push-up" in lower_name: return KNOWN_GIFS["Push-Ups"]
-    if "pull-up" in lower_name: return KNOWN_GIFS["Pull-Ups"]
-    if "bench press" in lower_name: return KNOWN_GIFS["Bench Press"]
-    if "curl" in lower_name: return KNOWN_GIFS["Barbell Curl"]
-    
-    # 3. Default Safe Fallback
+# Fuzzy alias rules: if the lowercased name contains the pattern, use that KNOWN_GIFS entry.
+# Earlier rules win when several match.
+GIF_ALIASES = (
+    ("squat", "Barbell Squat"),
+    ("push-up", "Push-Ups"),
+    ("pull-up", "Pull-Ups"),
+    ("bench press", "Bench Press"),
+    ("curl", "Barbell Curl"),
+)
+
+def placeholder_gif(name):
     # Returns a generated image with the Name of the exercise, better than a random broken link
     return f"https://placehold.co/600x400/1a1a1a/00d4ff?text={name.replace(' ', '+')}"
 
+def normalize_exercise_name(name):
+    return " ".join(name.lower().split())
+
+class GifResolver:
+    """
+    KNOWN_GIFS + GIF_ALIASES compiled into a normalized-name index and one
+    multi-pattern regex, with results memoized per exercise name.
+    URLs found in `local_media` (the backend.media manifest) are served from our own static mirror.
+    """
+
+    def __init__(self, known_gifs, aliases, local_media=None, cache_size=4096):
+        self._local = dict(local_media or {})
+        self._exact = dict(known_gifs)
+        self._normalized = {normalize_exercise_name(k): v for k, v in known_gifs.items()}
+        self._alias_urls = [known_gifs[target] for _, target in aliases]
+        self._alias_rank = {pattern: rank for rank, (pattern, _) in enumerate(aliases)}
+        # Zero-width lookahead so overlapping patterns are all reported, then the best-ranked one wins
+        alternation = "|".join(re.escape(p) for p, _ in sorted(aliases, key=lambda a: -len(a[0])))
+        self._alias_re = re.compile(f"(?=({alternation}))")
+        self.resolve = functools.lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, name):
+        url = self.resolve_remote(name)
+        return self._local.get(url, url)
+
+    def resolve_remote(self, name):
+        """The original (remote / placeholder) URL, ignoring the local mirror."""
+        # 1. Exact / normalized match
+        url = self._exact.get(name)
+        if url is not None:
+            return url
+        lower_name = normalize_exercise_name(name)
+        url = self._normalized.get(lower_name)
+        if url is not None:
+            return url
+
+        # 2. Fuzzy alias match
+        ranks = [self._alias_rank[m.group(1)] for m in self._alias_re.finditer(lower_name)]
+        if ranks:
+            return self._alias_urls[min(ranks)]
+
+        # 3. Default Safe Fallback
+        return placeholder_gif(name)
+
+    def resolve_many(self, names):
+        """Batch API: resolves a whole plan's exercise list in one call."""
+        resolve = self.resolve
+        return [resolve(name) for name in names]
+
+    def cache_info(self):
+        return self.resolve.cache_info()
+
+GIF_RESOLVER = GifResolver(KNOWN_GIFS, GIF_ALIASES, local_media=load_media_manifest())
+
+def get_exercise_gif(name):
+    """Returns a GIF URL for the exercise."""
+    return GIF_RESOLVER.resolve(name)
+
+def get_exercise_gifs(names):
+    """Returns GIF URLs for a list of exercise names (same order)."""
+    return GIF_RESOLVER.resolve_many(names)
+
+# --- EXERCISE POOLS ---
+# Each inner list is one slot's options, in order of preference (select() picks per equipment).
+CHEST_OPS = [
+    ["Bench Press", "Dumbbell Press", "Push-Ups"],
+    ["Incline Press", "Incline Dumbbell Press", "Machine Press"],
+    ["Cable Fly", "Dumbbell Fly", "Pec Deck"]
+]
+
+BACK_OPS = [
+    ["Pull-Ups", "Lat Pulldown", "Assisted Pull-Ups"],
+    ["Barbell Row", "Dumbbell Row", "Seated Cable Row"],
+    ["Face Pull", "Rear Delt Fly", "Straight Arm Pulldown"]
+]
+
+LEGS_OPS = [
+    ["Barbell Squat", "Dumbbell Goblet Squat", "Leg Press"],
+    ["Lunges", "Bulgarian Split Squat", "Step-Ups"],
+    ["Romanian Deadlift", "Leg Curl", "Hip Thrust"],
+    ["Standing Calf Raise", "Seated Calf Raise", "Jump Rope"]
+]
+
+SHOULDERS_OPS = [
+    ["Overhead Press", "Dumbbell Shoulder Press", "Machine Press"],
+    ["Lateral Raise", "Cable Lateral Raise", "Dumbbell Lateral Raise"],
+    ["Rear Delt Fly", "Face Pull", "Band Pull-Aparts"]
+]
+
+ARMS_OPS = {
+    "Biceps": [
+        ["Barbell Curl", "Dumbbell Curl", "Cable Curl"],
+        ["Hammer Curl", "Preacher Curl", "Concentration Curl"]
+    ],
+    "Triceps": [
+        ["Close-Grip Bench", "Triceps Pushdown", "Dips"],
+        ["Overhead Extension", "Skull Crushers", "Cable Extension"]
+    ]
+}
+
+ABS_OPS = [
+    ["Plank", "Dead Bug", "Hollow Hold"],
+    ["Leg Raises", "Hanging Knee Raises", "Floor Leg Raises"],
+    ["Cable Crunch", "Bicycle Crunch", "Sit-Ups"]
+]
+
+def exercise_vocabulary():
+    """Every exercise name the generator can pick from, sorted."""
+    names = set()
+    for pool in (CHEST_OPS, BACK_OPS, LEGS_OPS, SHOULDERS_OPS, ABS_OPS, *ARMS_OPS.values()):
+        for options in pool:
+            names.update(options)
+    return sorted(names)
+
+# Muscle group credited for an exercise in weekly volume (backend/analytics.py).
+# Moves listed in two pools (e.g. Face Pull) count for the first one.
+MUSCLE_POOLS = (
+    ("Chest", CHEST_OPS), ("Back", BACK_OPS), ("Legs", LEGS_OPS), ("Shoulders", SHOULDERS_OPS),
+    ("Biceps", ARMS_OPS["Biceps"]), ("Triceps", ARMS_OPS["Triceps"]), ("Abs", ABS_OPS),
+)
+EXTRA_MUSCLES = {"Deadlift": "Back", "Calf Raise": "Legs", "Squat": "Legs", "Barbell Rows": "Back"}
+
+def build_muscle_index():
+    index = {}
+    for muscle, pool in MUSCLE_POOLS:
+        for options in pool:
+            for name in options:
+                index.setdefault(normalize_exercise_name(name), muscle)
+    for name, muscle in EXTRA_MUSCLES.items():
+        index.setdefault(normalize_exercise_name(name), muscle)
+    return index
+
+MUSCLE_INDEX = build_muscle_index()
+
+def muscle_group(name):
+    return MUSCLE_INDEX.get(normalize_exercise_name(name), "Other")
+
 def generate_program(frequency, level, goal, equipment):
     """
     Generates a workout program based on user inputs.
@@ -80,49 +218,6 @@ def generate_program(frequency, level, goal, equipment):
                     return opt
         return options_list[0]
 
-    # --- POOLS ---
-    CHEST_OPS = [
-        ["Bench Press", "Dumbbell Press", "Push-Ups"],
-        ["Incline Press", "Incline Dumbbell Press", "Machine Press"],
-        ["Cable Fly", "Dumbbell Fly", "Pec Deck"]
-    ]
-    
-    BACK_OPS = [
-        ["Pull-Ups", "Lat Pulldown", "Assisted Pull-Ups"],
-        ["Barbell Row", "Dumbbell Row", "Seated Cable Row"],
-        ["Face Pull", "Rear Delt Fly", "Straight Arm Pulldown"]
-    ]
-    
-    LEGS_OPS = [
-        ["Barbell Squat", "Dumbbell Goblet Squat", "Leg Press"],
-        ["Lunges", "Bulgarian Split Squat", "Step-Ups"],
-        ["Romanian Deadlift", "Leg Curl", "Hip Thrust"],
-        ["Standing Calf Raise", "Seated Calf Raise", "Jump Rope"]
-    ]
-
-    SHOULDERS_OPS = [
-        ["Overhead Press", "Dumbbell Shoulder Press", "Machine Press"],
-        ["Lateral Raise", "Cable Lateral Raise", "Dumbbell Lateral Raise"],
-        ["Rear Delt Fly", "Face Pull", "Band Pull-Aparts"]
-    ]
-    
-    ARMS_OPS = {
-        "Biceps": [
-            ["Barbell Curl", "Dumbbell Curl", "Cable Curl"],
-            ["Hammer Curl", "Preacher Curl", "Concentration Curl"]
-        ],
-        "Triceps": [
-            ["Close-Grip Bench", "Triceps Pushdown", "Dips"],
-            ["Overhead Extension", "Skull Crushers", "Cable Extension"]
-        ]
-    }
-    
-    ABS_OPS = [
-        ["Plank", "Dead Bug", "Hollow Hold"],
-        ["Leg Raises", "Hanging Knee Raises", "Floor Leg Raises"],
-        ["Cable Crunch", "Bicycle Crunch", "Sit-Ups"]
-    ]
-
     # 3. Build Daily Workouts
     program = {}
     
@@ -184,3 +279,68 @@ def generate_program(frequency, level, goal, equipment):
         }
 
     return program
+
+# --- PROGRAM CATALOG ---
+# generate_program() only has a small, finite input space, so every variant is
+# compiled once at import and users just reference a template by ID instead of
+# each storing a private JSON copy of the same program.
+FREQUENCIES = ("3", "4")
+LEVELS = ("Beginner", "Intermediate", "Advanced")
+GOALS = ("Muscle", "Fat Loss", "Strength")
+EQUIPMENT = ("Gym", "Home", "Bodyweight")
+
+def canonical_program_json(program):
+    """Stable serialization used for hashing. GIFs are left out: they are resolved at render time."""
+    stripped = {
+        day: {
+            "name": workout["name"],
+            "exercises": [{k: v for k, v in ex.items() if k != "gif"} for ex in workout["exercises"]]
+        }
+        for day, workout in program.items()
+    }
+    return json.dumps(stripped, sort_keys=True, separators=(",", ":"))
+
+class ProgramCatalog:
+    """Content-addressed store of generated programs: template_id -> program."""
+
+    def __init__(self):
+        self._templates = {} # template_id -> canonical JSON
+        self._index = {} # (frequency, level, goal, equipment) -> template_id
+        self._lock = threading.Lock()
+
+    def register(self, key, program):
+        program_json = canonical_program_json(program)
+        template_id = hashlib.sha256(program_json.encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            self._templates.setdefault(template_id, program_json)
+            self._index[key] = template_id
+        return template_id
+
+    def build(self):
+        for key in itertools.product(FREQUENCIES, LEVELS, GOALS, EQUIPMENT):
+            self.register(key, generate_program(*key))
+        return self
+
+    def template_id_for(self, frequency, level, goal, equipment):
+        """None for options outside FREQUENCIES/LEVELS/GOALS/EQUIPMENT (the index only holds built keys)."""
+        return self._index.get((str(frequency), level, goal, equipment))
+
+    def program_for(self, frequency, level, goal, equipment):
+        """Fresh copy of the program for these options. Unknown options (old saved settings) compile uncached."""
+        template_id = self.template_id_for(frequency, level, goal, equipment)
+        if template_id is None:
+            return generate_program(str(frequency), level, goal, equipment)
+        return self.get(template_id)
+
+    def get(self, template_id):
+        """Returns a fresh (mutable) copy of the template, or None if unknown."""
+        program_json = self._templates.get(template_id)
+        return json.loads(program_json) if program_json is not None else None
+
+    def __contains__(self, template_id):
+        return template_id in self._templates
+
+    def __len__(self):
+        return len(self._templates)
+
+PROGRAM_CATALOG = ProgramCatalog().build()
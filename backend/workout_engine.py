@@ -1,6 +1,9 @@
 import datetime
-from backend.database import get_db_connection
+from backend.database import db_connection
+from backend.cache import TTLCache
 import json
+import os
+from types import MappingProxyType
 
 # --- STATIC FALLBACK WORKOUT (If no user plan found) ---
 WORKOUT_PROGRAM = [
@@ -14,10 +17,119 @@ WORKOUT_PROGRAM = [
     }, # ... kept short for fallback
 ]
 
-def get_workout_for_date(date_obj, start_date, user_id=None):
+# --- PLAN CACHE ---
+# Every page that shows the plan used to SELECT + json.loads the same row.
+# Decoded plans (with GIFs already resolved) are kept per user in a bounded LRU.
+# Writers must call invalidate_plan(); the TTL bounds staleness across worker processes.
+PLAN_CACHE_SIZE = int(os.environ.get("FITAPP_PLAN_CACHE_SIZE", "1024"))
+PLAN_CACHE_TTL = float(os.environ.get("FITAPP_PLAN_CACHE_TTL", "300")) # seconds
+
+def freeze(obj):
+    """Recursively turns dicts/lists into read-only mappings/tuples."""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+def thaw(obj):
+    """Mutable (and JSON-serializable) copy of a frozen plan fragment."""
+    if isinstance(obj, MappingProxyType):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [thaw(v) for v in obj]
+    return obj
+
+PLAN_CACHE = TTLCache(PLAN_CACHE_SIZE, PLAN_CACHE_TTL)
+
+def apply_overrides(program_schedule, overrides):
+    """Per-user changes on top of a template: {"<day>": {...workout...}} replaces a day, null removes it."""
+    for day, workout_data in overrides.items():
+        if workout_data is None:
+            program_schedule.pop(day, None)
+        else:
+            program_schedule[day] = workout_data
+    return program_schedule
+
+def fetch_plan_row(conn, user_id):
+    return conn.execute('''
+        SELECT p.schedule_json, p.template_id, p.overrides_json,
+               s.frequency, s.level, s.goal, s.equipment
+        FROM workout_plans p
+        LEFT JOIN user_settings s ON s.user_id = p.user_id
+        WHERE p.user_id = ?
+    ''', (user_id,)).fetchone()
+
+def load_plan(user_id):
+    """Reads and decodes a user's plan from the DB, GIFs resolved. None if no plan."""
+    # Import here to avoid potential top-level circular issues
+    from backend.trainer_engine import get_exercise_gifs, PROGRAM_CATALOG
+
+    with db_connection() as conn:
+        row = fetch_plan_row(conn, user_id)
+    if not row:
+        return None
+
+    if row["template_id"]:
+        program_schedule = PROGRAM_CATALOG.get(row["template_id"])
+        if program_schedule is None and row["frequency"] is not None:
+            # Template no longer exists (generator changed): recompile from the saved settings
+            program_schedule = PROGRAM_CATALOG.program_for(row["frequency"], row["level"], row["goal"], row["equipment"])
+        if program_schedule is None:
+            return None
+        if row["overrides_json"]:
+            apply_overrides(program_schedule, json.loads(row["overrides_json"]))
+    elif row["schedule_json"]:
+        # Legacy plan stored as a full JSON copy
+        program_schedule = json.loads(row["schedule_json"])
+    else:
+        return None
+
+    # INJECT GIFS (always from our codebase, even if an old one is saved in the DB)
+    all_exercises = [ex for workout_data in program_schedule.values() for ex in workout_data.get("exercises", [])]
+    for ex, gif in zip(all_exercises, get_exercise_gifs([ex['name'] for ex in all_exercises])):
+        ex['gif'] = gif
+    return freeze(program_schedule)
+
+def get_user_plan(user_id):
+    """
+    Returns the user's decoded plan as a read-only mapping {"0": {...}, ...},
+    or None if they have not onboarded yet. Served from PLAN_CACHE when possible.
+    """
+    key = str(user_id)
+    plan = PLAN_CACHE.get(key)
+    if plan is TTLCache.MISSING:
+        plan = load_plan(key)
+        PLAN_CACHE.put(key, plan)
+    return plan
+
+def invalidate_plan(user_id):
+    """Call after writing workout_plans for this user."""
+    PLAN_CACHE.invalidate(str(user_id))
+
+def plan_cache_stats():
+    return PLAN_CACHE.stats()
+
+def annotate_targets(workout, user_id):
+    """Adds ex["target"] = {"weight", "reps", "e1rm"} for exercises the user has logged sets for."""
+    from backend.analytics import targets_for
+
+    try:
+        with db_connection() as conn:
+            targets = targets_for(conn, user_id, workout.get("exercises", []))
+    except Exception as e:
+        # Targets are a hint; never fail the workout page over them
+        print(f"⚠️ Could not compute targets: {e}")
+        return
+    for ex in workout.get("exercises", []):
+        if ex["name"] in targets:
+            ex["target"] = targets[ex["name"]]
+
+def get_workout_for_date(date_obj, start_date, user_id=None, annotate=False):
     """
     Returns the workout for the specific date.
     Now supports custom user plans from DB.
+    annotate=True adds per-exercise load targets (one analytics query; only /workout shows them).
     """
     
     # Default Fallback (Rest Day)
@@ -26,34 +138,24 @@ def get_workout_for_date(date_obj, start_date, user_id=None):
     if not user_id:
         return rest_day
 
-    # 1. Fetch User Plan from DB
+    # 1. Fetch User Plan (cached)
     try:
-        conn = get_db_connection()
-        row = conn.execute("SELECT schedule_json FROM workout_plans WHERE user_id = ?", (user_id,)).fetchone()
-        conn.close()
+        program_schedule = get_user_plan(user_id)
 
-        if not row:
+        if program_schedule is None:
             # If authenticated but no plan, prompt Setup
             return {"name": "Welcome! (Set up Plan)", "exercises": []}
-            
-        program_schedule = json.loads(row[0]) 
         
         # 2. Determine Day of Week (0=Monday, 6=Sunday)
         weekday = date_obj.weekday()
-        
-        # Import here to avoid potential top-level circular issues
-        from backend.trainer_engine import get_exercise_gif
 
         # 3. Check if today has a workout in the schedule
         if str(weekday) in program_schedule:
-            workout_data = program_schedule[str(weekday)]
-            
-            # INJECT GIFS
-            if "exercises" in workout_data:
-                for ex in workout_data["exercises"]:
-                    ex['gif'] = get_exercise_gif(ex['name'])
-
-            return workout_data
+            # Hand out a private copy; the cached plan is shared and read-only
+            workout = thaw(program_schedule[str(weekday)])
+            if annotate:
+                annotate_targets(workout, user_id)
+            return workout
             
         return rest_day
         
@@ -73,11 +175,7 @@ def get_weekly_schedule(start_date, user_id=None):
     program_schedule = {}
     if user_id:
         try:
-            conn = get_db_connection()
-            row = conn.execute("SELECT schedule_json FROM workout_plans WHERE user_id = ?", (user_id,)).fetchone()
-            conn.close()
-            if row:
-                program_schedule = json.loads(row[0]) 
+            program_schedule = get_user_plan(user_id) or {}
         except:
             pass
 